@@ -0,0 +1,145 @@
+"""Running per-session aggregates kept on StudySession.
+
+Every logged frame updates the session's count, sum, sum of squares,
+min/max of attention, per-emotion counts and focused time, so ending a
+session or summarizing it never has to read its frames back.
+
+Sessions logged before these columns existed can be backfilled from their
+focus logs:
+
+    python aggregates.py            # every session
+    python aggregates.py 12 13      # selected sessions
+"""
+import math
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import config
+import emotion_codec
+import models
+
+def reset(session: models.StudySession):
+    session.frame_count = 0
+    session.attention_sum = 0.0
+    session.attention_sum_sq = 0.0
+    session.attention_min = None
+    session.attention_max = None
+    session.emotion_counts = {}
+    session.focused_seconds = 0.0
+    session.last_frame_at = None
+
+def apply_frames(session: models.StudySession, frames: Iterable[Tuple[datetime, bool, Optional[Dict], float]]):
+    """Fold ``(timestamp, focused, emotions, attention_score)`` frames, in time order, into the aggregates.
+
+    A focused frame adds the time since the previous frame to the focused
+    time, capped at ``STUDYSYNC_FOCUS_GAP_CAP_SECONDS`` so a paused client
+    doesn't count as focus.
+    """
+    count = session.frame_count or 0
+    total = session.attention_sum or 0.0
+    total_sq = session.attention_sum_sq or 0.0
+    low, high = session.attention_min, session.attention_max
+    emotion_counts = dict(session.emotion_counts or {})
+    focused_seconds = session.focused_seconds or 0.0
+    last_frame_at = session.last_frame_at
+
+    for timestamp, focused, emotions, score in frames:
+        score = score or 0.0
+        count += 1
+        total += score
+        total_sq += score * score
+        low = score if low is None else min(low, score)
+        high = score if high is None else max(high, score)
+        if emotions:
+            dominant = max(emotions.items(), key=lambda x: x[1])[0]
+            emotion_counts[dominant] = emotion_counts.get(dominant, 0) + 1
+        if last_frame_at is None or timestamp >= last_frame_at:
+            if focused and last_frame_at is not None:
+                focused_seconds += min((timestamp - last_frame_at).total_seconds(), config.FOCUS_GAP_CAP_SECONDS)
+            last_frame_at = timestamp
+
+    session.frame_count = count
+    session.attention_sum = total
+    session.attention_sum_sq = total_sq
+    session.attention_min = low
+    session.attention_max = high
+    # Reassigned rather than mutated so SQLAlchemy sees the JSON change
+    session.emotion_counts = emotion_counts
+    session.focused_seconds = focused_seconds
+    session.last_frame_at = last_frame_at
+
+def average_attention(session: models.StudySession) -> Optional[float]:
+    return session.attention_sum / session.frame_count if session.frame_count else None
+
+def finish(session: models.StudySession):
+    """Set an ended session's average attention and recommended break from its aggregates.
+
+    Called when the session ends and again whenever frames flushed later
+    (e.g. by another server worker) change the aggregates.
+    """
+    if session.frame_count:
+        session.average_attention_score = average_attention(session)
+    if session.average_attention_score is not None:
+        if session.average_attention_score < 40:
+            session.recommended_break_duration = 15  # 15 minutes break
+        elif session.average_attention_score < 60:
+            session.recommended_break_duration = 10  # 10 minutes break
+        else:
+            session.recommended_break_duration = 5   # 5 minutes break
+
+def summary(session: models.StudySession) -> Dict:
+    """Aggregate view of a session, computed from its running totals alone."""
+    count = session.frame_count or 0
+    mean = average_attention(session)
+    std = None
+    if count:
+        std = math.sqrt(max(0.0, session.attention_sum_sq / count - mean * mean))
+    emotion_counts = session.emotion_counts or {}
+    return {
+        "frame_count": count,
+        "attention_mean": mean,
+        "attention_std": std,
+        "attention_min": session.attention_min,
+        "attention_max": session.attention_max,
+        "emotion_counts": emotion_counts,
+        "emotion_distribution": {k: v / count for k, v in emotion_counts.items()} if count else {},
+        "focused_minutes": (session.focused_seconds or 0.0) / 60,
+    }
+
+def recompute(db: Session, session: models.StudySession):
+    """Rebuild a session's aggregates from its focus logs."""
+    reset(session)
+    logs = db.query(
+        models.FocusLog.timestamp, models.FocusLog.focused, models.FocusLog.emotions_json,
+        models.FocusLog.emotions_blob, models.FocusLog.attention_score
+    ).filter(models.FocusLog.session_id == session.id).order_by(models.FocusLog.timestamp).yield_per(1000)
+    apply_frames(session, (
+        (timestamp, focused, emotion_codec.row_emotions(emotions_json, emotions_blob), score)
+        for timestamp, focused, emotions_json, emotions_blob, score in logs
+    ))
+
+def backfill(db: Session, session_ids: Optional[Iterable[int]] = None) -> int:
+    query = db.query(models.StudySession)
+    if session_ids:
+        query = query.filter(models.StudySession.id.in_(list(session_ids)))
+    count = 0
+    for session in query.all():
+        recompute(db, session)
+        db.commit()
+        count += 1
+    return count
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    from migrations import run_migrations
+    models.Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        updated = backfill(db, [int(arg) for arg in sys.argv[1:]])
+    finally:
+        db.close()
+    print(f"Recomputed aggregates for {updated} sessions")
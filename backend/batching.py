@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+import instrumentation
+
+_STOP = object()
+
+class MicroBatcher:
+    """Coalesce single-sample predictions from concurrent callers into batched calls.
+
+    Callers hand in one sample at a time and block on their own result. A
+    background thread runs ``predict_fn`` once on a stack of pending samples
+    and hands each caller its own row of the output. A sample that arrives
+    while no other sample is queued or being predicted goes to the model
+    right away, so a lone caller never waits for company. Under load, samples
+    that queued up meanwhile are collected until ``max_batch_size`` are
+    pending or ``max_wait_ms`` has elapsed since the batch was started.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 10.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # Samples submitted whose prediction hasn't been handed back yet
+        self._in_flight = 0
+        self._count_lock = threading.Lock()
+        # Reused for every batch; predict_fn must not keep a reference to its input
+        self._buffer: Optional[np.ndarray] = None
+
+    def submit(self, sample: np.ndarray) -> Future:
+        """Queue one sample (without batch dimension) and return a future for its prediction."""
+        future: Future = Future()
+        self._ensure_started()
+        self._count(1)
+        self._queue.put((sample, future))
+        return future
+
+    def predict(self, sample: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        """Predict one sample, blocking until its batch has been run."""
+        return self.submit(sample).result(timeout)
+
+    def pending(self) -> int:
+        """Samples queued and not yet picked up for a batch."""
+        return self._queue.qsize()
+
+    def _count(self, delta: int):
+        with self._count_lock:
+            self._in_flight += delta
+
+    def close(self):
+        """Stop the worker thread after it drains the samples already queued."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # Only wait to fill the batch when other samples are already on their way
+            busy = self._in_flight > 1
+            deadline = time.monotonic() + (self.max_wait if busy else 0.0)
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Tuple[np.ndarray, Future]]):
+        first = batch[0][0]
+        if self._buffer is None or self._buffer.shape[1:] != first.shape or self._buffer.dtype != first.dtype:
+            self._buffer = np.empty((self.max_batch_size,) + first.shape, dtype=first.dtype)
+        try:
+            samples = np.stack([sample for sample, _ in batch], out=self._buffer[:len(batch)])
+            instrumentation.BATCH_SIZE.observe(len(batch))
+            with instrumentation.stage("model_batch"):
+                preds = self.predict_fn(samples)
+        except Exception as exc:
+            self._count(-len(batch))
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        self._count(-len(batch))
+        for i, (_, future) in enumerate(batch):
+            future.set_result(preds[i])
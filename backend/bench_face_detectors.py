@@ -0,0 +1,119 @@
+"""Compare face detector backends on a local image set.
+
+Every image in the directory is expected to contain a face. If the directory
+holds an ``annotations.json`` mapping file names to lists of ``[x, y, w, h]``
+boxes (in full-resolution pixels), recall is measured per box (IoU >= 0.5);
+otherwise it is the share of images in which at least one face was found.
+
+Images are decoded the way the server decodes frames, straight to grayscale
+at 1/``--decode-reduction`` scale (STUDYSYNC_DECODE_REDUCTION by default),
+so the recall numbers hold for serving. Pass ``--decode-reduction 1`` to
+measure the detectors on full-resolution frames.
+
+    python bench_face_detectors.py path/to/faces --detectors haar,haar_downscaled,yunet
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Dict, List, Optional
+
+import cv2
+
+import config
+from face_detectors import DETECTORS, create_detector
+from preprocessing import decode_grayscale
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+def load_images(image_dir: str, reduction: int = config.DECODE_REDUCTION):
+    names = sorted(n for n in os.listdir(image_dir) if n.lower().endswith(IMAGE_EXTENSIONS))
+    images = {}
+    for name in names:
+        with open(os.path.join(image_dir, name), "rb") as f:
+            img = decode_grayscale(f.read(), reduction)
+        if img is not None:
+            images[name] = img
+    annotations_path = os.path.join(image_dir, "annotations.json")
+    annotations = None
+    if os.path.exists(annotations_path):
+        with open(annotations_path) as f:
+            annotations = json.load(f)
+    return images, annotations
+
+def iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+def benchmark_detector(name: str, images: Dict, annotations: Optional[Dict], repeat: int,
+                       reduction: int = config.DECODE_REDUCTION) -> Dict:
+    detector = create_detector(name, fallback=False)
+    # One untimed pass so lazy initialisation doesn't count against the detector
+    for img in list(images.values())[:1]:
+        detector.detect(img)
+
+    latencies: List[float] = []
+    hits = total = 0
+    for file_name, img in images.items():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            faces = detector.detect(img)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if annotations is not None:
+            # Annotations are in full-resolution pixels, detections in those of the reduced frame
+            faces = [tuple(v * reduction for v in face) for face in faces]
+            for truth in annotations.get(file_name, []):
+                total += 1
+                hits += any(iou(truth, face) >= 0.5 for face in faces)
+        else:
+            total += 1
+            hits += bool(faces)
+
+    latencies.sort()
+    return {
+        "detector": name,
+        "decode_reduction": reduction,
+        "frames": len(latencies),
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "recall": hits / total if total else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image_dir")
+    parser.add_argument("--detectors", default=",".join(DETECTORS), help="comma-separated detector names")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per image")
+    parser.add_argument("--decode-reduction", type=int, default=config.DECODE_REDUCTION, choices=(1, 2, 4, 8),
+                        help="decode images at 1/N scale, as the server does")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args()
+
+    images, annotations = load_images(args.image_dir, args.decode_reduction)
+    if not images:
+        raise SystemExit(f"No images found in {args.image_dir}")
+
+    results = []
+    for name in args.detectors.split(","):
+        try:
+            results.append(benchmark_detector(name.strip(), images, annotations, args.repeat, args.decode_reduction))
+        except (cv2.error, ValueError, FileNotFoundError) as e:
+            print(f"Skipping {name}: {e}")
+
+    print(f"{'detector':<18}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'recall':>9}")
+    for r in results:
+        print(f"{r['detector']:<18}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['recall']:>9.2%}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Storage benchmark: default SQLite setup vs. the tuned configuration.
+
+Builds two throwaway databases, one with default journaling and no
+(session_id, timestamp) indexes and one with WAL, synchronous=NORMAL, mmap
+and the composite indexes, fills both with several sessions of
+``--rows`` attention metrics each, and reports:
+
+- per-frame insert latency with one commit per row
+- bulk insert latency per batch of ``--batch`` rows
+- latency of the /session_metrics/ query for one session, as ORM objects
+  and as plain column rows (which isolates the index from ORM overhead)
+
+and then, for each emotion storage format, the focus_logs file size and the
+time to read one session's emotions back as dicts.
+
+    python bench_storage.py --sessions 20 --rows 10000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import sessionmaker
+
+import emotion_codec
+import models
+from database import create_db_engine
+from migrations import run_migrations
+
+def make_db(path: str, tuned: bool):
+    engine = create_db_engine(f"sqlite:///{path}", tuned=tuned)
+    models.Base.metadata.create_all(bind=engine)
+    if tuned:
+        run_migrations(engine)
+    else:
+        with engine.begin() as conn:
+            for model in (models.FocusLog, models.AttentionMetric, models.AttentionRecord):
+                for index in model.__table__.indexes:
+                    if len(index.columns) > 1:
+                        index.drop(conn)
+    return engine, sessionmaker(bind=engine)
+
+def metric_rows(session_id: int, count: int, start: datetime):
+    return [
+        {
+            "session_id": session_id,
+            "timestamp": start + timedelta(seconds=i),
+            "attention_score": float(i % 100),
+            "dominant_emotion": "neutral",
+            "emotion_confidence": 0.5,
+            "break_recommended": False,
+        }
+        for i in range(count)
+    ]
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+def run(tuned: bool, sessions: int, rows: int, batch: int, single_commits: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_db(os.path.join(tmp, "bench.db"), tuned)
+        db = Session()
+        start = datetime(2024, 1, 1)
+        session_ids = []
+        for _ in range(sessions):
+            s = models.StudySession(user_id="bench", start_time=start)
+            db.add(s)
+            db.commit()
+            session_ids.append(s.id)
+
+        bulk_ms = []
+        for sid in session_ids:
+            all_rows = metric_rows(sid, rows, start)
+            for i in range(0, rows, batch):
+                t = time.perf_counter()
+                db.bulk_insert_mappings(models.AttentionMetric, all_rows[i:i + batch])
+                db.commit()
+                bulk_ms.append((time.perf_counter() - t) * 1000)
+
+        single_ms = []
+        for row in metric_rows(session_ids[0], single_commits, start + timedelta(days=1)):
+            t = time.perf_counter()
+            db.add(models.AttentionMetric(**row))
+            db.commit()
+            single_ms.append((time.perf_counter() - t) * 1000)
+
+        query_ms, column_query_ms = [], []
+        m = models.AttentionMetric
+        for sid in session_ids:
+            t = time.perf_counter()
+            db.query(m).filter(m.session_id == sid).order_by(m.timestamp).all()
+            query_ms.append((time.perf_counter() - t) * 1000)
+            db.expunge_all()
+            t = time.perf_counter()
+            db.execute(
+                select(m.timestamp, m.attention_score).where(m.session_id == sid).order_by(m.timestamp)
+            ).all()
+            column_query_ms.append((time.perf_counter() - t) * 1000)
+
+        with engine.connect() as conn:
+            mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+        db.close()
+        engine.dispose()
+
+    return {
+        "config": f"{'tuned' if tuned else 'default'} ({mode})",
+        "single_commit_ms": statistics.fmean(single_ms),
+        "bulk_batch_ms": statistics.fmean(bulk_ms),
+        "query_p50_ms": percentile(query_ms, 0.5),
+        "query_p95_ms": percentile(query_ms, 0.95),
+        "column_query_p50_ms": percentile(column_query_ms, 0.5),
+    }
+
+EMOTIONS = dict(zip(emotion_codec.EMOTION_LABELS, (0.05, 0.01, 0.04, 0.6, 0.1, 0.05, 0.15)))
+
+def run_emotion_storage(storage: str, rows: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine, Session = make_db(path, tuned=True)
+        db = Session()
+        session = models.StudySession(user_id="bench", start_time=datetime(2024, 1, 1))
+        db.add(session)
+        db.commit()
+        stored = emotion_codec.storage_values(EMOTIONS, storage)
+        db.bulk_insert_mappings(models.FocusLog, [
+            {"session_id": session.id, "timestamp": session.start_time + timedelta(seconds=i), "focused": True,
+             "attention_score": 50.0, **stored}
+            for i in range(rows)
+        ])
+        db.commit()
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+            table_bytes = conn.exec_driver_sql(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = 'focus_logs'"
+            ).scalar() if conn.exec_driver_sql("SELECT 1 FROM pragma_module_list WHERE name = 'dbstat'").first() else None
+
+        f = models.FocusLog
+        t = time.perf_counter()
+        for json_value, blob in db.execute(
+            select(f.emotions_json, f.emotions_blob).where(f.session_id == session.id).order_by(f.timestamp)
+        ):
+            emotion_codec.row_emotions(json_value, blob)
+        read_ms = (time.perf_counter() - t) * 1000
+        db.close()
+        engine.dispose()
+        file_bytes = os.path.getsize(path)
+    return {"storage": storage, "file_bytes": file_bytes, "table_bytes": table_bytes, "read_ms": read_ms}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=10000, help="attention metrics per session")
+    parser.add_argument("--batch", type=int, default=500, help="rows per bulk insert")
+    parser.add_argument("--single-commits", type=int, default=200, help="rows inserted with one commit each")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.rows} rows")
+    print(f"{'config':<20}{'1-row commit ms':>17}{'bulk batch ms':>15}{'query p50 ms':>14}{'query p95 ms':>14}"
+          f"{'column query p50 ms':>21}")
+    for tuned in (False, True):
+        r = run(tuned, args.sessions, args.rows, args.batch, args.single_commits)
+        print(f"{r['config']:<20}{r['single_commit_ms']:>17.3f}{r['bulk_batch_ms']:>15.2f}"
+              f"{r['query_p50_ms']:>14.2f}{r['query_p95_ms']:>14.2f}{r['column_query_p50_ms']:>21.2f}")
+
+    print(f"\nemotion storage, {args.rows} focus logs")
+    print(f"{'storage':<10}{'db bytes':>12}{'focus_logs bytes':>18}{'read ms':>10}")
+    for storage in ("json", "float32", "float16"):
+        r = run_emotion_storage(storage, args.rows)
+        table = "n/a" if r["table_bytes"] is None else r["table_bytes"]
+        print(f"{r['storage']:<10}{r['file_bytes']:>12}{table:>18}{r['read_ms']:>10.2f}")
+
+if __name__ == "__main__":
+    main()
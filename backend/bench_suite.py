@@ -0,0 +1,281 @@
+"""Offline benchmark of the frame-analysis hot path and the API endpoints.
+
+Needs no network and no running servers. Frames are deterministic 640x480
+JPEGs: synthetic frames with one drawn face that the Haar detector finds,
+so analysis runs through inference, and noise frames without a face. With
+``--frames-dir``, recorded JPEG frames replace the synthetic face frames.
+Three groups are measured:
+
+- stages of ``is_focused_and_emotion``: decode, face detection, face
+  preprocessing, model call, micro-batched model call, result building,
+  the whole function on face frames, on no-face frames and within a
+  session, and ``EmotionPredictor.predict``
+- throughput of the model and of ``analyze_frames`` at batch sizes 1 to 64
+- ``main.app`` endpoints through an in-process TestClient, on a throwaway database
+
+Session measurements run with the near-duplicate frame cache disabled, so
+they time the tracked hot path rather than cache hits; the cache-hit path
+is reported on its own. Latencies are reported as p50/p95/p99, along with the process's peak RSS
+after each group. Results are saved as JSON. With ``--baseline``, each
+result is compared to an earlier run, and the script exits with status 1
+if any result got slower by more than ``--tolerance``.
+
+    python bench_suite.py --output bench.json
+    python bench_suite.py --frames-dir recorded/ --baseline bench.json --output bench_new.json
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from synthetic_faces import draw_face
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+def synthetic_frames(count: int, width: int = 640, height: int = 480) -> List[bytes]:
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(count):
+        img = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (9, 9), 0)
+        frames.append(cv2.imencode(".jpg", img)[1].tobytes())
+    return frames
+
+def synthetic_face_frames(count: int, width: int = 640, height: int = 480) -> List[bytes]:
+    """Frames with one drawn face each, at slightly different places and sizes."""
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(count):
+        img = cv2.GaussianBlur(rng.integers(70, 110, (height, width), dtype=np.uint8), (9, 9), 0)
+        draw_face(img, width // 2 + int(rng.integers(-60, 61)), height // 2 + int(rng.integers(-30, 31)),
+                  float(rng.uniform(0.8, 1.3)))
+        frames.append(cv2.imencode(".jpg", cv2.GaussianBlur(img, (7, 7), 0))[1].tobytes())
+    return frames
+
+def recorded_frames(frames_dir: Optional[str]) -> List[bytes]:
+    if not frames_dir:
+        return []
+    frames = []
+    for name in sorted(os.listdir(frames_dir)):
+        if name.lower().endswith((".jpg", ".jpeg")):
+            with open(os.path.join(frames_dir, name), "rb") as f:
+                frames.append(f.read())
+    return frames
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def latency(fn: Callable[[int], object], runs: int, warmup: int = 5) -> Dict[str, float]:
+    """Percentiles in ms of ``fn(i)`` over ``runs`` calls, after ``warmup`` untimed calls."""
+    for i in range(warmup):
+        fn(i)
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings = np.array(timings)
+    return {
+        "runs": runs,
+        "mean_ms": float(timings.mean()),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "p99_ms": float(np.percentile(timings, 99)),
+    }
+
+def bench_stages(frames: List[bytes], face_frames: List[bytes], runs: int) -> Dict:
+    import config
+    import focus_detector
+    from emotion_predictor import EmotionPredictor
+    from preprocessing import decode_grayscale, face_buffer, to_model_input
+
+    focus_detector.warm_up()
+    pick = lambda i: face_frames[i % len(face_frames)]
+    grays = [decode_grayscale(f) for f in face_frames]
+    boxes = [focus_detector.detect_faces(gray)[0] for gray in grays]
+    faces = np.random.default_rng(1).random((64, 48, 48, 1), dtype=np.float32)
+    row = focus_detector.emotion_model.predict(faces[:1])[0]
+    buffer = face_buffer()
+
+    def preprocess(i):
+        x, y, w, h = boxes[i % len(boxes)]
+        return to_model_input(grays[i % len(grays)][y:y+h, x:x+w], out=buffer)
+
+    def cold_cache(fn):
+        # Time the tracked path itself; a cached answer would skip detection and inference
+        cache_size, config.FRAME_CACHE_SIZE = config.FRAME_CACHE_SIZE, 0
+        try:
+            return fn()
+        finally:
+            config.FRAME_CACHE_SIZE = cache_size
+
+    results = {
+        "decode": latency(lambda i: decode_grayscale(pick(i)), runs),
+        "detect_faces": latency(lambda i: focus_detector.detect_faces(grays[i % len(grays)]), runs),
+        "preprocess_face": latency(preprocess, runs),
+        "model_predict_1": latency(lambda i: focus_detector.emotion_model.predict(faces[i % 64:i % 64 + 1]), runs),
+        "batcher_predict_1": latency(lambda i: focus_detector.emotion_batcher.predict(faces[i % 64]), runs),
+        "result_from_prediction": latency(lambda i: focus_detector.result_from_prediction(row), runs),
+        "is_focused_and_emotion": latency(lambda i: focus_detector.is_focused_and_emotion(pick(i)), runs),
+        "is_focused_and_emotion_no_face": latency(
+            lambda i: focus_detector.is_focused_and_emotion(frames[i % len(frames)]), runs),
+        "is_focused_and_emotion_session": cold_cache(lambda: latency(
+            lambda i: focus_detector.is_focused_and_emotion(pick(i), session_id=-1), runs)),
+        # The same frame again within a session: answered from the near-duplicate cache
+        "is_focused_and_emotion_session_cache_hit": latency(
+            lambda i: focus_detector.is_focused_and_emotion(face_frames[0], session_id=-2), runs),
+    }
+
+    predictor = EmotionPredictor(focus_detector.emotion_model_path)
+    images = [cv2.imdecode(np.frombuffer(f, np.uint8), cv2.IMREAD_COLOR) for f in face_frames[:16]]
+    results["emotion_predictor_predict"] = latency(lambda i: predictor.predict(images[i % len(images)]), runs)
+    return results
+
+def bench_throughput(frames: List[bytes], runs: int) -> Dict:
+    import focus_detector
+    rng = np.random.default_rng(2)
+    faces = rng.random((max(BATCH_SIZES), 48, 48, 1), dtype=np.float32)
+    results = {}
+    for size in BATCH_SIZES:
+        model = latency(lambda i: focus_detector.emotion_model.predict(faces[:size]), runs)
+        batch = [frames[j % len(frames)] for j in range(size)]
+        analyze = latency(lambda i: focus_detector.analyze_frames(batch), max(3, runs // 10))
+        results[f"batch_{size}"] = {
+            "model": dict(model, items_per_s=size * 1000 / model["p50_ms"]),
+            "analyze_frames": dict(analyze, items_per_s=size * 1000 / analyze["p50_ms"]),
+        }
+    return results
+
+def bench_endpoints(frames: List[bytes], runs: int) -> Dict:
+    from fastapi.testclient import TestClient
+    import config
+    import main
+
+    results = {}
+    frame = lambda i: ("frame.jpg", frames[i % len(frames)], "image/jpeg")
+    with TestClient(main.app) as client:
+        deadline = time.time() + 120
+        while client.get("/readyz").status_code != 200 and time.time() < deadline:
+            time.sleep(0.1)
+        session_id = client.post("/start_session/").json()["session_id"]
+
+        results["GET /healthz"] = latency(lambda i: client.get("/healthz"), runs)
+        results["POST /analyze_focus/"] = latency(
+            lambda i: client.post("/analyze_focus/", files={"file": frame(i)}), runs)
+        # Frame cache off, so the session's frames go through tracking and inference like distinct frames would
+        cache_size, config.FRAME_CACHE_SIZE = config.FRAME_CACHE_SIZE, 0
+        try:
+            results["POST /analyze_focus/ (session)"] = latency(
+                lambda i: client.post("/analyze_focus/", files={"file": frame(i)}, data={"session_id": session_id}), runs)
+        finally:
+            config.FRAME_CACHE_SIZE = cache_size
+        results["POST /analyze_focus_batch/ (8 frames)"] = latency(
+            lambda i: client.post("/analyze_focus_batch/", files=[("files", frame(i + j)) for j in range(8)]),
+            max(3, runs // 4))
+        results["POST /predict_emotion (base64)"] = latency(
+            lambda i: client.post("/predict_emotion", json={"image": base64.b64encode(frames[i % len(frames)]).decode()}),
+            runs)
+        results["POST /predict_emotion/raw"] = latency(
+            lambda i: client.post("/predict_emotion/raw", content=frames[i % len(frames)],
+                                  headers={"Content-Type": "image/jpeg"}), runs)
+        results["GET /session_metrics/"] = latency(lambda i: client.get(f"/session_metrics/{session_id}"), runs)
+        client.post(f"/end_session/{session_id}")
+    return results
+
+def compare(results: Dict, baseline: Dict, tolerance: float, path: str = "") -> List[str]:
+    """Results that got slower (or lower throughput) than the baseline by more than ``tolerance``."""
+    regressions = []
+    for key, value in results.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f"{path}/{key}" if path else key
+        if isinstance(value, dict):
+            if isinstance(old, dict):
+                regressions += compare(value, old, tolerance, name)
+        elif key in ("p50_ms", "p95_ms", "p99_ms") and isinstance(old, (int, float)) and old > 0:
+            change = value / old - 1
+            if change > tolerance:
+                regressions.append(f"{name}: {old:.3f} -> {value:.3f} ms ({change:+.0%})")
+        elif key == "items_per_s" and isinstance(old, (int, float)) and old > 0:
+            change = value / old - 1
+            if change < -tolerance:
+                regressions.append(f"{name}: {old:.1f} -> {value:.1f}/s ({change:+.0%})")
+    return regressions
+
+def print_latencies(title: str, results: Dict):
+    print(f"\n{title}")
+    print(f"{'':<40}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<40}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames-dir", help="recorded JPEG frames, ideally with faces")
+    parser.add_argument("--runs", type=int, default=200, help="timed calls per measurement")
+    parser.add_argument("--skip", default="", help="comma-separated groups to skip: stages, throughput, endpoints")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before a result counts as a regression")
+    args = parser.parse_args()
+    skip = set(filter(None, args.skip.split(",")))
+
+    # The endpoints write to a throwaway database, never the real one
+    tmp = tempfile.mkdtemp(prefix="studysync-bench-")
+    os.environ.setdefault("STUDYSYNC_DATABASE_URL", f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+    import config
+
+    frames = synthetic_frames(16)
+    recorded = recorded_frames(args.frames_dir)
+    face_frames = recorded or synthetic_face_frames(16)
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "emotion_backend": config.EMOTION_BACKEND,
+            "face_detector": config.FACE_DETECTOR,
+            "recorded_frames": len(recorded),
+        },
+        "peak_rss_mib": {},
+    }
+    if "stages" not in skip:
+        results["stages"] = bench_stages(frames, face_frames, args.runs)
+        results["peak_rss_mib"]["after_stages"] = peak_rss_mib()
+        print_latencies("stages", results["stages"])
+    if "throughput" not in skip:
+        results["throughput"] = bench_throughput(face_frames, max(10, args.runs // 4))
+        results["peak_rss_mib"]["after_throughput"] = peak_rss_mib()
+        print(f"\n{'throughput':<12}{'model faces/s':>15}{'analyze_frames frames/s':>25}")
+        for name, r in results["throughput"].items():
+            print(f"{name:<12}{r['model']['items_per_s']:>15.1f}{r['analyze_frames']['items_per_s']:>25.1f}")
+    if "endpoints" not in skip:
+        results["endpoints"] = bench_endpoints(face_frames, max(10, args.runs // 4))
+        results["peak_rss_mib"]["after_endpoints"] = peak_rss_mib()
+        print_latencies("endpoints", results["endpoints"])
+    print(f"\npeak RSS: {peak_rss_mib():.1f} MiB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare({k: v for k, v in results.items() if k != "environment"}, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
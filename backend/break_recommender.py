@@ -0,0 +1,57 @@
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Deque, Tuple
+
+import config
+
+class BreakRecommender:
+    """Streaming version of ``focus_detector.should_recommend_break`` for one session.
+
+    Keeps the attention scores of the last ``window_seconds`` in a deque with
+    a running sum, so each frame costs O(1) amortized instead of a scan of
+    the whole history. A break is recommended once at least ``min_samples``
+    frames have been seen and the window's average drops below
+    ``threshold``. At most ``max_samples`` scores are kept, which bounds
+    memory even at high frame rates.
+    """
+
+    def __init__(self, window_seconds: float = config.BREAK_WINDOW_SECONDS,
+                 threshold: float = config.BREAK_ATTENTION_THRESHOLD,
+                 min_samples: int = config.BREAK_MIN_SAMPLES,
+                 max_samples: int = config.BREAK_MAX_SAMPLES):
+        self.window = timedelta(seconds=window_seconds)
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.samples_seen = 0
+        self._scores: Deque[Tuple[datetime, float]] = deque()
+        self._sum = 0.0
+
+    def update(self, timestamp: datetime, attention_score: float) -> bool:
+        """Add one frame's score and return whether a break is recommended now."""
+        if len(self._scores) >= self.max_samples:
+            self._sum -= self._scores.popleft()[1]
+        self._scores.append((timestamp, attention_score))
+        self._sum += attention_score
+        self.samples_seen += 1
+        self._evict(timestamp)
+        return self.recommended()
+
+    def recommended(self) -> bool:
+        if self.samples_seen < self.min_samples or not self._scores:
+            return False
+        return self.average() < self.threshold
+
+    def average(self) -> float:
+        return self._sum / len(self._scores) if self._scores else 0.0
+
+    def _evict(self, now: datetime):
+        cutoff = now - self.window
+        while self._scores and self._scores[0][0] <= cutoff:
+            self._sum -= self._scores.popleft()[1]
+        if not self._scores:
+            # Drop accumulated float error whenever the window empties
+            self._sum = 0.0
+
+    def __len__(self) -> int:
+        return len(self._scores)
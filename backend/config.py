@@ -0,0 +1,132 @@
+import os
+
+# Runtime settings for the backend. Every value can be overridden through an
+# environment variable so deployments can tune serving without code changes.
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+# Emotion model and the runtime that executes it: "tf" (Keras .h5), "onnx" (ONNX Runtime CPU,
+# float32 or INT8) or "tflite" (TFLite interpreter, e.g. the INT8 model from export_quantized.py)
+EMOTION_BACKEND = os.environ.get("STUDYSYNC_EMOTION_BACKEND", "tf")
+_DEFAULT_MODEL_PATHS = {
+    "tf": "models/emotion_model.h5",
+    "onnx": "models/emotion_model.onnx",
+    "tflite": "models/emotion_model_int8.tflite",
+}
+EMOTION_MODEL_PATH = os.environ.get(
+    "STUDYSYNC_EMOTION_MODEL_PATH", _DEFAULT_MODEL_PATHS.get(EMOTION_BACKEND, "models/emotion_model.h5")
+)
+
+# Micro-batching of emotion inference across concurrent requests. A lone sample
+# is predicted at once; BATCH_MAX_WAIT_MS only applies when others are queued.
+BATCH_MAX_SIZE = _env_int("STUDYSYNC_BATCH_MAX_SIZE", 32)
+BATCH_MAX_WAIT_MS = _env_float("STUDYSYNC_BATCH_MAX_WAIT_MS", 10.0)
+
+# Executor that runs frame analysis off the event loop: "thread" or "process".
+# 0 workers picks a default (BATCH_MAX_SIZE threads, or one process per core).
+INFERENCE_POOL_KIND = os.environ.get("STUDYSYNC_INFERENCE_POOL", "thread")
+INFERENCE_WORKERS = _env_int("STUDYSYNC_INFERENCE_WORKERS", 0)
+
+# Per-session face tracking: search around the last face box, and rescan the
+# whole frame when the face is lost or every TRACKER_FULL_SCAN_EVERY frames.
+TRACKER_EXPAND = _env_float("STUDYSYNC_TRACKER_EXPAND", 0.5)
+TRACKER_SIZE_TOLERANCE = _env_float("STUDYSYNC_TRACKER_SIZE_TOLERANCE", 0.3)
+TRACKER_FULL_SCAN_EVERY = _env_int("STUDYSYNC_TRACKER_FULL_SCAN_EVERY", 10)
+MAX_TRACKED_SESSIONS = _env_int("STUDYSYNC_MAX_TRACKED_SESSIONS", 1000)
+
+# Face detection: "haar", "haar_downscaled", "dnn_ssd" or "yunet". The DNN
+# detectors load their weights from local model files; if those are missing
+# the Haar cascade is used instead.
+FACE_DETECTOR = os.environ.get("STUDYSYNC_FACE_DETECTOR", "haar")
+HAAR_SCALE_FACTOR = _env_float("STUDYSYNC_HAAR_SCALE_FACTOR", 1.1)
+HAAR_MIN_NEIGHBORS = _env_int("STUDYSYNC_HAAR_MIN_NEIGHBORS", 4)
+HAAR_DOWNSCALE = _env_float("STUDYSYNC_HAAR_DOWNSCALE", 0.5)
+DNN_FACE_MODEL_PATH = os.environ.get("STUDYSYNC_DNN_FACE_MODEL_PATH", "models/res10_300x300_ssd_iter_140000.caffemodel")
+DNN_FACE_CONFIG_PATH = os.environ.get("STUDYSYNC_DNN_FACE_CONFIG_PATH", "models/deploy.prototxt")
+YUNET_MODEL_PATH = os.environ.get("STUDYSYNC_YUNET_MODEL_PATH", "models/face_detection_yunet_2023mar.onnx")
+DNN_FACE_CONFIDENCE = _env_float("STUDYSYNC_DNN_FACE_CONFIDENCE", 0.5)
+
+# /analyze_focus_batch/: frames accepted per request, and faces per model call
+BATCH_ENDPOINT_MAX_FRAMES = _env_int("STUDYSYNC_BATCH_ENDPOINT_MAX_FRAMES", 1000)
+OFFLINE_BATCH_SIZE = _env_int("STUDYSYNC_OFFLINE_BATCH_SIZE", 256)
+
+# Break recommendation: a break is suggested once BREAK_MIN_SAMPLES frames have
+# been seen and the average attention over the last BREAK_WINDOW_SECONDS falls
+# below BREAK_ATTENTION_THRESHOLD. At most BREAK_MAX_SAMPLES scores are kept per session.
+BREAK_WINDOW_SECONDS = _env_float("STUDYSYNC_BREAK_WINDOW_SECONDS", 300.0)
+BREAK_ATTENTION_THRESHOLD = _env_float("STUDYSYNC_BREAK_ATTENTION_THRESHOLD", 40.0)
+BREAK_MIN_SAMPLES = _env_int("STUDYSYNC_BREAK_MIN_SAMPLES", 10)
+BREAK_MAX_SAMPLES = _env_int("STUDYSYNC_BREAK_MAX_SAMPLES", 3000)
+
+# Near-duplicate frame cache per session. A frame whose perceptual hash is
+# within FRAME_CACHE_MAX_DISTANCE bits (of 64) of a recent one reuses its
+# result. A size of 0 disables the cache.
+FRAME_CACHE_SIZE = _env_int("STUDYSYNC_FRAME_CACHE_SIZE", 16)
+FRAME_CACHE_TTL_SECONDS = _env_float("STUDYSYNC_FRAME_CACHE_TTL_SECONDS", 15.0)
+FRAME_CACHE_MAX_DISTANCE = _env_int("STUDYSYNC_FRAME_CACHE_MAX_DISTANCE", 3)
+
+# Multi-face analysis (/analyze_faces/): at most MULTI_FACE_MAX_FACES faces per
+# frame, largest first. Faces of a session keep their id while their box
+# overlaps the previous one by FACE_ID_MIN_IOU and they were seen within FACE_ID_TTL_SECONDS.
+MULTI_FACE_MAX_FACES = _env_int("STUDYSYNC_MULTI_FACE_MAX_FACES", 16)
+FACE_ID_MIN_IOU = _env_float("STUDYSYNC_FACE_ID_MIN_IOU", 0.3)
+FACE_ID_TTL_SECONDS = _env_float("STUDYSYNC_FACE_ID_TTL_SECONDS", 30.0)
+
+# Frames are decoded straight to grayscale at 1/DECODE_REDUCTION scale (1, 2, 4 or 8).
+# Face detection runs on the reduced frame, so faces smaller than about
+# 24 * DECODE_REDUCTION px are missed; 1 keeps the original full-resolution recall.
+DECODE_REDUCTION = _env_int("STUDYSYNC_DECODE_REDUCTION", 2)
+
+# Write-behind buffer for per-frame rows: flushed in one transaction once
+# WRITE_BUFFER_MAX_ROWS frames are pending or every WRITE_BUFFER_FLUSH_SECONDS
+WRITE_BUFFER_MAX_ROWS = _env_int("STUDYSYNC_WRITE_BUFFER_MAX_ROWS", 500)
+WRITE_BUFFER_FLUSH_SECONDS = _env_float("STUDYSYNC_WRITE_BUFFER_FLUSH_SECONDS", 2.0)
+# A session's frames that fail WRITE_BUFFER_MAX_ATTEMPTS flushes in a row are
+# written one by one and those still failing are appended, as JSON lines, to
+# WRITE_BUFFER_DEAD_LETTER_PATH (empty: only logged)
+WRITE_BUFFER_MAX_ATTEMPTS = _env_int("STUDYSYNC_WRITE_BUFFER_MAX_ATTEMPTS", 5)
+WRITE_BUFFER_DEAD_LETTER_PATH = os.environ.get("STUDYSYNC_WRITE_BUFFER_DEAD_LETTER_PATH", "write_buffer_dead_letter.jsonl")
+
+# How FocusLog/AttentionRecord rows store emotions: "json", or a packed "float16"/"float32" vector
+EMOTION_STORAGE = os.environ.get("STUDYSYNC_EMOTION_STORAGE", "json")
+
+# Storage. SQLite connections run in WAL mode with synchronous=NORMAL and
+# memory-mapped reads; a pool of connections serves concurrent readers.
+DATABASE_URL = os.environ.get("STUDYSYNC_DATABASE_URL", "sqlite:///./test.db")
+DB_POOL_SIZE = _env_int("STUDYSYNC_DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = _env_int("STUDYSYNC_DB_MAX_OVERFLOW", 20)
+DB_BUSY_TIMEOUT_SECONDS = _env_float("STUDYSYNC_DB_BUSY_TIMEOUT_SECONDS", 10.0)
+SQLITE_MMAP_SIZE = _env_int("STUDYSYNC_SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+SQLITE_CACHE_KIB = _env_int("STUDYSYNC_SQLITE_CACHE_KIB", 64 * 1024)
+
+# /session_metrics/: default and largest page of raw metrics, and the smallest
+# downsampling bucket. Streamed (NDJSON) responses read METRICS_PAGE_SIZE rows at a time.
+METRICS_PAGE_SIZE = _env_int("STUDYSYNC_METRICS_PAGE_SIZE", 1000)
+METRICS_MAX_PAGE_SIZE = _env_int("STUDYSYNC_METRICS_MAX_PAGE_SIZE", 10000)
+METRICS_MIN_BUCKET_SECONDS = _env_int("STUDYSYNC_METRICS_MIN_BUCKET_SECONDS", 1)
+
+# /analytics/: periods returned when no range is given, and the most one request may span
+ANALYTICS_DEFAULT_PERIODS = _env_int("STUDYSYNC_ANALYTICS_DEFAULT_PERIODS", 30)
+ANALYTICS_MAX_PERIODS = _env_int("STUDYSYNC_ANALYTICS_MAX_PERIODS", 2000)
+
+# Longest gap between two focused frames that still counts as focused time
+FOCUS_GAP_CAP_SECONDS = _env_float("STUDYSYNC_FOCUS_GAP_CAP_SECONDS", 10.0)
+
+# Prometheus-text /metrics: per-stage latency histograms and hot-path counters.
+# With SLOW_FRAME_MS > 0, a SLOW_FRAME_SAMPLE_RATE fraction of the frames that
+# take at least that long is logged with its per-stage timings.
+METRICS_ENABLED = bool(_env_int("STUDYSYNC_METRICS_ENABLED", 1))
+SLOW_FRAME_MS = _env_float("STUDYSYNC_SLOW_FRAME_MS", 0.0)
+SLOW_FRAME_SAMPLE_RATE = _env_float("STUDYSYNC_SLOW_FRAME_SAMPLE_RATE", 0.1)
+
+# serve.py: preforked API workers (0 = one per core). A worker whose private
+# memory exceeds WORKER_MAX_MEMORY_MIB (0 = no limit) is replaced, as is one
+# that isn't ready within WORKER_READY_TIMEOUT_SECONDS of being started.
+WORKERS = _env_int("STUDYSYNC_WORKERS", 0)
+WORKER_MAX_MEMORY_MIB = _env_int("STUDYSYNC_WORKER_MAX_MEMORY_MIB", 0)
+WORKER_READY_TIMEOUT_SECONDS = _env_float("STUDYSYNC_WORKER_READY_TIMEOUT_SECONDS", 120.0)
+WORKER_CHECK_SECONDS = _env_float("STUDYSYNC_WORKER_CHECK_SECONDS", 5.0)
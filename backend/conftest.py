@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+import cv2
+import numpy as np
+import pytest
+
+from synthetic_faces import face_jpeg
+
+# Set before any test imports config: tests that import main must never touch the real database
+os.environ["STUDYSYNC_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="studysync-test-"), "test.db")
+
+def blank_jpeg(width: int = 640, height: int = 480) -> bytes:
+    return cv2.imencode(".jpg", np.full((height, width, 3), 128, np.uint8))[1].tobytes()
+
+@pytest.fixture(scope="session")
+def face_frame() -> bytes:
+    return face_jpeg()
+
+@pytest.fixture(scope="session")
+def no_face_frame() -> bytes:
+    return blank_jpeg()
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a fresh SQLite database with every table created, like ``database.SessionLocal``."""
+    # Imported here: config must only be read once the environment above is set
+    from sqlalchemy.orm import sessionmaker
+    import models
+    from database import create_db_engine
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+@pytest.fixture
+def db(session_factory):
+    db = session_factory()
+    yield db
+    db.close()
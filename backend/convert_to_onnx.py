@@ -1,24 +1,32 @@
+import sys
 import tensorflow as tf
 import tf2onnx
 import os
 
-def convert_h5_to_onnx():
-    """Convert the H5 emotion model to ONNX format"""
+def keras_to_onnx(model, output_path):
+    """Write a loaded Keras model as float32 ONNX with a dynamic batch dimension"""
+    # Define input signature for ONNX conversion
+    spec = (tf.TensorSpec((None, 48, 48, 1), tf.float32, name="input"),)
+    
+    # Traced as a tf.function: tf2onnx's from_keras can't read Keras 3 models
+    forward = tf.function(lambda x: model(x, training=False), input_signature=spec)
+    model_proto, _ = tf2onnx.convert.from_function(forward, input_signature=spec, output_path=output_path)
+    return model_proto
+
+def convert_h5_to_onnx(h5_path='models/emotion_model.h5', output_path='models/emotion_model.onnx'):
+    """Convert the H5 emotion model (or the distilled student) to ONNX format"""
     print("Loading H5 model...")
     
     # Load the TensorFlow model
-    model = tf.keras.models.load_model('models/emotion_model.h5')
+    model = tf.keras.models.load_model(h5_path)
     
     print("Converting to ONNX...")
     
-    # Define input signature for ONNX conversion
-    spec = (tf.TensorSpec((None, 48, 48, 1), tf.float32, name="input"),)
-    
     # Convert to ONNX
-    output_path = 'models/emotion_model.onnx'
-    model_proto, _ = tf2onnx.convert.from_keras(model, input_signature=spec, output_path=output_path)
+    keras_to_onnx(model, output_path)
     
-    print("ONNX model saved successfully at models/emotion_model.onnx!")
+    print(f"ONNX model saved successfully at {output_path}!")
 
 if __name__ == "__main__":
-    convert_h5_to_onnx() 
\ No newline at end of file
+    # python convert_to_onnx.py [model.h5 [model.onnx]]
+    convert_h5_to_onnx(*sys.argv[1:3]) 
\ No newline at end of file
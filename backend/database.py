@@ -1,8 +1,34 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import config
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the writer; NORMAL sync is durable across app crashes in WAL mode
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{config.SQLITE_CACHE_KIB}")
+    cursor.close()
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, tuned: bool = True) -> Engine:
+    """Create an engine with pooled connections and, for SQLite, WAL journaling and mmap reads."""
+    parsed = make_url(url)
+    kwargs = {}
+    if parsed.get_backend_name() == "sqlite":
+        kwargs["connect_args"] = {"check_same_thread": False, "timeout": config.DB_BUSY_TIMEOUT_SECONDS}
+    if parsed.database not in (None, "", ":memory:"):
+        kwargs["pool_size"] = config.DB_POOL_SIZE
+        kwargs["max_overflow"] = config.DB_MAX_OVERFLOW
+    engine = create_engine(url, **kwargs)
+    if tuned and parsed.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
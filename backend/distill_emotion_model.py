@@ -0,0 +1,185 @@
+"""Distill the emotion model into the lightweight student for CPU serving.
+
+The student (``train_emotion_model.build_student``) is trained on a mix of
+the true labels and the teacher's temperature-softened probabilities.
+Afterwards both models are compared on parameters, FLOPs per frame,
+single-frame CPU latency through the serving backend, and validation
+accuracy. The report is written as JSON. The student is saved only if its
+accuracy is within ``--max-accuracy-drop`` of the teacher's; otherwise the
+script exits with status 1.
+
+    python distill_emotion_model.py --teacher models/emotion_model.h5 --output models/emotion_model_student.h5
+
+The student takes the same (48, 48, 1) input and returns the same 7
+probabilities, so it's served by pointing STUDYSYNC_EMOTION_MODEL_PATH at it.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+import numpy as np
+import tensorflow as tf
+
+import training_data
+from inference_backend import load_backend
+from train_emotion_model import build_student
+
+def soften(probs, temperature: float):
+    # softmax(log(p) / T) softens probabilities the way dividing logits by T would
+    return tf.nn.softmax(tf.math.log(probs + 1e-7) / temperature)
+
+def distillation_loss(labels, teacher_probs, student_probs, temperature: float, alpha: float):
+    """``alpha`` x cross-entropy on the labels + (1 - ``alpha``) x T² x KL(teacher || student) at temperature T."""
+    hard = tf.keras.losses.sparse_categorical_crossentropy(labels, student_probs)
+    teacher_soft, student_soft = soften(teacher_probs, temperature), soften(student_probs, temperature)
+    soft = tf.reduce_sum(teacher_soft * (tf.math.log(teacher_soft + 1e-7) - tf.math.log(student_soft + 1e-7)), axis=-1)
+    return tf.reduce_mean(alpha * hard + (1 - alpha) * temperature ** 2 * soft)
+
+def accuracy(model, dataset) -> float:
+    correct = total = 0
+    for images, labels in dataset:
+        predictions = np.argmax(model(images, training=False), axis=-1)
+        correct += int(np.sum(predictions == labels.numpy()))
+        total += len(predictions)
+    return correct / total if total else 0.0
+
+def distill(teacher, student, train_ds, val_ds, epochs: int, temperature: float, alpha: float,
+            learning_rate: float, patience: int) -> float:
+    """Train the student; keeps the weights with the best validation accuracy and returns it."""
+    optimizer = tf.keras.optimizers.Adam(learning_rate)
+
+    @tf.function
+    def train_step(images, labels):
+        teacher_probs = teacher(images, training=False)
+        with tf.GradientTape() as tape:
+            student_probs = student(images, training=True)
+            loss = distillation_loss(labels, teacher_probs, student_probs, temperature, alpha)
+        gradients = tape.gradient(loss, student.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, student.trainable_variables))
+        return loss
+
+    best_accuracy, best_weights, stale = -1.0, None, 0
+    for epoch in range(epochs):
+        losses = [float(train_step(images, labels)) for images, labels in train_ds]
+        val_accuracy = accuracy(student, val_ds)
+        print(f"Epoch {epoch + 1}/{epochs} - loss: {statistics.fmean(losses):.4f} - val_accuracy: {val_accuracy:.4f}")
+        if val_accuracy > best_accuracy:
+            best_accuracy, best_weights, stale = val_accuracy, student.get_weights(), 0
+        else:
+            stale += 1
+            if stale >= patience:
+                break
+    student.set_weights(best_weights)
+    return best_accuracy
+
+def count_flops(model) -> int:
+    """Floating-point operations (2 per multiply-add) of one frame through the conv and dense layers."""
+    macs = 0
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind not in ("Conv2D", "SeparableConv2D", "DepthwiseConv2D", "Dense"):
+            continue
+        in_channels = layer.input.shape[-1]
+        out_positions = int(np.prod(layer.output.shape[1:-1]))
+        out_channels = layer.output.shape[-1]
+        if kind == "Dense":
+            macs += in_channels * out_channels
+            continue
+        kernel = int(np.prod(layer.kernel_size))
+        if kind == "Conv2D":
+            macs += out_positions * kernel * in_channels * out_channels
+        elif kind == "DepthwiseConv2D":
+            macs += out_positions * kernel * out_channels
+        else:
+            multiplier = layer.depth_multiplier
+            macs += out_positions * kernel * in_channels * multiplier
+            macs += out_positions * in_channels * multiplier * out_channels
+    return 2 * macs
+
+def frame_latency_ms(model_path: str, runs: int) -> Dict[str, float]:
+    """Single-frame latency through the TensorFlow serving backend, as focus_detector calls it."""
+    backend = load_backend(model_path, "tf")
+    frame = np.random.default_rng(0).random((1, 48, 48, 1), dtype=np.float32)
+    for _ in range(10):
+        backend.predict(frame)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.predict(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"p50": timings[len(timings) // 2], "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))]}
+
+def describe(model, model_path: str, val_ds, runs: int) -> Dict:
+    return {
+        "path": model_path,
+        "parameters": int(model.count_params()),
+        "mflops_per_frame": count_flops(model) / 1e6,
+        "file_bytes": os.path.getsize(model_path),
+        "latency_ms": frame_latency_ms(model_path, runs),
+        "val_accuracy": accuracy(model, val_ds),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teacher", default="models/emotion_model.h5")
+    parser.add_argument("--shards", default="data/shards", help="training_data.py shard directory")
+    parser.add_argument("--output", default="models/emotion_model_student.h5")
+    parser.add_argument("--report", default="models/distillation_report.json")
+    parser.add_argument("--width", type=int, default=32, help="filters of the student's first convolution")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--learning-rate", type=float, default=2e-3)
+    parser.add_argument("--temperature", type=float, default=4.0)
+    parser.add_argument("--alpha", type=float, default=0.1, help="weight of the hard-label loss")
+    parser.add_argument("--patience", type=int, default=5)
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.02,
+                        help="largest allowed drop in validation accuracy versus the teacher")
+    parser.add_argument("--latency-runs", type=int, default=200)
+    args = parser.parse_args()
+
+    teacher = tf.keras.models.load_model(args.teacher)
+    student = build_student(args.width)
+    train_ds = training_data.make_dataset(args.shards, "train", batch_size=args.batch_size)
+    val_ds = training_data.make_dataset(args.shards, "val", batch_size=args.batch_size, cache="")
+
+    distill(teacher, student, train_ds, val_ds, args.epochs, args.temperature, args.alpha,
+            args.learning_rate, args.patience)
+
+    # The student is measured from a saved file, through the same loader serving uses
+    with tempfile.TemporaryDirectory() as tmp:
+        candidate = os.path.join(tmp, os.path.basename(args.output))
+        student.save(candidate)
+        report = {"teacher": describe(teacher, args.teacher, val_ds, args.latency_runs),
+                  "student": describe(student, candidate, val_ds, args.latency_runs)}
+        drop = report["teacher"]["val_accuracy"] - report["student"]["val_accuracy"]
+        report["accuracy_drop"] = drop
+        report["max_accuracy_drop"] = args.max_accuracy_drop
+        report["passed"] = drop <= args.max_accuracy_drop
+        report["student"]["path"] = args.output if report["passed"] else None
+        if report["passed"]:
+            os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+            student.save(args.output)
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'':<10}{'params':>10}{'MFLOPs':>10}{'p50 ms':>9}{'p95 ms':>9}{'val acc':>9}")
+    for name in ("teacher", "student"):
+        r = report[name]
+        print(f"{name:<10}{r['parameters']:>10}{r['mflops_per_frame']:>10.2f}{r['latency_ms']['p50']:>9.2f}"
+              f"{r['latency_ms']['p95']:>9.2f}{r['val_accuracy']:>9.4f}")
+    if not report["passed"]:
+        print(f"Student accuracy dropped by {drop:.4f} (> {args.max_accuracy_drop}); not saved", file=sys.stderr)
+        sys.exit(1)
+    print(f"Student saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
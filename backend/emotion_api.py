@@ -1,41 +1,15 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from emotion_predictor import EmotionPredictor
-import base64
-from io import BytesIO
-from PIL import Image
-import numpy as np
+"""Former Flask emotion server, kept as an entry point for clients that still call port 5001.
 
-app = Flask(__name__)
-CORS(app)
+The emotion routes (``/predict_emotion``, ``/predict_emotion/raw``,
+``/emotions``, ``/health``, ``/metrics``) are part of ``main.app`` now and
+share its model. This serves that same app on the old port; don't run it
+next to ``main.py``, which would load a second model copy again. Point
+clients at the main server instead.
+"""
+import uvicorn
 
-predictor = EmotionPredictor('models/emotion_model.h5')
-
-@app.route('/predict_emotion', methods=['POST'])
-def predict_emotion():
-    data = request.get_json()
-    img_data = data['image']
-    if img_data.startswith('data:image'):
-        img_data = img_data.split(',')[1]
-    img_bytes = base64.b64decode(img_data)
-    img = Image.open(BytesIO(img_bytes)).convert('RGB')
-    img_np = np.array(img)
-    result = predictor.predict(img_np)
-    return jsonify(result)
-
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'model_loaded': True})
-
-@app.route('/emotions', methods=['GET'])
-def get_emotions():
-    """Get list of available emotions"""
-    return jsonify({
-        'emotions': predictor.labels
-    })
+from main import app
 
 if __name__ == '__main__':
-    print("Starting Emotion API server...")
-    print(f"Available emotions: {predictor.labels}")
-    app.run(debug=True, host='0.0.0.0', port=5001) 
\ No newline at end of file
+    print("Starting StudySync API (emotion + focus routes) on the emotion API port...")
+    uvicorn.run(app, host='0.0.0.0', port=5001)
@@ -0,0 +1,94 @@
+"""Compact storage of per-frame emotion vectors.
+
+With ``STUDYSYNC_EMOTION_STORAGE=float16`` (or ``float32``) new FocusLog
+and AttentionRecord rows store their emotions as a packed little-endian
+vector in label order (14 or 28 bytes) in ``emotions_blob`` instead of a
+JSON dict. The ``emotions`` attribute of either model decodes whichever
+form a row has, so existing callers keep working on mixed tables.
+
+Rows written as JSON can be converted in place:
+
+    python emotion_codec.py            # to STUDYSYNC_EMOTION_STORAGE, or float16 if that is json
+    python emotion_codec.py --vacuum   # and give the freed pages back to the OS
+"""
+import argparse
+import struct
+from typing import Dict, Optional
+
+import numpy as np
+
+import config
+
+EMOTION_LABELS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+DTYPES = {"float16": np.dtype("<f2"), "float32": np.dtype("<f4")}
+# struct packs and unpacks one 7-value row several times faster than numpy does
+_STRUCTS = {storage: struct.Struct(f"<{len(EMOTION_LABELS)}{dtype.char}") for storage, dtype in DTYPES.items()}
+# The blob length tells the two widths apart
+_DTYPE_BY_SIZE = {len(EMOTION_LABELS) * dtype.itemsize: dtype for dtype in DTYPES.values()}
+_STRUCT_BY_SIZE = {packer.size: packer for packer in _STRUCTS.values()}
+
+def encode(emotions: Optional[Dict[str, float]], storage: str) -> Optional[bytes]:
+    """Pack an emotion dict into a blob; ``{}`` (no face) becomes an empty blob."""
+    if emotions is None:
+        return None
+    if not emotions:
+        return b""
+    return _STRUCTS[storage].pack(*(emotions.get(label, 0.0) for label in EMOTION_LABELS))
+
+def decode_array(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=_DTYPE_BY_SIZE[len(blob)]).astype(np.float32)
+
+def decode(blob: Optional[bytes]) -> Optional[Dict[str, float]]:
+    if blob is None:
+        return None
+    if not blob:
+        return {}
+    return dict(zip(EMOTION_LABELS, _STRUCT_BY_SIZE[len(blob)].unpack(blob)))
+
+def storage_values(emotions: Optional[Dict[str, float]], storage: str = config.EMOTION_STORAGE) -> Dict:
+    """Values of the ``emotions_json`` and ``emotions_blob`` attributes for a new row."""
+    if storage == "json":
+        return {"emotions_json": emotions, "emotions_blob": None}
+    return {"emotions_json": None, "emotions_blob": encode(emotions, storage)}
+
+def row_emotions(emotions_json: Optional[Dict], emotions_blob: Optional[bytes]) -> Optional[Dict[str, float]]:
+    """Emotion dict of a row read as plain columns, whichever form it was stored in."""
+    return emotions_json if emotions_blob is None else decode(emotions_blob)
+
+def compact(db, model, storage: str, batch_size: int = 1000) -> int:
+    """Convert ``model`` rows still stored as JSON into blobs; returns the number of rows converted."""
+    converted = 0
+    while True:
+        rows = db.query(model.id, model.emotions_json).filter(
+            model.emotions_blob.is_(None), model.emotions_json.isnot(None)
+        ).limit(batch_size).all()
+        if not rows:
+            return converted
+        db.bulk_update_mappings(model, [
+            {"id": row.id, "emotions_json": None, "emotions_blob": encode(row.emotions_json, storage)} for row in rows
+        ])
+        db.commit()
+        converted += len(rows)
+
+if __name__ == "__main__":
+    import models
+    from database import SessionLocal, engine
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--storage", choices=sorted(DTYPES),
+                        default=config.EMOTION_STORAGE if config.EMOTION_STORAGE in DTYPES else "float16")
+    parser.add_argument("--vacuum", action="store_true")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        for model in (models.FocusLog, models.AttentionRecord):
+            print(f"{model.__tablename__}: converted {compact(db, model, args.storage)} rows to {args.storage}")
+    finally:
+        db.close()
+    if args.vacuum:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
@@ -1,33 +1,31 @@
-import tensorflow as tf
 import numpy as np
 import cv2
 from PIL import Image
 import os
-from typing import Dict
+from typing import Dict, Optional, Sequence
+from emotion_codec import EMOTION_LABELS
+from inference_backend import load_backend
+from preprocessing import to_model_input
+
+def prediction_result(probs: np.ndarray, labels: Sequence[str] = EMOTION_LABELS) -> Dict:
+    """Top emotion, its confidence and every probability, from one row of model output"""
+    top_idx = int(np.argmax(probs))
+    return {
+        "emotion": labels[top_idx],
+        "confidence": float(probs[top_idx]),
+        "probabilities": {label: float(prob) for label, prob in zip(labels, probs)}
+    }
 
 class EmotionPredictor:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, backend: Optional[str] = None):
         """Initialize the emotion predictor with the trained model"""
-        self.model = tf.keras.models.load_model(model_path)
+        self.model = load_backend(model_path, backend)
         self.labels = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
         
     def preprocess(self, img: np.ndarray) -> np.ndarray:
         """Preprocess image for emotion prediction"""
-        # Convert to grayscale if needed
-        if len(img.shape) == 3 and img.shape[2] == 3:
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Resize to 48x48
-        img = cv2.resize(img, (48, 48))
-        
-        # Normalize
-        img = img.astype(np.float32) / 255.0
-        
-        # Add batch and channel dimensions
-        img = np.expand_dims(img, axis=-1)
-        img = np.expand_dims(img, axis=0)
-        
-        return img
+        # Grayscale, 48x48, [0, 1] float32 with batch and channel dimensions
+        return to_model_input(img)[np.newaxis]
     
     def predict(self, img: np.ndarray) -> Dict:
         """Predict emotion from image"""
@@ -35,18 +33,9 @@ class EmotionPredictor:
         processed = self.preprocess(img)
         
         # Get prediction
-        pred = self.model.predict(processed, verbose=0)
-        
-        # Get emotion label and confidence
-        top_idx = int(np.argmax(pred[0]))
-        emotion = self.labels[top_idx]
-        confidence = pred[0][top_idx]
+        pred = self.model.predict(processed)
         
-        return {
-            "emotion": emotion,
-            "confidence": float(confidence),
-            "probabilities": {label: float(prob) for label, prob in zip(self.labels, pred[0])}
-        }
+        return prediction_result(pred[0], self.labels)
     
     def predict_from_file(self, file_path: str) -> Dict:
         """Predict emotion from image file"""
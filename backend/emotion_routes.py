@@ -0,0 +1,56 @@
+"""Emotion prediction routes, served by main.app alongside the focus routes.
+
+These were a separate Flask app with its own copy of the model. They now
+predict through focus_detector's shared model and micro-batcher, so one
+process holds one model. ``/predict_emotion`` keeps the old base64-in-JSON
+body; ``/predict_emotion/raw`` takes the encoded image as the request body,
+which is a third smaller and skips the base64 decode.
+"""
+import base64
+import binascii
+
+from fastapi import APIRouter, Body, HTTPException, Request
+
+import instrumentation
+from emotion_codec import EMOTION_LABELS
+from emotion_predictor import prediction_result
+from focus_detector import predict_image
+from inference_pool import inference_pool
+
+router = APIRouter()
+
+async def _predict(image_data: bytes) -> dict:
+    probs = await inference_pool.run(predict_image, image_data)
+    if probs is None:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+    return prediction_result(probs)
+
+@router.post("/predict_emotion")
+async def predict_emotion(image: str = Body(..., embed=True)):
+    """Predict the emotion of a face image sent as base64 (optionally a data URL) in ``{"image": ...}``."""
+    if image.startswith("data:image"):
+        image = image.split(",", 1)[1]
+    try:
+        image_data = base64.b64decode(image)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="image must be base64")
+    return await _predict(image_data)
+
+@router.post("/predict_emotion/raw")
+async def predict_emotion_raw(request: Request):
+    """Predict the emotion of a face image sent as the raw request body (e.g. ``Content-Type: image/jpeg``)."""
+    with instrumentation.stage("upload_read"):
+        image_data = await request.body()
+    if not image_data:
+        raise HTTPException(status_code=400, detail="Empty request body")
+    return await _predict(image_data)
+
+@router.get("/emotions")
+def get_emotions():
+    """Get list of available emotions"""
+    return {"emotions": list(EMOTION_LABELS)}
+
+@router.get("/health")
+def health_check():
+    """Health check of the emotion routes; ``model_loaded`` turns true once the model is warmed up"""
+    return {"status": "healthy", "model_loaded": inference_pool.ready}
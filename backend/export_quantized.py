@@ -0,0 +1,164 @@
+"""Export the emotion model as float32 and post-training INT8 variants and compare them.
+
+INT8 variants are calibrated on a random sample of 48x48 faces from the
+training split of ``training_data.py`` shards:
+
+- ``tflite``: full-integer TFLite model (float input and output), served with
+  STUDYSYNC_EMOTION_BACKEND=tflite
+- ``onnx``: statically quantized ONNX model (QDQ, per-channel int8 weights,
+  uint8 activations), served with STUDYSYNC_EMOTION_BACKEND=onnx
+
+Every variant, including the float32 .h5 and ONNX models, is then loaded
+through its serving backend and measured on the validation split. The
+report covers accuracy, top-1 agreement with the float32 model, file size
+and batch-1/batch-32 CPU latency.
+
+    python export_quantized.py --model models/emotion_model.h5 --shards data/shards --formats tflite,onnx
+
+The variants are written to ``models/quantized/`` so that an export never
+replaces the models the server loads; ``--in-place`` writes them next to
+``--model`` instead (e.g. ``models/emotion_model_int8.tflite``).
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+import numpy as np
+import tensorflow as tf
+
+import training_data
+from convert_to_onnx import keras_to_onnx
+from inference_backend import load_backend
+from preprocessing import FACE_SIZE
+
+def split_faces(shard_dir: str, split: str, count: int, seed: int = 0):
+    """Up to ``count`` randomly chosen faces of a split as model input, with their labels."""
+    shards = training_data.open_shards(shard_dir)
+    chunks = np.array(training_data.split_chunks(shard_dir, split), dtype=np.int64).reshape(-1, 3)
+    sizes = chunks[:, 2] - chunks[:, 1]
+    ends = np.cumsum(sizes)
+    total = int(ends[-1]) if len(ends) else 0
+    rng = np.random.default_rng(seed)
+    picked = np.sort(rng.choice(total, size=min(count, total), replace=False))
+    # Map positions in the split back to (shard, row) without listing every row of the split
+    chunk = np.searchsorted(ends, picked, side="right")
+    shard_ids = chunks[chunk, 0]
+    rows = chunks[chunk, 1] + picked - (ends[chunk] - sizes[chunk])
+    images = np.empty((len(picked), FACE_SIZE, FACE_SIZE), dtype=np.float32)
+    labels = np.empty(len(picked), dtype=np.int64)
+    for index in np.unique(shard_ids):
+        in_shard = shard_ids == index
+        shard_images, shard_labels = shards[index]
+        images[in_shard] = shard_images[rows[in_shard]]
+        labels[in_shard] = shard_labels[rows[in_shard]]
+    images /= 255.0
+    return images[..., np.newaxis], labels
+
+def export_tflite_int8(model, calibration: np.ndarray, output_path: str):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = lambda: ([face[np.newaxis]] for face in calibration)
+    # Integer kernels throughout; input and output stay float so the backend's callers don't change
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+def export_onnx_int8(float_path: str, calibration: np.ndarray, output_path: str, batch_size: int = 32):
+    from onnxruntime import InferenceSession
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    input_name = InferenceSession(float_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FaceReader(CalibrationDataReader):
+        def __init__(self):
+            self._batches = iter(range(0, len(calibration), batch_size))
+
+        def get_next(self):
+            start = next(self._batches, None)
+            return None if start is None else {input_name: calibration[start:start + batch_size]}
+
+    quantize_static(float_path, output_path, FaceReader(), quant_format=QuantFormat.QDQ, per_channel=True,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+def latency_ms(backend, batch: np.ndarray, runs: int) -> Dict[str, float]:
+    for _ in range(5):
+        backend.predict(batch)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.predict(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {"p50": timings[len(timings) // 2], "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))]}
+
+def evaluate(kind: str, path: str, faces: np.ndarray, labels: np.ndarray, reference: np.ndarray,
+             runs: int) -> Dict:
+    backend = load_backend(path, kind)
+    probs = np.concatenate([backend.predict(faces[i:i + 32]) for i in range(0, len(faces), 32)])
+    predictions = probs.argmax(axis=1)
+    return {
+        "backend": kind,
+        "path": path,
+        "file_bytes": os.path.getsize(path),
+        "val_accuracy": float(np.mean(predictions == labels)),
+        "top1_agreement": float(np.mean(predictions == reference.argmax(axis=1))),
+        "max_abs_prob_diff": float(np.abs(probs - reference).max()),
+        "batch1_ms": latency_ms(backend, faces[:1], runs),
+        "batch32_ms": latency_ms(backend, faces[:32], max(1, runs // 4)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="models/emotion_model.h5")
+    parser.add_argument("--shards", default="data/shards", help="training_data.py shard directory")
+    parser.add_argument("--formats", default="tflite,onnx", help="INT8 variants to export: tflite, onnx")
+    parser.add_argument("--calibration-samples", type=int, default=500)
+    parser.add_argument("--eval-samples", type=int, default=2000, help="validation faces used for the report")
+    parser.add_argument("--latency-runs", type=int, default=200)
+    parser.add_argument("--output-dir", default="models/quantized",
+                        help="where the exported variants are written")
+    parser.add_argument("--in-place", action="store_true",
+                        help="write the variants next to --model, replacing the files the server loads")
+    parser.add_argument("--report", default="models/quantization_report.json")
+    args = parser.parse_args()
+    formats = [name.strip() for name in args.formats.split(",") if name.strip()]
+
+    name = os.path.splitext(os.path.basename(args.model))[0]
+    output_dir = os.path.dirname(args.model) if args.in_place else args.output_dir
+    os.makedirs(output_dir or ".", exist_ok=True)
+    stem = os.path.join(output_dir, name)
+    model = tf.keras.models.load_model(args.model)
+    calibration, _ = split_faces(args.shards, "train", args.calibration_samples)
+    faces, labels = split_faces(args.shards, "val", args.eval_samples)
+    if len(faces) < 32:
+        raise SystemExit(f"Need at least 32 validation faces for the report, got {len(faces)}")
+
+    float_onnx = f"{stem}.onnx"
+    keras_to_onnx(model, float_onnx)
+    variants: List = [("keras_fp32", "tf", args.model), ("onnx_fp32", "onnx", float_onnx)]
+    if "tflite" in formats:
+        export_tflite_int8(model, calibration, f"{stem}_int8.tflite")
+        variants.append(("tflite_int8", "tflite", f"{stem}_int8.tflite"))
+    if "onnx" in formats:
+        export_onnx_int8(float_onnx, calibration, f"{stem}_int8.onnx")
+        variants.append(("onnx_int8", "onnx", f"{stem}_int8.onnx"))
+
+    reference = load_backend(args.model, "tf").predict(faces)
+    report = {"calibration_samples": len(calibration), "eval_samples": len(faces), "variants": {}}
+    for name, kind, path in variants:
+        report["variants"][name] = evaluate(kind, path, faces, labels, reference, args.latency_runs)
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'variant':<13}{'bytes':>10}{'val acc':>9}{'agree':>7}{'b1 p50 ms':>11}{'b1 p95 ms':>11}{'b32 p50 ms':>12}")
+    for name, r in report["variants"].items():
+        print(f"{name:<13}{r['file_bytes']:>10}{r['val_accuracy']:>9.4f}{r['top1_agreement']:>7.3f}"
+              f"{r['batch1_ms']['p50']:>11.3f}{r['batch1_ms']['p95']:>11.3f}{r['batch32_ms']['p50']:>12.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import logging
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]
+
+class FaceDetector:
+    """Finds faces in a grayscale frame, returned as ``(x, y, w, h)`` boxes."""
+
+    def detect(self, gray: np.ndarray, min_size: Optional[Tuple[int, int]] = None,
+               max_size: Optional[Tuple[int, int]] = None) -> List[Box]:
+        raise NotImplementedError
+
+    def __call__(self, gray: np.ndarray, min_size: Optional[Tuple[int, int]] = None,
+                 max_size: Optional[Tuple[int, int]] = None) -> List[Box]:
+        return self.detect(gray, min_size, max_size)
+
+def _require_files(*paths: str):
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        raise FileNotFoundError(f"Face detector model file not found: {', '.join(missing)}")
+
+def _within_size(box: Box, min_size: Optional[Tuple[int, int]], max_size: Optional[Tuple[int, int]]) -> bool:
+    _, _, w, h = box
+    if min_size and (w < min_size[0] or h < min_size[1]):
+        return False
+    if max_size and (w > max_size[0] or h > max_size[1]):
+        return False
+    return True
+
+class HaarDetector(FaceDetector):
+    """OpenCV Haar cascade over the whole frame it is given.
+
+    When serving, that frame is decoded at 1/STUDYSYNC_DECODE_REDUCTION scale
+    (half resolution by default), not at full resolution as the original
+    detector saw it. The cascade's smallest window is 24 px, so faces under
+    about 48 px in the camera frame are no longer found. Set
+    STUDYSYNC_DECODE_REDUCTION=1 for the original recall on small faces.
+    """
+
+    def __init__(self, cascade_path: Optional[str] = None,
+                 scale_factor: float = config.HAAR_SCALE_FACTOR,
+                 min_neighbors: int = config.HAAR_MIN_NEIGHBORS):
+        self.cascade = cv2.CascadeClassifier(
+            cascade_path or cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+        if self.cascade.empty():
+            raise ValueError(f"Could not load Haar cascade from {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detect(self, gray, min_size=None, max_size=None):
+        faces = self.cascade.detectMultiScale(
+            gray, self.scale_factor, self.min_neighbors,
+            minSize=min_size or (0, 0), maxSize=max_size or (0, 0),
+        )
+        return [tuple(int(v) for v in face) for face in faces]
+
+class DownscaledHaarDetector(HaarDetector):
+    """Haar cascade run on a frame shrunk by ``scale``, with boxes mapped back to the frame's size.
+
+    The shrink comes on top of the decode reduction: with the defaults the
+    cascade runs at quarter resolution and misses faces under about 96 px.
+    """
+
+    def __init__(self, scale: float = config.HAAR_DOWNSCALE, **kwargs):
+        super().__init__(**kwargs)
+        if not 0 < scale <= 1:
+            raise ValueError("scale must be in (0, 1]")
+        self.scale = scale
+
+    def detect(self, gray, min_size=None, max_size=None):
+        s = self.scale
+        small = cv2.resize(gray, None, fx=s, fy=s, interpolation=cv2.INTER_AREA)
+        small_min = (max(1, int(min_size[0] * s)), max(1, int(min_size[1] * s))) if min_size else None
+        small_max = (int(max_size[0] * s) + 1, int(max_size[1] * s) + 1) if max_size else None
+        faces = super().detect(small, small_min, small_max)
+        return [(int(x / s), int(y / s), int(w / s), int(h / s)) for x, y, w, h in faces]
+
+class DnnSsdDetector(FaceDetector):
+    """OpenCV DNN ResNet-10 SSD face detector (``deploy.prototxt`` + ``.caffemodel``)."""
+
+    def __init__(self, model_path: str = config.DNN_FACE_MODEL_PATH,
+                 config_path: str = config.DNN_FACE_CONFIG_PATH,
+                 confidence: float = config.DNN_FACE_CONFIDENCE, input_size: int = 300):
+        _require_files(model_path, config_path)
+        self.net = cv2.dnn.readNet(model_path, config_path)
+        self.confidence = confidence
+        self.input_size = input_size
+        # cv2.dnn.Net is not safe to run from several threads at once
+        self._lock = threading.Lock()
+
+    def detect(self, gray, min_size=None, max_size=None):
+        h, w = gray.shape[:2]
+        bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        blob = cv2.dnn.blobFromImage(bgr, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0))
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()
+        faces = []
+        for det in detections[0, 0]:
+            if det[2] < self.confidence:
+                continue
+            x0, y0 = int(max(0.0, det[3]) * w), int(max(0.0, det[4]) * h)
+            x1, y1 = int(min(1.0, det[5]) * w), int(min(1.0, det[6]) * h)
+            box = (x0, y0, x1 - x0, y1 - y0)
+            if box[2] > 0 and box[3] > 0 and _within_size(box, min_size, max_size):
+                faces.append(box)
+        return faces
+
+class YuNetDetector(FaceDetector):
+    """OpenCV ``FaceDetectorYN`` (YuNet) loaded from a local ONNX file."""
+
+    def __init__(self, model_path: str = config.YUNET_MODEL_PATH,
+                 confidence: float = config.DNN_FACE_CONFIDENCE):
+        _require_files(model_path)
+        self.detector = cv2.FaceDetectorYN.create(model_path, "", (320, 320), confidence)
+        self._lock = threading.Lock()
+
+    def detect(self, gray, min_size=None, max_size=None):
+        h, w = gray.shape[:2]
+        bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        with self._lock:
+            self.detector.setInputSize((w, h))
+            _, detections = self.detector.detect(bgr)
+        if detections is None:
+            return []
+        faces = []
+        for det in detections:
+            # YuNet boxes can reach past the frame's edges; clip them as the SSD boxes are
+            x0, y0 = max(0, int(det[0])), max(0, int(det[1]))
+            x1, y1 = min(w, int(det[0] + det[2])), min(h, int(det[1] + det[3]))
+            box = (x0, y0, x1 - x0, y1 - y0)
+            if box[2] > 0 and box[3] > 0 and _within_size(box, min_size, max_size):
+                faces.append(box)
+        return faces
+
+DETECTORS = {
+    "haar": HaarDetector,
+    "haar_downscaled": DownscaledHaarDetector,
+    "dnn_ssd": DnnSsdDetector,
+    "yunet": YuNetDetector,
+}
+
+def create_detector(name: Optional[str] = None, fallback: bool = True) -> FaceDetector:
+    """Build the configured face detector (``STUDYSYNC_FACE_DETECTOR``).
+
+    A DNN detector whose model files are missing is replaced by the Haar
+    cascade (with a warning) unless ``fallback`` is False.
+    """
+    name = name or config.FACE_DETECTOR
+    if name not in DETECTORS:
+        raise ValueError(f"Unknown face detector: {name}")
+    try:
+        return DETECTORS[name]()
+    except FileNotFoundError as e:
+        if not fallback:
+            raise
+        logger.warning("%s; using the Haar cascade instead of %s", e, name)
+        return HaarDetector()
@@ -0,0 +1,81 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import config
+from break_recommender import BreakRecommender
+
+Box = Tuple[int, int, int, int]
+
+def iou_matrix(a: Sequence[Box], b: Sequence[Box]) -> np.ndarray:
+    """Intersection over union of every box in ``a`` with every box in ``b``, as an ``(len(a), len(b))`` array."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(1, -1, 4)
+    left, top = np.maximum(a[..., 0], b[..., 0]), np.maximum(a[..., 1], b[..., 1])
+    right = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2])
+    bottom = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3])
+    inter = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+class Identity:
+    """One person seen by a shared camera, with their own break recommendation."""
+
+    def __init__(self, identity_id: int, box: Box, timestamp: datetime):
+        self.id = identity_id
+        self.box = box
+        self.last_seen = timestamp
+        self.recommender = BreakRecommender()
+
+class FaceIdentities:
+    """Keeps face ids stable from frame to frame for one session's camera.
+
+    People at a study table barely move between frames, so each face is
+    matched to the identity whose last box overlaps it most, best pairs
+    first, as long as the overlap (IoU) is at least ``min_iou``. Unmatched
+    faces become new identities; identities not seen for ``ttl_seconds``
+    are forgotten. This is a cheap positional association, not face
+    recognition: someone who leaves and comes back gets a new id.
+    """
+
+    def __init__(self, min_iou: float = config.FACE_ID_MIN_IOU,
+                 ttl_seconds: float = config.FACE_ID_TTL_SECONDS):
+        self.min_iou = min_iou
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._identities: Dict[int, Identity] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def assign(self, boxes: Sequence[Box], timestamp: datetime) -> List[Identity]:
+        """The identity of each box, in the order of ``boxes``."""
+        with self._lock:
+            cutoff = timestamp - self.ttl
+            for identity_id in [i for i, identity in self._identities.items() if identity.last_seen < cutoff]:
+                del self._identities[identity_id]
+
+            known = list(self._identities.values())
+            assigned: List[Identity] = [None] * len(boxes)
+            if boxes and known:
+                overlaps = iou_matrix(boxes, [identity.box for identity in known])
+                used = set()
+                for flat in np.argsort(overlaps, axis=None)[::-1]:
+                    face, candidate = divmod(int(flat), len(known))
+                    if overlaps[face, candidate] < self.min_iou:
+                        break
+                    if assigned[face] is None and candidate not in used:
+                        assigned[face] = known[candidate]
+                        used.add(candidate)
+
+            for i, box in enumerate(boxes):
+                identity = assigned[i]
+                if identity is None:
+                    identity = assigned[i] = self._identities[self._next_id] = Identity(self._next_id, box, timestamp)
+                    self._next_id += 1
+                identity.box = box
+                identity.last_seen = timestamp
+            return assigned
+
+    def __len__(self) -> int:
+        return len(self._identities)
@@ -0,0 +1,58 @@
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+import config
+
+Box = Tuple[int, int, int, int]
+# detect_fn(gray, min_size, max_size) -> boxes as (x, y, w, h)
+DetectFn = Callable[[np.ndarray, Optional[Tuple[int, int]], Optional[Tuple[int, int]]], List[Box]]
+
+class FaceTracker:
+    """Remembers where a session's face was last seen and searches only around it.
+
+    A study session keeps the face in roughly the same place, so most frames
+    only need detection inside the last box grown by ``expand`` on each side,
+    with the face size bounded to ``1 -/+ size_tolerance`` of the last one.
+    The whole frame is scanned again when the face is lost or every
+    ``full_scan_every`` frames, so a face that moved far is picked up again.
+    """
+
+    def __init__(self, expand: float = config.TRACKER_EXPAND,
+                 size_tolerance: float = config.TRACKER_SIZE_TOLERANCE,
+                 full_scan_every: int = config.TRACKER_FULL_SCAN_EVERY):
+        self.expand = expand
+        self.size_tolerance = size_tolerance
+        self.full_scan_every = full_scan_every
+        self.last_box: Optional[Box] = None
+        self.frames_since_full_scan = 0
+
+    def detect(self, gray: np.ndarray, detect_fn: DetectFn) -> List[Box]:
+        """Return face boxes in full-frame coordinates, tracked ones first."""
+        faces: List[Box] = []
+        if self.last_box is not None and self.frames_since_full_scan < self.full_scan_every:
+            faces = self._detect_near_last_box(gray, detect_fn)
+            self.frames_since_full_scan += 1
+        if not faces:
+            faces = list(detect_fn(gray, None, None))
+            self.frames_since_full_scan = 0
+        self.last_box = tuple(int(v) for v in faces[0]) if faces else None
+        return faces
+
+    def reset(self):
+        self.last_box = None
+        self.frames_since_full_scan = 0
+
+    def _detect_near_last_box(self, gray: np.ndarray, detect_fn: DetectFn) -> List[Box]:
+        x, y, w, h = self.last_box
+        frame_h, frame_w = gray.shape[:2]
+        pad_x, pad_y = int(w * self.expand), int(h * self.expand)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(frame_w, x + w + pad_x), min(frame_h, y + h + pad_y)
+        if x1 <= x0 or y1 <= y0:
+            return []
+        side = min(w, h)
+        min_side = max(1, int(side * (1 - self.size_tolerance)))
+        max_side = int(max(w, h) * (1 + self.size_tolerance))
+        found = detect_fn(gray[y0:y1, x0:x1], (min_side, min_side), (max_side, max_side))
+        return [(fx + x0, fy + y0, fw, fh) for fx, fy, fw, fh in found]
@@ -1,18 +1,33 @@
 import cv2
 import numpy as np
-import tensorflow as tf
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
+import config
+import instrumentation
+from batching import MicroBatcher
+from inference_backend import FORK_SAFE_BACKENDS, load_backend
+from face_detectors import FaceDetector, create_detector
+from session_state import session_states
+from frame_cache import frame_hash
+from preprocessing import decode_grayscale, face_buffer, new_batch, to_model_input
+from emotion_codec import EMOTION_LABELS
 
-# Load face detection model
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+emotion_model_path = config.EMOTION_MODEL_PATH
 
-# Load emotion detection model
-emotion_model_path = "models/emotion_model.h5"
-emotion_model = tf.keras.models.load_model(emotion_model_path)
+# Models are loaded on first use (or by warm_up) rather than at import, so
+# importing this module stays cheap and the API can come up before them.
+face_detector: Optional[FaceDetector] = None
+emotion_model = None
+emotion_batcher: Optional[MicroBatcher] = None
+_frame_executor: Optional[ThreadPoolExecutor] = None
+_models_lock = threading.Lock()
+_warmed_up = threading.Event()
 
 # Emotion labels
-emotion_labels = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+emotion_labels = list(EMOTION_LABELS)
 
 def map_emotion_to_study_state(emotion: str) -> str:
     mapping = {
@@ -28,12 +43,7 @@ def map_emotion_to_study_state(emotion: str) -> str:
 
 def preprocess_face(face_img: np.ndarray) -> np.ndarray:
     """Preprocess face image for emotion detection."""
-    face_img = cv2.resize(face_img, (48, 48))
-    face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-    face_img = face_img.astype(np.float32) / 255.0
-    face_img = np.expand_dims(face_img, axis=-1)
-    face_img = np.expand_dims(face_img, axis=0)
-    return face_img
+    return to_model_input(face_img)[np.newaxis]
 
 def calculate_attention_score(focused: bool, emotions: Dict[str, float]) -> float:
     """Calculate attention score based on focus status and emotions."""
@@ -74,32 +84,129 @@ def should_recommend_break(attention_history: List[Tuple[datetime, float]],
     
     return avg_attention < 40.0
 
-def is_focused_and_emotion(image_data: bytes) -> Dict:
-    """Detect if person is focused and their emotions."""
-    nparr = np.frombuffer(image_data, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+def load_models():
+    """Load the face detector and emotion model once; safe to call from several threads."""
+    global face_detector, emotion_model, emotion_batcher
+    if emotion_batcher is not None:
+        return
+    with _models_lock:
+        if emotion_batcher is not None:
+            return
+        # Either may already have been loaded by preload() before this process was forked
+        if face_detector is None:
+            face_detector = create_detector()
+        if emotion_model is None:
+            emotion_model = load_backend(emotion_model_path)
+        # Face crops from concurrent requests are predicted together in one batch
+        emotion_batcher = MicroBatcher(
+            emotion_model.predict,
+            max_batch_size=config.BATCH_MAX_SIZE,
+            max_wait_ms=config.BATCH_MAX_WAIT_MS,
+        )
+
+def preload():
+    """Load what a preforking server's workers can share copy-on-write, without starting any threads.
+
+    The face detector is always loaded. The emotion model is loaded too when
+    its backend survives fork; for TensorFlow only the library is imported
+    and each worker loads the (small) model itself.
+    """
+    global face_detector, emotion_model
+    with _models_lock:
+        if face_detector is None:
+            face_detector = create_detector()
+        if config.EMOTION_BACKEND in FORK_SAFE_BACKENDS:
+            if emotion_model is None:
+                emotion_model = load_backend(emotion_model_path)
+        elif config.EMOTION_BACKEND == "tf":
+            import tensorflow  # noqa: F401
+
+def warm_up():
+    """Load the models and run them on synthetic frames so the first real frame doesn't pay tracing costs."""
+    if _warmed_up.is_set():
+        return
+    load_models()
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    _, encoded = cv2.imencode(".jpg", frame)
+    # Synthetic frames stay out of the frame and stage metrics
+    with instrumentation.muted():
+        is_focused_and_emotion(encoded.tobytes())
+        emotion_batcher.predict(preprocess_face(frame[:96, :96])[0])
+    for batch_size in {1, config.BATCH_MAX_SIZE}:
+        emotion_model.predict(np.zeros((batch_size, 48, 48, 1), dtype=np.float32))
+    _warmed_up.set()
+
+def is_ready() -> bool:
+    """True once the models are loaded and warmed up in this process."""
+    return _warmed_up.is_set()
+
+def detect_faces(gray: np.ndarray, min_size: Optional[Tuple[int, int]] = None,
+                 max_size: Optional[Tuple[int, int]] = None) -> List[Tuple[int, int, int, int]]:
+    """Run the configured face detector, optionally bounded to a face size range. Largest face first."""
+    load_models()
+    faces = face_detector.detect(gray, min_size, max_size)
+    return sorted(faces, key=lambda f: f[2] * f[3], reverse=True)
+
+def extract_face(image_data: bytes, session_id: Optional[int] = None,
+                 out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """Decode a frame and return its main face as a ``(48, 48, 1)`` model input, or None if there is no face.
+
+    The frame is decoded straight to grayscale at 1/``STUDYSYNC_DECODE_REDUCTION``
+    scale. The face is written into ``out`` when given, otherwise into this
+    thread's reusable buffer, which the next call on the thread overwrites.
+    With a ``session_id`` the face is tracked from frame to frame so most
+    frames only scan the region around the previous face.
+    """
+    load_models()
+    with instrumentation.stage("decode"):
+        gray = decode_grayscale(image_data)
+    if gray is None:
+        return None
     
-    faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+    with instrumentation.stage("detect"):
+        if session_id is not None:
+            faces = session_states.get(session_id).tracker.detect(gray, detect_faces)
+        else:
+            faces = detect_faces(gray)
     
     if len(faces) == 0:
-        return {
-            "focused": False,
-            "emotions": {},
-            "attention_score": 0.0,
-            "break_recommended": False,
-            "study_state": None
-        }
+        return None
     
     x, y, w, h = faces[0]
-    face_img = img[y:y+h, x:x+w]
-    
-    processed_face = preprocess_face(face_img)
-    
-    emotion_pred = emotion_model.predict(processed_face, verbose=0)
-    
-    emotions = {label: float(prob) for label, prob in zip(emotion_labels, emotion_pred[0])}
+    with instrumentation.stage("preprocess"):
+        return to_model_input(gray[y:y+h, x:x+w], out=out if out is not None else face_buffer())
+
+def predict_image(image_data: bytes) -> Optional[np.ndarray]:
+    """Emotion probabilities of a whole encoded image (e.g. an already cropped face), or None if it can't be decoded.
+
+    Uses the same model and micro-batcher as frame analysis, so the emotion
+    routes and the focus routes share one copy of the model. Timed as the
+    ``predict_image`` stage rather than counted as an analyzed frame.
+    """
+    load_models()
+    with instrumentation.stage("predict_image"):
+        with instrumentation.stage("image_decode"):
+            gray = decode_grayscale(image_data, 1)
+        if gray is None:
+            return None
+        with instrumentation.stage("image_preprocess"):
+            face = to_model_input(gray, out=face_buffer())
+        with instrumentation.stage("predict"):
+            return emotion_batcher.predict(face)
+
+def no_face_result() -> Dict:
+    return {
+        "focused": False,
+        "emotions": {},
+        "attention_score": 0.0,
+        "break_recommended": False,
+        "study_state": None
+    }
+
+def result_from_prediction(emotion_pred: np.ndarray) -> Dict:
+    """Turn one row of model output into the analysis result for a focused frame."""
+    emotions = {label: float(prob) for label, prob in zip(emotion_labels, emotion_pred)}
     
     attention_score = calculate_attention_score(True, emotions)
     
@@ -113,3 +220,107 @@ def is_focused_and_emotion(image_data: bytes) -> Dict:
         "break_recommended": False,
         "study_state": study_state
     }
+
+def is_focused_and_emotion(image_data: bytes, session_id: Optional[int] = None) -> Dict:
+    """Detect if person is focused and their emotions.
+
+    Within a session, a frame that is nearly identical to a recent one
+    reuses that frame's result from the session's cache.
+    """
+    with instrumentation.frame(session_id):
+        cache = session_states.get(session_id).cache if session_id is not None and config.FRAME_CACHE_SIZE > 0 else None
+        if cache is not None:
+            with instrumentation.stage("cache_lookup"):
+                phash = frame_hash(image_data)
+                cached = cache.lookup(phash) if phash is not None else None
+            if cached is not None:
+                if not cached["focused"]:
+                    instrumentation.NO_FACE.inc()
+                return cached
+        else:
+            phash = None
+
+        face = extract_face(image_data, session_id)
+        if face is None:
+            instrumentation.NO_FACE.inc()
+            result = no_face_result()
+        else:
+            with instrumentation.stage("predict"):
+                prediction = emotion_batcher.predict(face)
+            result = result_from_prediction(prediction)
+        if phash is not None:
+            cache.store(phash, result)
+        return result
+
+def extract_faces(image_data: bytes, max_faces: int = config.MULTI_FACE_MAX_FACES
+                  ) -> Tuple[List[Tuple[int, int, int, int]], Optional[np.ndarray]]:
+    """Decode a frame once and crop up to ``max_faces`` faces (largest first) into one model input batch.
+
+    Boxes are in the coordinates of the decoded, reduced frame. Returns
+    ``([], None)`` if there is no face or the frame can't be decoded.
+    """
+    load_models()
+    with instrumentation.stage("decode"):
+        gray = decode_grayscale(image_data)
+    if gray is None:
+        return [], None
+    with instrumentation.stage("detect"):
+        boxes = detect_faces(gray)[:max_faces]
+    if not boxes:
+        return [], None
+    with instrumentation.stage("preprocess"):
+        batch = new_batch(len(boxes))
+        for i, (x, y, w, h) in enumerate(boxes):
+            to_model_input(gray[y:y+h, x:x+w], out=batch[i])
+    return boxes, batch
+
+def analyze_faces(image_data: bytes) -> List[Dict]:
+    """Analyze every face in a frame, e.g. a camera pointed at a group study table.
+
+    Decoding and detection run once per frame and all faces go through the
+    emotion model in a single batched call, so a frame with many faces costs
+    far less than one request per face. Each result is a focused-frame
+    result plus the face's ``box`` as ``[x, y, w, h]`` in full-frame pixels.
+    """
+    with instrumentation.frame():
+        boxes, batch = extract_faces(image_data)
+        if not boxes:
+            instrumentation.NO_FACE.inc()
+            return []
+        instrumentation.BATCH_SIZE.observe(len(boxes))
+        with instrumentation.stage("predict"):
+            preds = emotion_model.predict(batch)
+        # Boxes were found on the frame decoded at 1/DECODE_REDUCTION scale
+        scale = config.DECODE_REDUCTION
+        return [{**result_from_prediction(pred), "box": [int(v) * scale for v in box]}
+                for box, pred in zip(boxes, preds)]
+
+def _get_frame_executor() -> ThreadPoolExecutor:
+    global _frame_executor
+    with _models_lock:
+        if _frame_executor is None:
+            _frame_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="frame-decode")
+        return _frame_executor
+
+def analyze_frames(frames: List[bytes]) -> List[Dict]:
+    """Analyze many frames at once, e.g. a replayed recording.
+
+    Frames are decoded and searched for faces in parallel, then every face
+    found goes through the emotion model in batches of up to
+    ``STUDYSYNC_OFFLINE_BATCH_SIZE``. Results keep the order of ``frames``.
+    """
+    load_models()
+    # Every frame writes its face straight into its own row of one batch array
+    batch = new_batch(len(frames))
+    faces = list(_get_frame_executor().map(lambda i: extract_face(frames[i], out=batch[i]), range(len(frames))))
+    found = [i for i, face in enumerate(faces) if face is not None]
+    preds = []
+    for start in range(0, len(found), config.OFFLINE_BATCH_SIZE):
+        chunk = found[start:start + config.OFFLINE_BATCH_SIZE]
+        instrumentation.BATCH_SIZE.observe(len(chunk))
+        with instrumentation.stage("model_batch"):
+            preds.extend(emotion_model.predict(batch[chunk]))
+    instrumentation.FRAMES.inc(len(frames))
+    instrumentation.NO_FACE.inc(len(frames) - len(found))
+    pred_iter = iter(preds)
+    return [result_from_prediction(next(pred_iter)) if face is not None else no_face_result() for face in faces]
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import config
+from preprocessing import decode_grayscale
+
+HASH_SIZE = 8
+
+def frame_hash(image_data: bytes) -> Optional[int]:
+    """64-bit difference hash of a JPEG frame, decoded at 1/8 scale so it costs a fraction of a full decode."""
+    gray = decode_grayscale(image_data, 8)
+    if gray is None:
+        return None
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class CacheCounters:
+    """Hit/miss totals across every session's cache in this process."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+cache_counters = CacheCounters()
+
+class FrameCache:
+    """Recent analysis results of one session, keyed by perceptual frame hash.
+
+    A frame whose hash is within ``max_distance`` bits of a cached one reuses
+    that result instead of going through detection and inference. Entries
+    expire after ``ttl_seconds`` and the least recently used one is evicted
+    once ``max_entries`` are stored.
+    """
+
+    def __init__(self, max_entries: int = config.FRAME_CACHE_SIZE,
+                 ttl_seconds: float = config.FRAME_CACHE_TTL_SECONDS,
+                 max_distance: int = config.FRAME_CACHE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, phash: int) -> Optional[Dict]:
+        """Return a copy of the cached result closest to ``phash``, or None on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_distance = None, self.max_distance + 1
+            for key, (stored_at, _) in list(self._entries.items()):
+                if now - stored_at > self.ttl_seconds:
+                    del self._entries[key]
+                    continue
+                distance = hamming_distance(key, phash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                self.misses += 1
+                cache_counters.record(False)
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            cache_counters.record(True)
+            return dict(self._entries[best_key][1])
+
+    def store(self, phash: int, result: Dict):
+        with self._lock:
+            self._entries[phash] = (time.monotonic(), dict(result))
+            self._entries.move_to_end(phash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
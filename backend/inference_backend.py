@@ -0,0 +1,105 @@
+import threading
+from typing import Optional
+
+import numpy as np
+
+import config
+
+class InferenceBackend:
+    """Runs the emotion model on preprocessed ``(N, 48, 48, 1)`` float32 batches."""
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Return an ``(N, 7)`` array of emotion probabilities."""
+        raise NotImplementedError
+
+class TensorFlowBackend(InferenceBackend):
+    """Keras model loaded from the trained ``.h5`` file."""
+
+    def __init__(self, model_path: str):
+        # Imported here so the ONNX backend never pulls TensorFlow into the process
+        import tensorflow as tf
+        self.model = tf.keras.models.load_model(model_path)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return np.asarray(self.model.predict_on_batch(batch))
+
+class OnnxBackend(InferenceBackend):
+    """ONNX Runtime CPU session over the model exported by ``convert_to_onnx.py``."""
+
+    def __init__(self, model_path: str, intra_op_threads: int = 0):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+class TFLiteBackend(InferenceBackend):
+    """TFLite interpreter over a model written by ``export_quantized.py`` (e.g. the INT8 variant).
+
+    Uses the standalone LiteRT (``ai_edge_litert``) or ``tflite_runtime``
+    interpreter when one is installed, so serving doesn't need TensorFlow. Integer inputs and outputs are
+    quantized and dequantized with the model's own scale and zero point.
+    """
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+        # One interpreter holds one set of tensors: calls must not overlap
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self.interpreter.resize_tensor_input(self.input["index"], [len(batch), *batch.shape[1:]])
+                self.interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self.interpreter.set_tensor(self.input["index"], self._quantize(batch))
+            self.interpreter.invoke()
+            return self._dequantize(self.interpreter.get_tensor(self.output["index"]), self.output)
+
+    def _quantize(self, batch: np.ndarray) -> np.ndarray:
+        dtype = self.input["dtype"]
+        if dtype == np.float32:
+            return np.ascontiguousarray(batch, dtype=np.float32)
+        scale, zero_point = self.input["quantization"]
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    @staticmethod
+    def _dequantize(values: np.ndarray, details) -> np.ndarray:
+        if values.dtype == np.float32:
+            return values.copy()
+        scale, zero_point = details["quantization"]
+        return (values.astype(np.float32) - zero_point) * scale
+
+# Backends whose loaded model still works in a forked child, so a preforking
+# server can load it once in the parent. TensorFlow's runtime threads
+# deadlock after fork; with it the parent can only import the module.
+FORK_SAFE_BACKENDS = ("onnx", "tflite")
+
+BACKENDS = {
+    "tf": TensorFlowBackend,
+    "onnx": OnnxBackend,
+    "tflite": TFLiteBackend,
+}
+
+def load_backend(model_path: Optional[str] = None, kind: Optional[str] = None) -> InferenceBackend:
+    """Load the configured inference backend (``STUDYSYNC_EMOTION_BACKEND``)."""
+    kind = kind or config.EMOTION_BACKEND
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {kind}")
+    return BACKENDS[kind](model_path or config.EMOTION_MODEL_PATH)
@@ -0,0 +1,126 @@
+import asyncio
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Optional
+
+import config
+
+def _init_worker():
+    """Load the detection models in this worker and warm them up before it takes requests."""
+    import focus_detector
+    focus_detector.warm_up()
+
+def _ping() -> bool:
+    return True
+
+def _drop_session(session_id: int):
+    from session_state import session_states
+    session_states.drop(session_id)
+
+class InferencePool:
+    """Executor that runs frame analysis off the event loop.
+
+    ``kind="thread"`` shares one model between threads and lets concurrent
+    frames meet in the micro-batcher; ``kind="process"`` gives every worker
+    its own model copy so decoding and detection scale across cores. Either
+    way each worker loads and warms the model once, before serving.
+
+    Session state (face tracker, frame cache) lives in the process that
+    analyzes the session's frames. With ``kind="process"`` every worker is a
+    single-process executor of its own, and calls made with a ``key`` (the
+    session id) always go to the same worker, so a session's state stays in
+    one place and ``drop_session`` can free it there.
+    """
+
+    def __init__(self, kind: str = "thread", workers: Optional[int] = None,
+                 initializer: Callable[[], None] = _init_worker):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference pool kind: {kind}")
+        self.kind = kind
+        self.workers = workers or (config.BATCH_MAX_SIZE if kind == "thread" else multiprocessing.cpu_count())
+        self.initializer = initializer
+        self._executors: List[Executor] = []
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self.startup_seconds: Optional[float] = None
+        # Calls submitted and not finished yet, whether queued or running
+        self.in_flight = 0
+
+    @property
+    def ready(self) -> bool:
+        """True once every worker has loaded and warmed its model."""
+        return bool(self._executors)
+
+    def start(self):
+        """Create the executors and block until every worker has loaded its model."""
+        with self._lock:
+            if self._executors:
+                return
+            started = time.monotonic()
+            if self.kind == "process":
+                # Spawned children start clean instead of inheriting the parent's TF runtime
+                context = multiprocessing.get_context("spawn")
+                executors = [ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=self.initializer)
+                             for _ in range(self.workers)]
+                # Each executor has one process, so its ping only returns once that process is initialized
+                for f in [executor.submit(_ping) for executor in executors]:
+                    f.result()
+            else:
+                self.initializer()
+                executors = [ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")]
+            self._executors = executors
+            self.startup_seconds = time.monotonic() - started
+
+    def start_in_background(self) -> threading.Thread:
+        """Start the pool on a background thread so the server can answer liveness probes meanwhile."""
+        thread = threading.Thread(target=self.start, name="inference-pool-start", daemon=True)
+        thread.start()
+        return thread
+
+    def _executor(self, key: Optional[int]) -> Executor:
+        executors = self._executors
+        if len(executors) == 1:
+            return executors[0]
+        index = next(self._next) if key is None else hash(key)
+        return executors[index % len(executors)]
+
+    def _count(self, delta: int):
+        with self._count_lock:
+            self.in_flight += delta
+
+    def submit(self, fn: Callable, *args, key: Optional[int] = None) -> Future:
+        """Run ``fn(*args)`` in the pool; calls with the same ``key`` run in the same process."""
+        self.start()
+        self._count(1)
+        future = self._executor(key).submit(fn, *args)
+        future.add_done_callback(lambda _: self._count(-1))
+        return future
+
+    async def run(self, fn: Callable, *args, key: Optional[int] = None):
+        """Run ``fn(*args)`` in the pool and await its result without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        if not self._executors:
+            await loop.run_in_executor(None, self.start)
+        self._count(1)
+        try:
+            return await loop.run_in_executor(self._executor(key), partial(fn, *args))
+        finally:
+            self._count(-1)
+
+    def drop_session(self, session_id: int):
+        """Free a session's state in the worker process that holds it; thread pools share the caller's state."""
+        if self.kind == "process" and self._executors:
+            self.submit(_drop_session, session_id, key=session_id)
+
+    def shutdown(self):
+        with self._lock:
+            executors, self._executors = self._executors, []
+        for executor in executors:
+            executor.shutdown(wait=True)
+
+inference_pool = InferencePool(config.INFERENCE_POOL_KIND, config.INFERENCE_WORKERS or None)
@@ -0,0 +1,229 @@
+"""Hot-path latency histograms, counters and gauges, rendered as Prometheus text.
+
+Metrics live in this process only. Histograms and counters are updated
+inline (a clock read, a bisect and a lock per observation); gauges and
+other values owned elsewhere are read through callbacks at scrape time, so
+they cost nothing between scrapes. With STUDYSYNC_METRICS_ENABLED=0 every
+update is a no-op. With STUDYSYNC_INFERENCE_POOL=process, frames are
+analyzed in worker processes and their stage timings stay there; /metrics
+then covers only the API process's own stages (upload read, DB flush).
+
+``frame()`` wraps the analysis of one frame. Stages timed inside it on the
+same thread are also collected per frame, and with STUDYSYNC_SLOW_FRAME_MS
+set a sample of the frames slower than that is logged with their
+per-stage breakdown. Only frame analysis counts as frames: the emotion
+routes' whole-image predictions are timed as the ``predict_image`` stage,
+and model warm-up runs ``muted()`` so it records nothing.
+"""
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+enabled = config.METRICS_ENABLED
+_registry: List["_Metric"] = []
+_local = threading.local()
+_NULL = nullcontext()
+
+def _key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+def _format_labels(key: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples())
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not enabled or getattr(_local, "muted", False):
+            return
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in values]
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; ``buckets`` are the upper bounds, +Inf is implied."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        if not enabled or getattr(_local, "muted", False):
+            return
+        key = _key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                labels = _format_labels(key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {repr(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class Callback(_Metric):
+    """A gauge or counter whose current value is read from ``fn()`` at scrape time."""
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float], kind: str = "gauge"):
+        super().__init__(name, help_text)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            logger.exception("Failed to read metric %s", self.name)
+            return []
+        return [] if value is None else [f"{self.name} {_format_value(value)}"]
+
+def gauge(name: str, help_text: str, fn: Callable[[], float]) -> Callback:
+    """Register a gauge read from ``fn()``, replacing any earlier one of the same name."""
+    unregister(name)
+    return Callback(name, help_text, fn)
+
+def callback_counter(name: str, help_text: str, fn: Callable[[], float]) -> Callback:
+    """Register a counter read from ``fn()``, for totals another object already keeps."""
+    unregister(name)
+    return Callback(name, help_text, fn, kind="counter")
+
+def unregister(name: str):
+    _registry[:] = [metric for metric in _registry if metric.name != name]
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in list(_registry)) + "\n"
+
+STAGE_SECONDS = Histogram("studysync_stage_seconds", "Time spent in each stage of request handling and frame analysis.")
+FRAME_SECONDS = Histogram("studysync_frame_seconds", "Time to analyze one frame, from cache lookup to result.")
+BATCH_SIZE = Histogram("studysync_batch_size", "Samples per emotion model call.", (1, 2, 4, 8, 16, 32, 64, 128, 256))
+FRAMES = Counter("studysync_frames_total", "Frames analyzed.")
+NO_FACE = Counter("studysync_no_face_total", "Analyzed frames in which no face was found.")
+DB_FLUSHES = Counter("studysync_db_flushes_total", "Write-buffer flushes, by outcome.")
+DB_ROWS = Counter("studysync_db_frames_flushed_total", "Frames written to the database by the write buffer.")
+DB_DROPPED = Counter("studysync_db_frames_dropped_total", "Frames the write buffer gave up on and sent to the dead-letter log.")
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        STAGE_SECONDS.observe(elapsed, stage=self.name)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace[self.name] = trace.get(self.name, 0.0) + elapsed
+        return False
+
+def stage(name: str):
+    """Context manager timing one stage into ``studysync_stage_seconds{stage=name}``."""
+    return _Stage(name) if enabled else _NULL
+
+class _Frame:
+    __slots__ = ("session_id", "start", "outer")
+
+    def __init__(self, session_id: Optional[int]):
+        self.session_id = session_id
+
+    def __enter__(self):
+        self.outer = getattr(_local, "trace", None)
+        _local.trace = {}
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        trace, _local.trace = _local.trace, self.outer
+        FRAME_SECONDS.observe(elapsed)
+        FRAMES.inc()
+        if (config.SLOW_FRAME_MS > 0 and elapsed * 1000 >= config.SLOW_FRAME_MS
+                and random.random() < config.SLOW_FRAME_SAMPLE_RATE):
+            stages = ", ".join(f"{name}={seconds * 1000:.1f}" for name, seconds in trace.items())
+            logger.warning("Slow frame: %.1f ms (session %s; %s ms)", elapsed * 1000, self.session_id, stages or "no stages")
+        return False
+
+def frame(session_id: Optional[int] = None):
+    """Context manager around the analysis of one frame; see the module docstring."""
+    return _Frame(session_id) if enabled else _NULL
+
+@contextmanager
+def muted():
+    """Record nothing on this thread inside the block, e.g. while warming up the models on synthetic frames."""
+    outer = getattr(_local, "muted", False)
+    _local.muted = True
+    try:
+        yield
+    finally:
+        _local.muted = outer
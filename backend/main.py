@@ -1,15 +1,43 @@
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException
+from fastapi import FastAPI, File, Form, Query, UploadFile, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+import aggregates
+import emotion_routes
+import focus_detector
+import instrumentation
+import metrics_query
+import rollups
+import session_export
 import models
 from database import SessionLocal, engine
-from focus_detector import is_focused_and_emotion, should_recommend_break
+from migrations import run_migrations
+from focus_detector import analyze_faces, analyze_frames, is_focused_and_emotion
+from break_recommender import BreakRecommender
+from inference_pool import inference_pool
+from session_state import SessionState, session_states
+from frame_cache import cache_counters
+from write_buffer import write_buffer
+from typing import List, Optional
+import config
 import json
 
 models.Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load and warm up in the background; /readyz reports when they're done
+    inference_pool.start_in_background()
+    write_buffer.start()
+    yield
+    write_buffer.stop()
+    inference_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -20,6 +48,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# /predict_emotion and friends, formerly a separate Flask server with its own model copy
+app.include_router(emotion_routes.router)
+
+# Gauges and totals kept by other objects are read when /metrics is scraped
+instrumentation.gauge("studysync_ready", "1 once the inference pool has loaded and warmed the models.",
+                      lambda: int(inference_pool.ready))
+instrumentation.gauge("studysync_active_sessions", "Sessions with in-memory tracking state in this process.",
+                      lambda: len(session_states))
+instrumentation.gauge("studysync_inference_queue_depth", "Calls submitted to the inference pool and not finished.",
+                      lambda: inference_pool.in_flight)
+instrumentation.gauge("studysync_batcher_queue_depth", "Face crops waiting for the next emotion model batch.",
+                      lambda: focus_detector.emotion_batcher.pending() if focus_detector.emotion_batcher else 0)
+instrumentation.gauge("studysync_write_buffer_pending", "Frames buffered and not yet flushed to the database.",
+                      write_buffer.pending)
+instrumentation.callback_counter("studysync_frame_cache_hits_total", "Frames answered from the near-duplicate cache.",
+                                 lambda: cache_counters.hits)
+instrumentation.callback_counter("studysync_frame_cache_misses_total", "Frames not found in the near-duplicate cache.",
+                                 lambda: cache_counters.misses)
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -28,16 +75,40 @@ def get_db():
     finally:
         db.close()
 
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    if not inference_pool.ready:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "startup_seconds": inference_pool.startup_seconds}
+
+@app.get("/metrics")
+def metrics():
+    """Latency histograms, counters and gauges of this process in the Prometheus text format."""
+    return Response(instrumentation.render(), media_type=instrumentation.CONTENT_TYPE)
+
+@app.get("/frame_cache/stats")
+def frame_cache_stats():
+    """Near-duplicate cache hit/miss counters of this process, for tuning the similarity threshold."""
+    return {**cache_counters.snapshot(), "sessions": len(session_states)}
+
 @app.post("/start_session/")
 def start_session(db: Session = Depends(get_db)):
     session = models.StudySession(user_id="user1", start_time=datetime.utcnow())
     db.add(session)
+    db.flush()
+    rollups.add_session_start(db, session)
     db.commit()
     db.refresh(session)
     return {"session_id": session.id}
 
 @app.post("/end_session/{session_id}")
 def end_session(session_id: int, db: Session = Depends(get_db)):
+    # Buffered frames must be folded into the session's aggregates first
+    write_buffer.flush()
     session = db.query(models.StudySession).filter(models.StudySession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -49,90 +120,314 @@ def end_session(session_id: int, db: Session = Depends(get_db)):
         duration = (session.end_time - session.start_time).total_seconds() / 60
         session.total_duration = duration
     
-    # Calculate average attention score
-    attention_scores = [log.attention_score for log in session.focus_logs]
-    if attention_scores:
-        session.average_attention_score = sum(attention_scores) / len(attention_scores)
-    
-    # Calculate recommended break duration
-    if session.average_attention_score is not None:
-        if session.average_attention_score < 40:
-            session.recommended_break_duration = 15  # 15 minutes break
-        elif session.average_attention_score < 60:
-            session.recommended_break_duration = 10  # 10 minutes break
-        else:
-            session.recommended_break_duration = 5   # 5 minutes break
+    # Average attention and break come from the running aggregates, not from the logs. Frames still
+    # buffered in other server workers update them again when those workers flush.
+    aggregates.finish(session)
     
     db.commit()
+    session_states.drop(session_id)
+    inference_pool.drop_session(session_id)
     return {"message": "Session ended successfully"}
 
+def _naive_utc(timestamp: datetime) -> datetime:
+    """Timestamps are stored as naive UTC; aware ones are converted, naive ones are taken as UTC already."""
+    if timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _record_frame(session_id: int, timestamp: datetime, result: dict) -> dict:
+    """Update the session's break recommendation with this frame and queue its rows."""
+    recommender = session_states.get(session_id).recommender
+    # Copied so a result shared with the frame cache keeps its own flag
+    result = {**result, "break_recommended": recommender.update(timestamp, result["attention_score"])}
+    write_buffer.add_frame(session_id, timestamp, result)
+    return result
+
+def _session_exists(session_id: int) -> bool:
+    """Whether the session exists; on its first frame in this process, also load its break window.
+
+    Another server worker may have analyzed the session's earlier frames, so
+    the break recommender starts from the session's attention scores of the
+    last BREAK_WINDOW_SECONDS in the database rather than from nothing.
+    """
+    # A session with state in this process was looked up when its first frame came in
+    if session_id in session_states:
+        return True
+    db = SessionLocal()
+    try:
+        session = db.query(models.StudySession.id, models.StudySession.frame_count).filter(
+            models.StudySession.id == session_id).first()
+        if session is None:
+            return False
+        cutoff = datetime.utcnow() - timedelta(seconds=config.BREAK_WINDOW_SECONDS)
+        recent = db.query(models.AttentionMetric.timestamp, models.AttentionMetric.attention_score).filter(
+            models.AttentionMetric.session_id == session_id, models.AttentionMetric.timestamp > cutoff
+        ).order_by(models.AttentionMetric.timestamp.desc()).limit(config.BREAK_MAX_SAMPLES).all()
+    finally:
+        db.close()
+    state = SessionState()
+    for timestamp, score in reversed(recent):
+        state.recommender.update(timestamp, score or 0.0)
+    state.recommender.samples_seen = max(state.recommender.samples_seen, session.frame_count or 0)
+    session_states.setdefault(session_id, state)
+    return True
+
 @app.post("/analyze_focus/")
-async def analyze_focus(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    image_data = await file.read()
-    result = is_focused_and_emotion(image_data)
+async def analyze_focus(file: UploadFile = File(...), session_id: Optional[int] = Form(None)):
+    if session_id is not None and not await run_in_threadpool(_session_exists, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    with instrumentation.stage("upload_read"):
+        image_data = await file.read()
+    result = await inference_pool.run(is_focused_and_emotion, image_data, session_id, key=session_id)
     
-    # Placeholder for logging logic.
-    # In a real app, you'd find the current session and log to it.
+    if session_id is not None:
+        result = _record_frame(session_id, datetime.utcnow(), result)
     
     return {
         "focused": result["focused"],
         "attention_score": result["attention_score"],
-        "study_state": result["study_state"]
+        "study_state": result["study_state"],
+        "break_recommended": result["break_recommended"]
     }
 
+@app.post("/analyze_faces/")
+async def analyze_faces_endpoint(file: UploadFile = File(...), session_id: Optional[int] = Form(None),
+                                 track: bool = Form(True)):
+    """Analyze every face in one frame from a shared camera, with one batched model call.
+
+    Within a session and with ``track``, each face gets a ``face_id`` that
+    stays the same across the session's frames while the person stays put,
+    and its own ``break_recommended`` from that person's attention history.
+    """
+    if session_id is not None and not await run_in_threadpool(_session_exists, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    with instrumentation.stage("upload_read"):
+        image_data = await file.read()
+    faces = await inference_pool.run(analyze_faces, image_data)
+    now = datetime.utcnow()
+    
+    if session_id is not None and track:
+        identities = session_states.get(session_id).identities.assign([tuple(face["box"]) for face in faces], now)
+        for face, identity in zip(faces, identities):
+            face["face_id"] = identity.id
+            face["break_recommended"] = identity.recommender.update(now, face["attention_score"])
+    
+    return {
+        "timestamp": now,
+        "face_count": len(faces),
+        "faces": [
+            {
+                "face_id": face.get("face_id"),
+                "box": face["box"],
+                "focused": face["focused"],
+                "attention_score": face["attention_score"],
+                "study_state": face["study_state"],
+                "emotions": face["emotions"],
+                "break_recommended": face["break_recommended"],
+            }
+            for face in faces
+        ]
+    }
+
+@app.post("/analyze_focus_batch/")
+async def analyze_focus_batch(files: List[UploadFile] = File(...), timestamps: Optional[str] = Form(None),
+                              session_id: Optional[int] = Form(None), persist: bool = Form(False),
+                              db: Session = Depends(get_db)):
+    """Analyze a batch of buffered frames.
+
+    ``timestamps`` is a JSON list of ISO-8601 capture times, one per file;
+    times with an offset are converted to UTC, times without one are taken as UTC.
+    With ``persist`` the results are stored as AttentionMetric and FocusLog
+    rows of ``session_id`` in a single transaction.
+    """
+    if len(files) > config.BATCH_ENDPOINT_MAX_FRAMES:
+        raise HTTPException(status_code=413, detail=f"At most {config.BATCH_ENDPOINT_MAX_FRAMES} frames per request")
+    if timestamps is not None:
+        try:
+            frame_times = [_naive_utc(datetime.fromisoformat(ts)) for ts in json.loads(timestamps)]
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="timestamps must be a JSON list of ISO-8601 strings")
+        if len(frame_times) != len(files):
+            raise HTTPException(status_code=400, detail="Expected one timestamp per frame")
+    else:
+        now = datetime.utcnow()
+        frame_times = [now] * len(files)
+    if persist:
+        if session_id is None:
+            raise HTTPException(status_code=400, detail="session_id is required to persist results")
+        if not db.query(models.StudySession.id).filter(models.StudySession.id == session_id).first():
+            raise HTTPException(status_code=404, detail="Session not found")
+
+    with instrumentation.stage("upload_read"):
+        frames = [await f.read() for f in files]
+    results = await inference_pool.run(analyze_frames, frames)
+
+    # Replay the batch in capture order so break flags follow its own timeline
+    recommender = BreakRecommender()
+    for i in sorted(range(len(results)), key=lambda i: frame_times[i]):
+        results[i]["break_recommended"] = recommender.update(frame_times[i], results[i]["attention_score"])
+
+    if persist:
+        write_buffer.add_frames(session_id, zip(frame_times, results))
+        await run_in_threadpool(write_buffer.flush)
+        if write_buffer.pending(session_id):
+            raise HTTPException(status_code=503, detail="Results could not be stored yet; they will be retried")
+
+    return {
+        "results": [
+            {
+                "timestamp": timestamp,
+                "focused": result["focused"],
+                "attention_score": result["attention_score"],
+                "study_state": result["study_state"],
+                "emotions": result["emotions"],
+                "break_recommended": result["break_recommended"],
+            }
+            for timestamp, result in zip(frame_times, results)
+        ],
+        "persisted": len(results) if persist else 0
+    }
+
+@app.websocket("/ws/session/{session_id}")
+async def session_stream(websocket: WebSocket, session_id: int):
+    """Stream binary JPEG frames of a session and get one analysis message back per frame.
+
+    The session is looked up once at connect time; face tracking and the
+    break-recommendation window stay in memory while the socket is open.
+    """
+    # Accepted before closing: servers answer a close before the handshake with HTTP 403, which
+    # browsers only see as code 1006, so the client couldn't tell an unknown session from a dropped link
+    await websocket.accept()
+    if not await run_in_threadpool(_session_exists, session_id):
+        await websocket.close(code=4404)
+        return
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            image_data = message.get("bytes")
+            if image_data is None:
+                await websocket.send_json({"error": "Expected a binary JPEG frame"})
+                continue
+
+            result = await inference_pool.run(is_focused_and_emotion, image_data, session_id, key=session_id)
+            now = datetime.utcnow()
+            result = _record_frame(session_id, now, result)
+            await websocket.send_json({
+                "timestamp": now.isoformat(),
+                "focused": result["focused"],
+                "attention_score": result["attention_score"],
+                "study_state": result["study_state"],
+                "break_recommended": result["break_recommended"]
+            })
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/session_metrics/{session_id}")
-def get_session_metrics(session_id: int, db: Session = Depends(get_db)):
+def get_session_metrics(session_id: int, summary: bool = False, after: Optional[str] = None,
+                        limit: int = Query(config.METRICS_PAGE_SIZE, ge=1, le=config.METRICS_MAX_PAGE_SIZE),
+                        bucket_seconds: Optional[int] = Query(None, ge=config.METRICS_MIN_BUCKET_SECONDS),
+                        stream: bool = False, db: Session = Depends(get_db)):
+    """Session details with its metrics, one page at a time.
+
+    ``summary`` returns the running aggregates instead of metrics,
+    ``bucket_seconds`` downsamples them to avg/min/max per time bucket, and
+    ``stream`` sends every metric as NDJSON. Otherwise metrics come in pages
+    of ``limit``; pass the returned ``next_cursor`` as ``after`` for the next one.
+    """
     session = db.query(models.StudySession).filter(models.StudySession.id == session_id).first()
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    metrics = db.query(models.AttentionMetric).filter(
-        models.AttentionMetric.session_id == session_id
-    ).order_by(models.AttentionMetric.timestamp).all()
+    if stream:
+        return StreamingResponse(_stream_metrics(session_id), media_type="application/x-ndjson")
     
-    return {
+    response = {
         "session_id": session.id,
         "start_time": session.start_time,
         "end_time": session.end_time,
         "total_duration": session.total_duration,
         "average_attention_score": session.average_attention_score,
         "recommended_break_duration": session.recommended_break_duration,
-        "metrics": [
-            {
-                "timestamp": m.timestamp,
-                "attention_score": m.attention_score,
-                "dominant_emotion": m.dominant_emotion,
-                "emotion_confidence": m.emotion_confidence,
-                "break_recommended": m.break_recommended
-            }
-            for m in metrics
-        ]
     }
+    if summary:
+        # Constant-time view built from the session's running aggregates
+        response["summary"] = aggregates.summary(session)
+    elif bucket_seconds is not None:
+        response["bucket_seconds"] = bucket_seconds
+        response["buckets"] = metrics_query.metric_buckets(db, session_id, bucket_seconds)
+    else:
+        try:
+            metrics, next_cursor = metrics_query.metric_page(db, session_id, after, limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        response["metrics"] = metrics
+        response["next_cursor"] = next_cursor
+    return response
 
-@app.post("/log_focus_emotion/")
-def log_focus_emotion(image_data: bytes, db: Session = Depends(get_db)):
-    result = is_focused_and_emotion(image_data)
-    now = datetime.utcnow()
-    # This logic needs to be revisited to use an existing session_id
-    session = models.StudySession(user_id="user1", start_time=now, end_time=None)
-    db.add(session)
-    db.commit()
-    db.refresh(session)
+def _stream_metrics(session_id: int):
+    # Runs after the request's own session is closed, so it reads through one of its own
+    db = SessionLocal()
+    try:
+        for metric in metrics_query.iter_metrics(db, session_id):
+            metric["timestamp"] = metric["timestamp"].isoformat() if metric["timestamp"] else None
+            yield json.dumps(metric) + "\n"
+    finally:
+        db.close()
 
-    record = models.AttentionRecord(
-        session_id=session.id,
-        timestamp=now,
-        emotions=result["emotions"],
-        attention_score=result["attention_score"]
+@app.get("/session_export/{session_id}")
+def export_session(session_id: int, db: Session = Depends(get_db)):
+    """The session's frames as a columnar NumPy .npz archive, for bulk analysis."""
+    if not db.query(models.StudySession.id).filter(models.StudySession.id == session_id).first():
+        raise HTTPException(status_code=404, detail="Session not found")
+    write_buffer.flush()
+    return Response(
+        content=session_export.export_npz(db, session_id),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="session_{session_id}.npz"'}
     )
-    db.add(record)
-    db.commit()
-    db.refresh(record)
+
+@app.get("/analytics/{user_id}")
+def get_analytics(user_id: str, granularity: str = Query("day", pattern="^(hour|day|week)$"),
+                  start: Optional[datetime] = None, end: Optional[datetime] = None,
+                  db: Session = Depends(get_db)):
+    """Per-period focus trends of a user's sessions, read only from the rollup tables.
+
+    Periods cover ``[start, end)``, by default the last
+    ANALYTICS_DEFAULT_PERIODS hours, days or weeks up to now.
+    """
+    period = rollups.PERIOD_LENGTHS[granularity]
+    end = end or rollups.truncate(datetime.utcnow(), granularity) + period
+    start = rollups.truncate(start or end - period * config.ANALYTICS_DEFAULT_PERIODS, granularity)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    if (end - start) / period > config.ANALYTICS_MAX_PERIODS:
+        raise HTTPException(status_code=400, detail=f"At most {config.ANALYTICS_MAX_PERIODS} periods per request")
+    
+    totals = rollups.period_totals(db, user_id, granularity, start, end)
+    return {
+        "user_id": user_id,
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "overall": rollups.view(rollups.combine(totals.values())),
+        "periods": [{"period_start": period_start, **rollups.view(t)} for period_start, t in totals.items()]
+    }
+
+@app.post("/log_focus_emotion/")
+def log_focus_emotion(image_data: bytes, session_id: int, db: Session = Depends(get_db)):
+    if not db.query(models.StudySession.id).filter(models.StudySession.id == session_id).first():
+        raise HTTPException(status_code=404, detail="Session not found")
+    result = inference_pool.submit(is_focused_and_emotion, image_data, session_id, key=session_id).result()
+    result = _record_frame(session_id, datetime.utcnow(), result)
     
     return {
-        "session_id": session.id, 
+        "session_id": session_id, 
         "attention_score": result["attention_score"],
-        "study_state": result["study_state"]
+        "study_state": result["study_state"],
+        "break_recommended": result["break_recommended"]
     }
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+"""Reading a session's attention metrics without loading them all at once.
+
+- ``metric_page``: keyset pagination on (timestamp, id), so every page is
+  one index range scan however deep into the session it starts.
+- ``metric_buckets``: time-bucket downsampling (count, avg/min/max
+  attention, any break) computed by the database's GROUP BY.
+- ``iter_metrics``: every metric of a session, fetched in chunks, for
+  streaming responses whose memory use doesn't grow with the session.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Integer, and_, cast, func, or_, select
+from sqlalchemy.orm import Session
+
+import config
+import models
+
+_EPOCH = datetime(1970, 1, 1)
+_m = models.AttentionMetric
+_METRIC_COLUMNS = (_m.id, _m.timestamp, _m.attention_score, _m.dominant_emotion, _m.emotion_confidence,
+                   _m.break_recommended)
+
+def metric_dict(row) -> Dict:
+    return {
+        "timestamp": row.timestamp,
+        "attention_score": row.attention_score,
+        "dominant_emotion": row.dominant_emotion,
+        "emotion_confidence": row.emotion_confidence,
+        "break_recommended": row.break_recommended,
+    }
+
+def encode_cursor(timestamp: datetime, metric_id: int) -> str:
+    return f"{timestamp.isoformat()}_{metric_id}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of ``encode_cursor``; raises ValueError on a malformed cursor."""
+    timestamp, _, metric_id = cursor.rpartition("_")
+    return datetime.fromisoformat(timestamp), int(metric_id)
+
+def metric_page(db: Session, session_id: int, after: Optional[str] = None,
+                limit: int = config.METRICS_PAGE_SIZE) -> Tuple[List[Dict], Optional[str]]:
+    """One page of metrics after the ``after`` cursor, and the cursor of the next page (None on the last)."""
+    query = select(*_METRIC_COLUMNS).where(_m.session_id == session_id)
+    if after is not None:
+        timestamp, metric_id = decode_cursor(after)
+        # Metrics of one batch can share a timestamp; the id breaks the tie
+        query = query.where(or_(_m.timestamp > timestamp, and_(_m.timestamp == timestamp, _m.id > metric_id)))
+    rows = db.execute(query.order_by(_m.timestamp, _m.id).limit(limit + 1)).all()
+    next_cursor = encode_cursor(rows[limit - 1].timestamp, rows[limit - 1].id) if len(rows) > limit else None
+    return [metric_dict(row) for row in rows[:limit]], next_cursor
+
+def _epoch_seconds(db: Session, column):
+    if db.get_bind().dialect.name == "sqlite":
+        return cast(func.strftime("%s", column), Integer)
+    return cast(func.extract("epoch", column), Integer)
+
+def metric_buckets(db: Session, session_id: int, bucket_seconds: int) -> List[Dict]:
+    """Attention aggregated per ``bucket_seconds`` window, in time order, computed in SQL."""
+    bucket = (_epoch_seconds(db, _m.timestamp) // bucket_seconds).label("bucket")
+    rows = db.execute(
+        select(
+            bucket,
+            func.min(_m.timestamp).label("first"),
+            func.count(_m.id).label("count"),
+            func.avg(_m.attention_score).label("avg"),
+            func.min(_m.attention_score).label("min"),
+            func.max(_m.attention_score).label("max"),
+            func.max(cast(_m.break_recommended, Integer)).label("break_recommended"),
+        ).where(_m.session_id == session_id).group_by(bucket).order_by(bucket)
+    ).all()
+    return [
+        {
+            "bucket_start": _EPOCH + timedelta(seconds=row.bucket * bucket_seconds),
+            "first_timestamp": row.first,
+            "count": row.count,
+            "attention_avg": row.avg,
+            "attention_min": row.min,
+            "attention_max": row.max,
+            "break_recommended": bool(row.break_recommended),
+        }
+        for row in rows
+    ]
+
+def iter_metrics(db: Session, session_id: int, chunk_size: int = config.METRICS_PAGE_SIZE) -> Iterator[Dict]:
+    """Every metric of the session in time order, holding at most ``chunk_size`` rows in memory."""
+    rows = db.execute(
+        select(*_METRIC_COLUMNS).where(_m.session_id == session_id).order_by(_m.timestamp, _m.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for row in rows:
+        yield metric_dict(row)
@@ -0,0 +1,66 @@
+"""Schema migrations for databases created before the current models.
+
+``models.Base.metadata.create_all`` only creates missing tables, so changes
+to existing tables (new indexes, new columns) are applied here. Each
+migration runs once; the applied version is stored in ``schema_version``.
+
+    python migrations.py
+"""
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateColumn
+
+import models
+
+_version_metadata = MetaData()
+schema_version = Table("schema_version", _version_metadata, Column("version", Integer, nullable=False))
+
+def _add_session_timestamp_indexes(conn: Connection):
+    for model in (models.FocusLog, models.AttentionMetric, models.AttentionRecord):
+        for index in model.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+def _add_column_if_missing(conn: Connection, model, column_name: str):
+    """Add ``model``'s column to an existing table, with the column's own type and default."""
+    table = model.__table__
+    if column_name in {c["name"] for c in inspect(conn).get_columns(table.name)}:
+        return
+    column_ddl = CreateColumn(table.c[column_name]).compile(dialect=conn.dialect)
+    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}")
+
+def _add_session_aggregates(conn: Connection):
+    # Existing sessions start at zero; `python aggregates.py` recomputes them from their logs
+    for name in ("frame_count", "attention_sum", "attention_sum_sq", "attention_min", "attention_max",
+                 "emotion_counts", "focused_seconds", "last_frame_at"):
+        _add_column_if_missing(conn, models.StudySession, name)
+
+def _add_emotion_blobs(conn: Connection):
+    # Existing rows keep their JSON; `python emotion_codec.py` packs them
+    for model in (models.FocusLog, models.AttentionRecord):
+        _add_column_if_missing(conn, model, "emotions_blob")
+
+# Append only; a migration's position in this list is its version number
+MIGRATIONS = [
+    _add_session_timestamp_indexes,
+    _add_session_aggregates,
+    _add_emotion_blobs,
+]
+
+def run_migrations(engine: Engine) -> int:
+    """Apply pending migrations and return the resulting schema version."""
+    with engine.begin() as conn:
+        _version_metadata.create_all(conn)
+        version = conn.execute(select(schema_version.c.version)).scalar()
+        if version is None:
+            conn.execute(schema_version.insert().values(version=0))
+            version = 0
+        for migration in MIGRATIONS[version:]:
+            migration(conn)
+            version += 1
+        conn.execute(schema_version.update().values(version=version))
+    return version
+
+if __name__ == "__main__":
+    from database import engine
+    models.Base.metadata.create_all(bind=engine)
+    print(f"Schema at version {run_migrations(engine)}")
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, JSON, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, JSON, Boolean, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
+import emotion_codec
 
 Base = declarative_base()
 
@@ -14,21 +15,43 @@ class StudySession(Base):
     total_duration = Column(Float, nullable=True)  # in minutes
     average_attention_score = Column(Float, nullable=True)  # 0-100
     recommended_break_duration = Column(Integer, nullable=True)  # in minutes
+    # Running aggregates over every logged frame, maintained by aggregates.apply_frames
+    frame_count = Column(Integer, nullable=False, default=0, server_default="0")
+    attention_sum = Column(Float, nullable=False, default=0.0, server_default="0")
+    attention_sum_sq = Column(Float, nullable=False, default=0.0, server_default="0")
+    attention_min = Column(Float, nullable=True)
+    attention_max = Column(Float, nullable=True)
+    emotion_counts = Column(JSON, nullable=True)  # dominant emotion -> frames
+    focused_seconds = Column(Float, nullable=False, default=0.0, server_default="0")
+    last_frame_at = Column(DateTime, nullable=True)
     focus_logs = relationship("FocusLog", back_populates="session")
     attention_metrics = relationship("AttentionMetric", back_populates="session")
 
 class FocusLog(Base):
     __tablename__ = "focus_logs"
+    __table_args__ = (Index("ix_focus_logs_session_timestamp", "session_id", "timestamp"),)
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("study_sessions.id"))
     timestamp = Column(DateTime, default=datetime.utcnow)
     focused = Column(Boolean)
-    emotions = Column(JSON)  # Store emotion probabilities
+    # Emotion probabilities, as JSON or as a packed vector (see emotion_codec); read them through `emotions`
+    emotions_json = Column("emotions", JSON(none_as_null=True))
+    emotions_blob = Column(LargeBinary, nullable=True)
     attention_score = Column(Float)  # 0-100 score
     session = relationship("StudySession", back_populates="focus_logs")
 
+    @property
+    def emotions(self):
+        return emotion_codec.row_emotions(self.emotions_json, self.emotions_blob)
+
+    @emotions.setter
+    def emotions(self, value):
+        for key, stored in emotion_codec.storage_values(value).items():
+            setattr(self, key, stored)
+
 class AttentionMetric(Base):
     __tablename__ = "attention_metrics"
+    __table_args__ = (Index("ix_attention_metrics_session_timestamp", "session_id", "timestamp"),)
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("study_sessions.id"))
     timestamp = Column(DateTime, default=datetime.utcnow)
@@ -41,12 +64,16 @@ class AttentionMetric(Base):
 
 class AttentionRecord(Base):
     __tablename__ = 'attention_records'
+    __table_args__ = (Index("ix_attention_records_session_timestamp", "session_id", "timestamp"),)
     id = Column(Integer, primary_key=True)
     session_id = Column(Integer, nullable=False)
     timestamp = Column(DateTime, nullable=False)
-    emotions = Column(JSON)
+    emotions_json = Column("emotions", JSON(none_as_null=True))
+    emotions_blob = Column(LargeBinary, nullable=True)
     attention_score = Column(Float)
 
+    emotions = FocusLog.emotions
+
 class FocusRecord(Base):
     __tablename__ = 'focus_records'
     id = Column(Integer, primary_key=True)
@@ -54,3 +81,22 @@ class FocusRecord(Base):
     timestamp = Column(DateTime, nullable=False)
     attention_score = Column(Float)
     focus_duration = Column(Float)
+
+class _RollupColumns:
+    # Sums rather than averages, so a session's contribution can be added to an existing period
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String, nullable=False)
+    period_start = Column(DateTime, nullable=False)
+    session_count = Column(Integer, nullable=False, default=0)
+    frame_count = Column(Integer, nullable=False, default=0)
+    attention_sum = Column(Float, nullable=False, default=0.0)
+    focused_seconds = Column(Float, nullable=False, default=0.0)
+    emotion_counts = Column(JSON, nullable=True)  # dominant emotion -> frames
+
+class HourlyRollup(_RollupColumns, Base):
+    __tablename__ = "hourly_rollups"
+    __table_args__ = (Index("ix_hourly_rollups_user_period", "user_id", "period_start", unique=True),)
+
+class DailyRollup(_RollupColumns, Base):
+    __tablename__ = "daily_rollups"
+    __table_args__ = (Index("ix_daily_rollups_user_period", "user_id", "period_start", unique=True),)
@@ -0,0 +1,66 @@
+import threading
+from typing import Optional
+
+import cv2
+import numpy as np
+
+import config
+
+FACE_SIZE = 48
+INPUT_SHAPE = (FACE_SIZE, FACE_SIZE, 1)
+
+_REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+_SCALE = np.float32(1.0 / 255.0)
+_local = threading.local()
+
+def decode_grayscale(image_data: bytes, reduction: int = config.DECODE_REDUCTION) -> Optional[np.ndarray]:
+    """Decode an encoded frame straight to grayscale at 1/``reduction`` scale (1, 2, 4 or 8).
+
+    JPEG decoders skip most of the work for reduced scales, and no colour
+    frame is ever materialized. Returns None if the data can't be decoded.
+    """
+    if reduction not in _REDUCED_GRAYSCALE_FLAGS:
+        raise ValueError(f"Unsupported decode reduction: {reduction}")
+    if not image_data:
+        # cv2.imdecode asserts on an empty buffer instead of returning None
+        return None
+    return cv2.imdecode(np.frombuffer(image_data, np.uint8), _REDUCED_GRAYSCALE_FLAGS[reduction])
+
+def _thread_buffers():
+    buffers = getattr(_local, "buffers", None)
+    if buffers is None:
+        buffers = _local.buffers = (
+            np.empty((FACE_SIZE, FACE_SIZE), dtype=np.uint8),
+            np.empty(INPUT_SHAPE, dtype=np.float32),
+        )
+    return buffers
+
+def face_buffer() -> np.ndarray:
+    """This thread's reusable ``(48, 48, 1)`` model input buffer; the next write on the thread overwrites it."""
+    return _thread_buffers()[1]
+
+def to_model_input(face_img: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Turn a BGR or grayscale face crop into a ``(48, 48, 1)`` float32 model input in [0, 1].
+
+    The result is written into ``out`` (e.g. a row of a batch array) when
+    given; grayscale crops then need no allocation at all.
+    """
+    if face_img.ndim == 3 and face_img.shape[2] == 3:
+        face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+    elif face_img.ndim == 3:
+        face_img = face_img[:, :, 0]
+    resized = cv2.resize(face_img, (FACE_SIZE, FACE_SIZE), dst=_thread_buffers()[0])
+    if out is None:
+        out = np.empty(INPUT_SHAPE, dtype=np.float32)
+    np.multiply(resized, _SCALE, out=out[:, :, 0])
+    return out
+
+def new_batch(size: int) -> np.ndarray:
+    """Allocate an uninitialized ``(size, 48, 48, 1)`` batch whose rows can be passed as ``out``."""
+    return np.empty((size,) + INPUT_SHAPE, dtype=np.float32)
@@ -0,0 +1,181 @@
+"""Hourly and daily per-user rollups for progress analytics.
+
+Every write-buffer flush sums its frames per hour and adds them to the
+user's HourlyRollup and DailyRollup rows, in the same transaction as the
+session aggregates; a session is counted in the hour it starts. /analytics/
+then reads a handful of rollup rows per period instead of every frame the
+user has logged.
+
+Rollups can be rebuilt from the focus logs of every session:
+
+    python rollups.py              # every user
+    python rollups.py alice bob    # selected users
+"""
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import config
+import emotion_codec
+import models
+
+ROLLUP_MODELS = {"hour": models.HourlyRollup, "day": models.DailyRollup}
+GRANULARITIES = ("hour", "day", "week")
+PERIOD_LENGTHS = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+
+def truncate(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the hour, day or (Monday-based) week containing ``timestamp``."""
+    start = timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == "hour":
+        return start
+    start = start.replace(hour=0)
+    if granularity == "week":
+        start -= timedelta(days=start.weekday())
+    return start
+
+def _empty() -> Dict:
+    return {"session_count": 0, "frame_count": 0, "attention_sum": 0.0, "focused_seconds": 0.0, "emotion_counts": {}}
+
+def _merge(totals: Dict, other: Dict):
+    for key in ("session_count", "frame_count", "attention_sum", "focused_seconds"):
+        totals[key] += other[key] or 0
+    for emotion, count in (other["emotion_counts"] or {}).items():
+        totals["emotion_counts"][emotion] = totals["emotion_counts"].get(emotion, 0) + count
+
+def frame_contributions(frames: Iterable[Tuple[datetime, bool, Optional[Dict], float]],
+                        last_frame_at: Optional[datetime] = None) -> Dict[datetime, Dict]:
+    """``(timestamp, focused, emotions, attention_score)`` frames summed per hour.
+
+    ``last_frame_at`` is the session's latest frame before these. Focused
+    time follows ``aggregates.apply_frames``: a focused frame adds the gap
+    since the previous frame, capped at STUDYSYNC_FOCUS_GAP_CAP_SECONDS, and
+    a frame older than the latest one adds none.
+    """
+    hours: Dict[datetime, Dict] = {}
+    for timestamp, focused, emotions, score in frames:
+        hour = hours.setdefault(truncate(timestamp, "hour"), _empty())
+        hour["frame_count"] += 1
+        hour["attention_sum"] += score or 0.0
+        if emotions:
+            dominant = max(emotions.items(), key=lambda x: x[1])[0]
+            hour["emotion_counts"][dominant] = hour["emotion_counts"].get(dominant, 0) + 1
+        if last_frame_at is None or timestamp >= last_frame_at:
+            if focused and last_frame_at is not None:
+                hour["focused_seconds"] += min((timestamp - last_frame_at).total_seconds(), config.FOCUS_GAP_CAP_SECONDS)
+            last_frame_at = timestamp
+    return hours
+
+def merge_periods(totals: Dict[datetime, Dict], periods: Dict[datetime, Dict]):
+    """Add per-period contributions into ``totals``."""
+    for period_start, contribution in periods.items():
+        _merge(totals.setdefault(period_start, _empty()), contribution)
+
+def _session_start(session: models.StudySession) -> Dict[datetime, Dict]:
+    return {truncate(session.start_time, "hour"): dict(_empty(), session_count=1)}
+
+def session_contributions(db: Session, session: models.StudySession) -> Dict[datetime, Dict]:
+    """All of the session's logged frames summed per hour, with the session itself counted in the hour it started."""
+    logs = db.query(
+        models.FocusLog.timestamp, models.FocusLog.focused, models.FocusLog.emotions_json,
+        models.FocusLog.emotions_blob, models.FocusLog.attention_score
+    ).filter(models.FocusLog.session_id == session.id).order_by(models.FocusLog.timestamp).yield_per(1000)
+    hours = frame_contributions(
+        (timestamp, focused, emotion_codec.row_emotions(emotions_json, emotions_blob), score)
+        for timestamp, focused, emotions_json, emotions_blob, score in logs
+    )
+    merge_periods(hours, _session_start(session))
+    return hours
+
+def _add(db: Session, model, user_id: str, period_start: datetime, contribution: Dict):
+    row = db.query(model).filter(model.user_id == user_id, model.period_start == period_start).first()
+    if row is None:
+        row = model(user_id=user_id, period_start=period_start, **_empty())
+        db.add(row)
+    totals = {key: getattr(row, key) for key in _empty()}
+    totals["emotion_counts"] = dict(totals["emotion_counts"] or {})
+    _merge(totals, contribution)
+    # emotion_counts is reassigned rather than mutated so SQLAlchemy sees the JSON change
+    for key, value in totals.items():
+        setattr(row, key, value)
+
+def add_periods(db: Session, user_id: str, hours: Dict[datetime, Dict]):
+    """Add per-hour contributions to the user's hourly and daily rollups; the caller commits."""
+    days: Dict[datetime, Dict] = {}
+    for hour, contribution in hours.items():
+        _merge(days.setdefault(truncate(hour, "day"), _empty()), contribution)
+    for model, periods in ((models.HourlyRollup, hours), (models.DailyRollup, days)):
+        for period_start, contribution in periods.items():
+            _add(db, model, user_id, period_start, contribution)
+    # The session factory doesn't autoflush; later lookups of the same period must see these rows
+    db.flush()
+
+def add_session_start(db: Session, session: models.StudySession):
+    """Count a new session in its user's rollups; its frames are added as they are flushed."""
+    add_periods(db, session.user_id, _session_start(session))
+
+def add_session(db: Session, session: models.StudySession):
+    """Add a whole session, read back from its focus logs, to its user's rollups; the caller commits."""
+    add_periods(db, session.user_id, session_contributions(db, session))
+
+def rebuild(db: Session, user_ids: Optional[Iterable[str]] = None) -> int:
+    """Recompute rollups from the focus logs of every session; returns the number of sessions."""
+    user_ids = list(user_ids or [])
+    for model in ROLLUP_MODELS.values():
+        query = db.query(model)
+        if user_ids:
+            query = query.filter(model.user_id.in_(user_ids))
+        query.delete(synchronize_session=False)
+    sessions = db.query(models.StudySession)
+    if user_ids:
+        sessions = sessions.filter(models.StudySession.user_id.in_(user_ids))
+    count = 0
+    for session in sessions.order_by(models.StudySession.id).all():
+        add_session(db, session)
+        count += 1
+    db.commit()
+    return count
+
+def period_totals(db: Session, user_id: str, granularity: str, start: datetime, end: datetime) -> Dict[datetime, Dict]:
+    """Summed rollups per period in ``[start, end)``, read from the rollup tables alone; weeks are summed from days."""
+    model = models.HourlyRollup if granularity == "hour" else models.DailyRollup
+    rows = db.query(model).filter(
+        model.user_id == user_id, model.period_start >= start, model.period_start < end
+    ).order_by(model.period_start)
+    totals: Dict[datetime, Dict] = {}
+    for row in rows:
+        _merge(totals.setdefault(truncate(row.period_start, granularity), _empty()),
+               {key: getattr(row, key) for key in _empty()})
+    return totals
+
+def combine(totals: Iterable[Dict]) -> Dict:
+    combined = _empty()
+    for t in totals:
+        _merge(combined, t)
+    return combined
+
+def view(totals: Dict) -> Dict:
+    """Client-facing figures for summed rollups."""
+    frames = totals["frame_count"]
+    emotion_total = sum(totals["emotion_counts"].values())
+    return {
+        "session_count": totals["session_count"],
+        "frame_count": frames,
+        "focused_minutes": totals["focused_seconds"] / 60,
+        "attention_average": totals["attention_sum"] / frames if frames else None,
+        "emotion_distribution": {k: v / emotion_total for k, v in totals["emotion_counts"].items()}
+        if emotion_total else {},
+    }
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    from migrations import run_migrations
+    models.Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        rebuilt = rebuild(db, sys.argv[1:])
+    finally:
+        db.close()
+    print(f"Rebuilt rollups from {rebuilt} sessions")
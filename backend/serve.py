@@ -0,0 +1,297 @@
+"""Preforking production launcher for the StudySync API.
+
+The parent imports the app and preloads the face detector and, where the
+backend survives fork, the emotion model (``focus_detector.preload``), then
+forks ``--workers`` processes that share those pages copy-on-write and
+accept connections on one listening socket. With the ONNX and TFLite
+backends the model weights are shared; TensorFlow doesn't survive fork, so
+with it only the detector and the imported code are, and each worker loads
+its own copy of the (small) model. Each worker warms its models before it
+starts accepting, then reports ready to the parent over a pipe.
+
+The parent restarts a worker that exits, that isn't ready within
+STUDYSYNC_WORKER_READY_TIMEOUT_SECONDS, or whose private (not shared)
+memory exceeds STUDYSYNC_WORKER_MAX_MEMORY_MIB. A replacement is started
+before the old worker is stopped. Workers that keep dying before they get
+ready are restarted with exponential backoff.
+
+    python serve.py --workers 4 --port 8000
+
+Workers share nothing about a session but the database. A session's
+WebSocket stream stays on the worker that accepted it; its per-frame POSTs
+may land on any worker. Each worker writes the frames it analyzed into the
+session's aggregates when it flushes, and frames flushed after
+``end_session`` update the session's average and recommended break again,
+so the summary doesn't depend on which worker ended the session. A worker
+that sees a session for the first time loads its break window from the
+database; after that, its break window and face tracker only see the
+frames that worker analyzes.
+
+Needs fork (Linux, macOS). The memory ceiling is read from /proc and is
+only enforced on Linux.
+"""
+import argparse
+import logging
+import os
+import select
+import signal
+import socket
+import threading
+import time
+import urllib.request
+from typing import Dict, Optional
+
+import config
+
+logger = logging.getLogger("serve")
+
+STOP_GRACE_SECONDS = 30.0
+MAX_BACKOFF_SECONDS = 30.0
+
+def private_memory_mib(pid: int) -> Optional[float]:
+    """Memory used by ``pid`` alone, not shared copy-on-write with the parent; None if unknown."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            kib = sum(int(line.split()[1]) for line in f if line.startswith(("Private_Clean:", "Private_Dirty:")))
+    except (OSError, ValueError, IndexError):
+        return None
+    return kib / 1024
+
+def wait_until_ready(url: str, timeout: float, process=None) -> bool:
+    """Poll ``url`` (e.g. ``/readyz``) until it answers 200. False on timeout or once ``process`` has exited."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(0.25)
+    return False
+
+def preload():
+    """Import the app and load what the workers can share, in the parent."""
+    import main
+    import focus_detector
+    focus_detector.preload()
+    # Connections opened while creating the schema must not be shared by forked workers
+    main.engine.dispose()
+
+def _run_worker(sock: socket.socket, ready_fd: int, parent_pid: int, log_level: str):
+    import uvicorn
+    import main
+    from inference_pool import inference_pool
+
+    # Load and warm the models before the worker accepts a single connection
+    inference_pool.start()
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level=log_level))
+
+    def report_ready():
+        while not server.started and not server.should_exit:
+            time.sleep(0.05)
+        if server.started:
+            os.write(ready_fd, b"1")
+        os.close(ready_fd)
+
+    def watch_parent():
+        # Workers run in their own process group, so they must not outlive a killed parent
+        while os.getppid() == parent_pid:
+            time.sleep(1.0)
+        server.should_exit = True
+
+    threading.Thread(target=report_ready, name="worker-ready", daemon=True).start()
+    threading.Thread(target=watch_parent, name="worker-parent-watch", daemon=True).start()
+    server.run(sockets=[sock])
+
+class Worker:
+    def __init__(self, pid: int, ready_fd: int):
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.started = time.monotonic()
+        self.ready = False
+        self.stopping_since: Optional[float] = None
+
+class Supervisor:
+    """Keeps ``count`` ready workers serving ``sock``."""
+
+    def __init__(self, sock: socket.socket, count: int, max_memory_mib: int = config.WORKER_MAX_MEMORY_MIB,
+                 ready_timeout: float = config.WORKER_READY_TIMEOUT_SECONDS,
+                 check_interval: float = config.WORKER_CHECK_SECONDS, log_level: str = "info"):
+        self.sock = sock
+        self.count = count
+        self.max_memory_mib = max_memory_mib
+        self.ready_timeout = ready_timeout
+        self.check_interval = check_interval
+        self.log_level = log_level
+        self.workers: Dict[int, Worker] = {}
+        self._stopping = False
+        self._all_ready_logged = False
+        self._last_check = time.monotonic()
+        # Workers in a row that died before getting ready, and when the next may be started
+        self._failures = 0
+        self._spawn_after = 0.0
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        while not self._stopping:
+            self.poll()
+        self.shutdown()
+
+    def poll(self, timeout: float = 0.5):
+        """One round of supervision: start missing workers, collect ready reports, reap and check workers."""
+        self._replace_missing()
+        pending = [w.ready_fd for w in self.workers.values() if not w.ready]
+        if pending:
+            readable = select.select(pending, [], [], timeout)[0]
+        else:
+            readable = []
+            time.sleep(timeout)
+        for fd in readable:
+            self._mark_ready(fd)
+        self._reap()
+        now = time.monotonic()
+        self._check_timeouts(now)
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._check_memory()
+
+    def _on_signal(self, signum, frame):
+        self._stopping = True
+
+    def _active(self):
+        return [w for w in self.workers.values() if w.stopping_since is None]
+
+    def _replace_missing(self):
+        if time.monotonic() < self._spawn_after:
+            return
+        for _ in range(self.count - len(self._active())):
+            self.spawn()
+
+    def spawn(self) -> Worker:
+        read_fd, write_fd = os.pipe()
+        parent_pid = os.getpid()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.setpgid(0, 0)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                os.close(read_fd)
+                for worker in self.workers.values():
+                    os.close(worker.ready_fd)
+                _run_worker(self.sock, write_fd, parent_pid, self.log_level)
+                code = 0
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+            finally:
+                os._exit(code)
+        os.close(write_fd)
+        worker = self.workers[pid] = Worker(pid, read_fd)
+        logger.info("Started worker %d", pid)
+        return worker
+
+    def _mark_ready(self, fd: int):
+        worker = next((w for w in self.workers.values() if w.ready_fd == fd), None)
+        if worker is None or not os.read(fd, 1):
+            return  # closed without reporting: the worker is exiting and will be reaped
+        worker.ready = True
+        self._failures = 0
+        logger.info("Worker %d ready after %.1f s", worker.pid, time.monotonic() - worker.started)
+        if not self._all_ready_logged and len([w for w in self._active() if w.ready]) >= self.count:
+            self._all_ready_logged = True
+            logger.info("All %d workers ready", self.count)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            os.close(worker.ready_fd)
+            if worker.stopping_since is None and not self._stopping:
+                logger.warning("Worker %d exited with status %d; restarting", pid, os.waitstatus_to_exitcode(status))
+            if not worker.ready and not self._stopping:
+                self._failures += 1
+                backoff = min(MAX_BACKOFF_SECONDS, 0.5 * 2 ** self._failures)
+                self._spawn_after = time.monotonic() + backoff
+                logger.warning("Worker %d never got ready (%d in a row); next start in %.1f s",
+                               pid, self._failures, backoff)
+
+    def _retire(self, worker: Worker, reason: str):
+        """Start a replacement, then stop ``worker`` gracefully."""
+        logger.warning("Replacing worker %d: %s", worker.pid, reason)
+        worker.stopping_since = time.monotonic()
+        self._replace_missing()
+        self._signal(worker, signal.SIGTERM)
+
+    @staticmethod
+    def _signal(worker: Worker, signum: int):
+        try:
+            os.kill(worker.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _check_timeouts(self, now: float):
+        for worker in list(self.workers.values()):
+            if worker.stopping_since is not None:
+                if now - worker.stopping_since > STOP_GRACE_SECONDS:
+                    self._signal(worker, signal.SIGKILL)
+            elif not worker.ready and now - worker.started > self.ready_timeout:
+                self._retire(worker, f"not ready after {self.ready_timeout:.0f} s")
+
+    def _check_memory(self):
+        if self.max_memory_mib <= 0:
+            return
+        for worker in self._active():
+            mib = private_memory_mib(worker.pid)
+            if worker.ready and mib is not None and mib > self.max_memory_mib:
+                self._retire(worker, f"{mib:.0f} MiB private memory > {self.max_memory_mib} MiB")
+
+    def shutdown(self):
+        self._stopping = True
+        logger.info("Stopping %d workers", len(self.workers))
+        for worker in self.workers.values():
+            self._signal(worker, signal.SIGTERM)
+        deadline = time.monotonic() + STOP_GRACE_SECONDS
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for worker in self.workers.values():
+            self._signal(worker, signal.SIGKILL)
+        while self.workers:
+            self._reap()
+            time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=config.WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--max-memory-mib", type=int, default=config.WORKER_MAX_MEMORY_MIB,
+                        help="replace a worker whose private memory exceeds this (0: no limit)")
+    parser.add_argument("--ready-timeout", type=float, default=config.WORKER_READY_TIMEOUT_SECONDS)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s[%(process)d] %(message)s")
+
+    started = time.monotonic()
+    preload()
+    if threading.active_count() > 1:
+        logger.warning("%d threads running before fork; workers won't inherit them", threading.active_count())
+    sock = socket.create_server((args.host, args.port), backlog=2048)
+    logger.info("Preloaded in %.1f s; serving http://%s:%d with %d workers",
+                time.monotonic() - started, args.host, args.port, args.workers)
+    Supervisor(sock, args.workers, args.max_memory_mib, args.ready_timeout, log_level=args.log_level).run()
+
+if __name__ == "__main__":
+    main()
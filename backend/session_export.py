@@ -0,0 +1,75 @@
+"""Columnar export of a session's frames as a NumPy ``.npz`` archive.
+
+Arrays, one entry per focus log in time order:
+
+- ``timestamps``: datetime64[us]
+- ``focused``: bool
+- ``attention_score``: float32
+- ``emotions``: float32 of shape (frames, 7), NaN where no face was found
+- ``labels``: the emotion order of ``emotions``' columns
+
+    python session_export.py 12 session12.npz
+"""
+import io
+import sys
+from typing import Dict
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import emotion_codec
+import models
+
+def session_arrays(db: Session, session_id: int) -> Dict[str, np.ndarray]:
+    """The session's focus logs as columns, filled chunk by chunk into preallocated arrays."""
+    log = models.FocusLog
+    count = db.query(func.count(log.id)).filter(log.session_id == session_id).scalar()
+    timestamps = np.empty(count, dtype="datetime64[us]")
+    focused = np.zeros(count, dtype=bool)
+    attention = np.full(count, np.nan, dtype=np.float32)
+    emotions = np.full((count, len(emotion_codec.EMOTION_LABELS)), np.nan, dtype=np.float32)
+
+    rows = db.query(
+        log.timestamp, log.focused, log.attention_score, log.emotions_json, log.emotions_blob
+    ).filter(log.session_id == session_id).order_by(log.timestamp, log.id).yield_per(1000)
+    # Rows logged after the count are left for the next export
+    filled = 0
+    for i, (timestamp, is_focused, score, emotions_json, emotions_blob) in zip(range(count), rows):
+        filled = i + 1
+        timestamps[i] = timestamp
+        focused[i] = bool(is_focused)
+        if score is not None:
+            attention[i] = score
+        if emotions_blob:
+            # Packed rows go straight from bytes to the row, without a dict in between
+            emotions[i] = emotion_codec.decode_array(emotions_blob)
+        elif emotions_json:
+            emotions[i] = [emotions_json.get(label, 0.0) for label in emotion_codec.EMOTION_LABELS]
+
+    # Rows deleted after the count leave the tail unfilled; it's cut off rather than exported
+    return {
+        "timestamps": timestamps[:filled],
+        "focused": focused[:filled],
+        "attention_score": attention[:filled],
+        "emotions": emotions[:filled],
+        "labels": np.array(emotion_codec.EMOTION_LABELS),
+    }
+
+def export_npz(db: Session, session_id: int) -> bytes:
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **session_arrays(db, session_id))
+    return buffer.getvalue()
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    session_id = int(sys.argv[1])
+    path = sys.argv[2] if len(sys.argv) > 2 else f"session_{session_id}.npz"
+    db = SessionLocal()
+    try:
+        data = export_npz(db, session_id)
+    finally:
+        db.close()
+    with open(path, "wb") as f:
+        f.write(data)
+    print(f"Wrote {path} ({len(data)} bytes)")
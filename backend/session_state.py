@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import config
+from break_recommender import BreakRecommender
+from face_identity import FaceIdentities
+from face_tracker import FaceTracker
+from frame_cache import FrameCache
+
+class SessionState:
+    """In-memory, per-session state kept by the process that analyzes its frames."""
+
+    def __init__(self):
+        self.tracker = FaceTracker()
+        self.cache = FrameCache()
+        self.recommender = BreakRecommender()
+        self.identities = FaceIdentities()
+
+class SessionStateRegistry:
+    """Bounded map of session id to SessionState, evicting the least recently used session."""
+
+    def __init__(self, max_sessions: int = config.MAX_TRACKED_SESSIONS):
+        self.max_sessions = max_sessions
+        self._states: "OrderedDict[int, SessionState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: int) -> SessionState:
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is None:
+                state = self._states[session_id] = SessionState()
+                while len(self._states) > self.max_sessions:
+                    self._states.popitem(last=False)
+            else:
+                self._states.move_to_end(session_id)
+            return state
+
+    def setdefault(self, session_id: int, state: SessionState) -> SessionState:
+        """Keep ``state`` for the session unless another thread added one first; returns the kept state."""
+        with self._lock:
+            if session_id not in self._states:
+                self._states[session_id] = state
+                while len(self._states) > self.max_sessions:
+                    self._states.popitem(last=False)
+            return self._states[session_id]
+
+    def drop(self, session_id: int) -> Optional[SessionState]:
+        with self._lock:
+            return self._states.pop(session_id, None)
+
+    def __contains__(self, session_id: int) -> bool:
+        return session_id in self._states
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+session_states = SessionStateRegistry()
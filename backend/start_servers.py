@@ -1,15 +1,22 @@
+import os
 import subprocess
-import time
 import sys
 
-backend_cmd = [sys.executable, '-m', 'uvicorn', 'backend.main:app']
-backend_proc = subprocess.Popen(backend_cmd)
-time.sleep(2)
-frontend_cmd = ['npm', 'run', 'dev', '--prefix', 'frontend']
+from serve import wait_until_ready
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+backend_cmd = [sys.executable, 'serve.py']
+backend_proc = subprocess.Popen(backend_cmd, cwd=BACKEND_DIR)
+# Start the frontend only once the API has a warmed-up worker
+if not wait_until_ready('http://127.0.0.1:8000/readyz', 300, backend_proc):
+    backend_proc.terminate()
+    sys.exit('Backend did not become ready')
+frontend_cmd = ['npm', 'run', 'dev', '--prefix', os.path.join(BACKEND_DIR, '..', 'frontend')]
 frontend_proc = subprocess.Popen(frontend_cmd)
 try:
     backend_proc.wait()
     frontend_proc.wait()
 except KeyboardInterrupt:
     backend_proc.terminate()
-    frontend_proc.terminate() 
\ No newline at end of file
+    frontend_proc.terminate()
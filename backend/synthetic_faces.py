@@ -0,0 +1,24 @@
+"""Cartoon faces drawn with OpenCV, for tests and benchmarks that need frames the face detector finds."""
+from typing import Sequence, Tuple
+
+import cv2
+import numpy as np
+
+def draw_face(img: np.ndarray, cx: int, cy: int, scale: float = 1.0):
+    """Draw a cartoon face that the Haar frontal-face cascade detects onto a grayscale image."""
+    s = scale
+    cv2.ellipse(img, (cx, cy), (int(60 * s), int(80 * s)), 0, 0, 360, 200, -1)
+    for side in (-1, 1):
+        eye_x = cx + int(25 * s) * side
+        cv2.ellipse(img, (eye_x, cy - int(34 * s)), (int(16 * s), int(4 * s)), 0, 0, 360, 60, -1)
+        cv2.ellipse(img, (eye_x, cy - int(20 * s)), (int(12 * s), int(6 * s)), 0, 0, 360, 40, -1)
+    cv2.ellipse(img, (cx, cy + int(10 * s)), (int(6 * s), int(18 * s)), 0, 0, 360, 170, -1)
+    cv2.ellipse(img, (cx, cy + int(25 * s)), (int(12 * s), int(4 * s)), 0, 0, 360, 120, -1)
+    cv2.ellipse(img, (cx, cy + int(45 * s)), (int(24 * s), int(6 * s)), 0, 0, 360, 60, -1)
+
+def face_jpeg(faces: Sequence[Tuple[int, int, float]] = (), width: int = 640, height: int = 480) -> bytes:
+    """A JPEG frame with a face drawn at each ``(cx, cy, scale)``; one face in the middle by default."""
+    img = np.full((height, width), 90, np.uint8)
+    for cx, cy, scale in faces or [(width // 2, height // 2, 1.0)]:
+        draw_face(img, cx, cy, scale)
+    return cv2.imencode(".jpg", cv2.GaussianBlur(img, (7, 7), 0))[1].tobytes()
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import aggregates
+import config
+import models
+from write_buffer import MetricWriteBuffer
+
+START = datetime(2024, 1, 1, 9, 0)
+HAPPY = {"happy": 0.7, "neutral": 0.3}
+NEUTRAL = {"happy": 0.2, "neutral": 0.8}
+
+def new_session(db) -> models.StudySession:
+    session = models.StudySession(user_id="u", start_time=START)
+    db.add(session)
+    db.commit()
+    return session
+
+def at(seconds: float) -> datetime:
+    return START + timedelta(seconds=seconds)
+
+def test_apply_frames_tracks_totals_extremes_and_emotions():
+    session = models.StudySession(user_id="u", start_time=START)
+    aggregates.reset(session)
+    aggregates.apply_frames(session, [
+        (at(0), True, HAPPY, 40.0),
+        (at(2), True, NEUTRAL, 50.0),
+        (at(4), False, None, 0.0),
+        (at(6), True, NEUTRAL, 50.0),
+    ])
+
+    assert session.frame_count == 4
+    assert session.attention_sum == 140.0 and session.attention_sum_sq == 40.0 ** 2 + 2 * 50.0 ** 2
+    assert (session.attention_min, session.attention_max) == (0.0, 50.0)
+    assert session.emotion_counts == {"happy": 1, "neutral": 2}
+    # A focused frame counts the gap since the previous frame, whatever that one was
+    assert session.focused_seconds == 4.0
+    assert session.last_frame_at == at(6)
+
+    summary = aggregates.summary(session)
+    assert summary["attention_mean"] == 35.0
+    assert summary["attention_std"] == pytest.approx(20.6155, rel=1e-4)
+    assert summary["emotion_distribution"] == {"happy": 0.25, "neutral": 0.5}
+    assert summary["focused_minutes"] == pytest.approx(4.0 / 60)
+
+def test_focused_time_caps_gaps_and_skips_late_frames(monkeypatch):
+    monkeypatch.setattr(config, "FOCUS_GAP_CAP_SECONDS", 10.0)
+    session = models.StudySession(user_id="u", start_time=START)
+    aggregates.reset(session)
+    aggregates.apply_frames(session, [(at(0), True, HAPPY, 50.0), (at(100), True, HAPPY, 50.0)])
+    assert session.focused_seconds == 10.0
+
+    # A frame older than the last one still counts, but adds no focused time and doesn't move last_frame_at
+    aggregates.apply_frames(session, [(at(50), True, NEUTRAL, 30.0)])
+    assert session.frame_count == 3 and session.attention_min == 30.0
+    assert session.focused_seconds == 10.0 and session.last_frame_at == at(100)
+
+def test_empty_summary():
+    session = models.StudySession(user_id="u", start_time=START)
+    aggregates.reset(session)
+    summary = aggregates.summary(session)
+    assert summary["frame_count"] == 0 and summary["attention_mean"] is None and summary["attention_std"] is None
+    assert aggregates.average_attention(session) is None
+
+def test_incremental_aggregates_match_recompute(db, session_factory):
+    session = new_session(db)
+    buffer = MetricWriteBuffer(session_factory, max_rows=1000, flush_interval=60)
+    frames = [(at(3 * i), {"focused": i % 4 != 3, "emotions": HAPPY if i % 3 else NEUTRAL,
+                           "attention_score": float(i % 7) * 10, "break_recommended": False})
+              for i in range(40)]
+    # Flushed in several batches of different sizes
+    for chunk in (frames[:10], frames[10:11], frames[11:30], frames[30:]):
+        buffer.add_frames(session.id, chunk)
+        buffer.flush()
+
+    db.expire_all()
+    incremental = aggregates.summary(db.get(models.StudySession, session.id))
+    aggregates.backfill(db, [session.id])
+    db.expire_all()
+    recomputed = aggregates.summary(db.get(models.StudySession, session.id))
+
+    assert incremental["frame_count"] == recomputed["frame_count"] == 40
+    for key in ("attention_mean", "attention_std", "attention_min", "attention_max", "focused_minutes"):
+        assert incremental[key] == pytest.approx(recomputed[key])
+    assert incremental["emotion_counts"] == recomputed["emotion_counts"]
@@ -0,0 +1,86 @@
+import threading
+import time
+
+import numpy as np
+
+from batching import MicroBatcher
+
+def test_concurrent_samples_share_one_batch():
+    batch_sizes = []
+
+    def predict_fn(batch):
+        batch_sizes.append(len(batch))
+        return batch.sum(axis=(1, 2))
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=200)
+    results = {}
+
+    def worker(i):
+        results[i] = batcher.predict(np.full((2, 2), i, dtype=np.float32))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert sum(batch_sizes) == 8
+    assert len(batch_sizes) < 8
+    for i in range(8):
+        assert results[i] == 4 * i
+
+def test_batch_respects_max_size():
+    batch_sizes = []
+
+    def predict_fn(batch):
+        batch_sizes.append(len(batch))
+        return batch
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=3, max_wait_ms=50)
+    futures = [batcher.submit(np.zeros(1)) for _ in range(7)]
+    for f in futures:
+        f.result(timeout=5)
+    batcher.close()
+
+    assert max(batch_sizes) <= 3
+    assert sum(batch_sizes) == 7
+
+def test_predict_errors_reach_every_caller():
+    def predict_fn(batch):
+        raise RuntimeError("model failure")
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit(np.zeros(1)) for _ in range(3)]
+    for f in futures:
+        assert isinstance(f.exception(timeout=5), RuntimeError)
+    batcher.close()
+
+def test_lone_sample_does_not_wait():
+    batcher = MicroBatcher(lambda batch: batch, max_batch_size=8, max_wait_ms=5000)
+    start = time.monotonic()
+    for _ in range(3):
+        batcher.predict(np.zeros(1), timeout=5)
+    batcher.close()
+    assert time.monotonic() - start < 1.0
+
+def test_samples_queued_behind_a_running_batch_go_together():
+    batch_sizes = []
+    release = threading.Event()
+
+    def predict_fn(batch):
+        batch_sizes.append(len(batch))
+        release.wait(5)
+        return batch
+
+    batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=50)
+    first = batcher.submit(np.zeros(1))
+    while not batch_sizes:
+        time.sleep(0.001)
+    queued = [batcher.submit(np.zeros(1)) for _ in range(5)]
+    release.set()
+    for f in [first] + queued:
+        f.result(timeout=5)
+    batcher.close()
+
+    assert batch_sizes == [1, 5]
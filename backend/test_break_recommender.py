@@ -0,0 +1,41 @@
+import random
+from datetime import datetime, timedelta
+
+from break_recommender import BreakRecommender
+from focus_detector import should_recommend_break
+
+START = datetime(2024, 1, 1, 9, 0)
+
+def test_needs_min_samples():
+    recommender = BreakRecommender(window_seconds=300, threshold=40, min_samples=3)
+    assert not recommender.update(START, 10)
+    assert not recommender.update(START + timedelta(seconds=1), 10)
+    assert recommender.update(START + timedelta(seconds=2), 10)
+
+def test_old_scores_leave_the_window():
+    recommender = BreakRecommender(window_seconds=60, threshold=40, min_samples=1)
+    for i in range(10):
+        recommender.update(START + timedelta(seconds=i), 10)
+    assert recommender.recommended()
+
+    assert not recommender.update(START + timedelta(seconds=120), 90)
+    assert len(recommender) == 1
+    assert recommender.average() == 90
+
+def test_max_samples_bounds_memory():
+    recommender = BreakRecommender(window_seconds=300, threshold=40, min_samples=1, max_samples=5)
+    for i in range(20):
+        recommender.update(START + timedelta(milliseconds=i), float(i))
+    assert len(recommender) == 5
+    assert recommender.average() == sum(range(15, 20)) / 5
+
+def test_matches_full_history_scan():
+    rng = random.Random(0)
+    recommender = BreakRecommender(window_seconds=300, threshold=40, min_samples=10)
+    history = []
+    now = START
+    for _ in range(500):
+        now += timedelta(seconds=rng.uniform(0.5, 5))
+        score = rng.uniform(0, 80)
+        history.append((now, score))
+        assert recommender.update(now, score) == should_recommend_break(history, now)
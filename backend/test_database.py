@@ -0,0 +1,20 @@
+from database import create_db_engine
+
+def pragmas(engine):
+    with engine.connect() as conn:
+        return (conn.exec_driver_sql("PRAGMA journal_mode").scalar(),
+                conn.exec_driver_sql("PRAGMA synchronous").scalar())
+
+def test_sqlite_connections_use_wal_and_normal_sync(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    try:
+        # 1 is NORMAL
+        assert pragmas(engine) == ("wal", 1)
+    finally:
+        engine.dispose()
+
+    untuned = create_db_engine(f"sqlite:///{tmp_path / 'untuned.db'}", tuned=False)
+    try:
+        assert pragmas(untuned) == ("delete", 2)
+    finally:
+        untuned.dispose()
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from distill_emotion_model import count_flops, distillation_loss
+from train_emotion_model import build_model, build_student
+
+def test_student_is_a_smaller_drop_in():
+    teacher, student = build_model(), build_student()
+    batch = np.random.default_rng(0).random((4, 48, 48, 1), dtype=np.float32)
+    probs = student(batch, training=False).numpy()
+    assert probs.shape == (4, 7)
+    np.testing.assert_allclose(probs.sum(axis=1), 1.0, rtol=1e-5)
+    assert student.count_params() < teacher.count_params() / 10
+    assert count_flops(student) < count_flops(teacher)
+
+def test_loss_is_lowest_when_student_matches_teacher():
+    labels = tf.constant([3, 0])
+    teacher_probs = tf.constant([[0.05, 0.05, 0.1, 0.6, 0.1, 0.05, 0.05], [0.4, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1]])
+    uniform = tf.fill((2, 7), 1 / 7)
+    matched = distillation_loss(labels, teacher_probs, teacher_probs, temperature=4.0, alpha=0.0)
+    assert float(matched) == pytest.approx(0.0, abs=1e-5)
+    assert float(distillation_loss(labels, teacher_probs, uniform, temperature=4.0, alpha=0.0)) > 0
@@ -0,0 +1,47 @@
+import io
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import emotion_codec
+import models
+import session_export
+
+EMOTIONS = dict(zip(emotion_codec.EMOTION_LABELS, (0.05, 0.01, 0.04, 0.6, 0.1, 0.05, 0.15)))
+
+@pytest.mark.parametrize("storage, size, tolerance", [("float16", 14, 1e-3), ("float32", 28, 1e-7)])
+def test_round_trip(storage, size, tolerance):
+    blob = emotion_codec.encode(EMOTIONS, storage)
+    assert len(blob) == size
+    decoded = emotion_codec.decode(blob)
+    assert list(decoded) == list(emotion_codec.EMOTION_LABELS)
+    assert decoded == pytest.approx(EMOTIONS, abs=tolerance)
+    assert emotion_codec.decode(emotion_codec.encode({}, storage)) == {}
+    assert emotion_codec.encode(None, storage) is None
+
+def test_mixed_rows_read_and_export_alike(db):
+    session = models.StudySession(user_id="u", start_time=datetime(2024, 1, 1))
+    db.add(session)
+    db.commit()
+    for i, (storage, emotions) in enumerate([("json", EMOTIONS), ("float32", EMOTIONS), ("float16", {})]):
+        db.bulk_insert_mappings(models.FocusLog, [{
+            "session_id": session.id, "timestamp": session.start_time + timedelta(seconds=i), "focused": bool(emotions),
+            "attention_score": 50.0, **emotion_codec.storage_values(emotions, storage),
+        }])
+    db.commit()
+
+    logs = db.query(models.FocusLog).order_by(models.FocusLog.timestamp).all()
+    assert logs[0].emotions == EMOTIONS
+    assert logs[1].emotions == pytest.approx(EMOTIONS)
+    assert logs[2].emotions == {}
+
+    assert emotion_codec.compact(db, models.FocusLog, "float16") == 1
+    db.expire_all()
+    assert logs[0].emotions_json is None and len(logs[0].emotions_blob) == 14
+
+    arrays = np.load(io.BytesIO(session_export.export_npz(db, session.id)))
+    assert arrays["emotions"].shape == (3, 7)
+    np.testing.assert_allclose(arrays["emotions"][:2], [list(EMOTIONS.values())] * 2, atol=1e-3)
+    assert np.isnan(arrays["emotions"][2]).all()
+    assert arrays["focused"].tolist() == [True, True, False]
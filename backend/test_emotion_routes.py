@@ -0,0 +1,40 @@
+import base64
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import config
+
+pytestmark = pytest.mark.skipif(not os.path.exists(config.EMOTION_MODEL_PATH),
+                                reason="needs the emotion model file")
+
+@pytest.fixture(scope="module")
+def client():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    import emotion_routes
+    app = FastAPI()
+    app.include_router(emotion_routes.router)
+    with TestClient(app) as client:
+        yield client
+
+def test_raw_and_base64_routes_agree(client):
+    face = cv2.GaussianBlur(np.random.default_rng(0).integers(0, 256, (96, 96), dtype=np.uint8), (5, 5), 0)
+    png = cv2.imencode(".png", face)[1].tobytes()
+
+    raw = client.post("/predict_emotion/raw", content=png, headers={"Content-Type": "image/png"})
+    encoded = client.post("/predict_emotion",
+                          json={"image": "data:image/png;base64," + base64.b64encode(png).decode()})
+
+    assert raw.status_code == encoded.status_code == 200
+    assert raw.json()["emotion"] == encoded.json()["emotion"]
+    assert raw.json()["probabilities"] == pytest.approx(encoded.json()["probabilities"])
+    assert sum(raw.json()["probabilities"].values()) == pytest.approx(1.0, abs=1e-3)
+
+def test_undecodable_image_is_rejected(client):
+    assert client.post("/predict_emotion/raw", content=b"not an image").status_code == 400
+    assert client.post("/predict_emotion/raw", content=b"").status_code == 400
+    assert client.get("/emotions").json()["emotions"][0] == "angry"
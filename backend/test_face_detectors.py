@@ -0,0 +1,70 @@
+import logging
+
+import cv2
+import numpy as np
+import pytest
+
+import face_detectors
+from synthetic_faces import draw_face
+
+@pytest.fixture(scope="module")
+def gray():
+    # One face of about 120x160 px, centred at (320, 240)
+    img = np.full((480, 640), 90, np.uint8)
+    draw_face(img, 320, 240)
+    return cv2.GaussianBlur(img, (7, 7), 0)
+
+def contains_centre(box, cx=320, cy=240):
+    x, y, w, h = box
+    return x < cx < x + w and y < cy < y + h
+
+def test_factory_builds_known_detectors_and_rejects_others():
+    assert isinstance(face_detectors.create_detector("haar"), face_detectors.HaarDetector)
+    assert isinstance(face_detectors.create_detector("haar_downscaled"), face_detectors.DownscaledHaarDetector)
+    with pytest.raises(ValueError):
+        face_detectors.create_detector("mtcnn")
+
+def test_haar_respects_size_bounds(gray):
+    detector = face_detectors.HaarDetector()
+    faces = detector.detect(gray)
+    assert len(faces) == 1 and contains_centre(faces[0])
+    w = faces[0][2]
+    assert all(box[2] >= w + 20 for box in detector.detect(gray, min_size=(w + 20, w + 20)))
+    assert detector.detect(gray, min_size=(400, 400)) == []
+    assert detector.detect(gray, max_size=(w // 2, w // 2)) == []
+
+def test_downscaled_haar_maps_boxes_back_to_the_frame(gray):
+    full = face_detectors.HaarDetector().detect(gray)[0]
+    faces = face_detectors.DownscaledHaarDetector(scale=0.5).detect(gray)
+    assert len(faces) == 1 and contains_centre(faces[0])
+    assert abs(faces[0][2] - full[2]) <= full[2] * 0.25
+
+@pytest.mark.parametrize("name", ["dnn_ssd", "yunet"])
+def test_dnn_detectors_fall_back_to_haar_without_model_files(name, monkeypatch, tmp_path, caplog):
+    # The model paths are the constructors' defaults, bound from config at import
+    monkeypatch.setattr(face_detectors.DnnSsdDetector.__init__, "__defaults__",
+                        (str(tmp_path / "missing.caffemodel"), str(tmp_path / "deploy.prototxt"), 0.5, 300))
+    monkeypatch.setattr(face_detectors.YuNetDetector.__init__, "__defaults__", (str(tmp_path / "missing.onnx"), 0.5))
+
+    with caplog.at_level(logging.WARNING, logger="face_detectors"):
+        detector = face_detectors.create_detector(name)
+    assert type(detector) is face_detectors.HaarDetector
+    assert "missing" in caplog.text
+    with pytest.raises(FileNotFoundError):
+        face_detectors.create_detector(name, fallback=False)
+
+def test_yunet_boxes_are_clipped_to_the_frame():
+    class FakeYuNet:
+        def setInputSize(self, size):
+            self.size = size
+
+        def detect(self, image):
+            # x, y, w, h, then landmarks and score as YuNet returns them
+            rows = [[-12, -8, 60, 70], [600, 440, 80, 90], [700, 10, 20, 20]]
+            return 1, np.array([row + [0] * 11 for row in rows], np.float32)
+
+    detector = face_detectors.YuNetDetector.__new__(face_detectors.YuNetDetector)
+    detector.detector = FakeYuNet()
+    detector._lock = face_detectors.threading.Lock()
+    faces = detector.detect(np.zeros((480, 640), np.uint8))
+    assert faces == [(0, 0, 48, 62), (600, 440, 40, 40)]
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from face_identity import FaceIdentities, iou_matrix
+
+T0 = datetime(2024, 1, 1, 9, 0)
+
+def test_iou_matrix():
+    overlaps = iou_matrix([(0, 0, 10, 10), (100, 100, 10, 10)], [(5, 0, 10, 10)])
+    np.testing.assert_allclose(overlaps, [[50 / 150], [0.0]])
+
+def test_ids_follow_faces_that_shift_and_swap_order():
+    identities = FaceIdentities(min_iou=0.3, ttl_seconds=30)
+    first = identities.assign([(0, 0, 40, 40), (200, 0, 40, 40)], T0)
+    assert [i.id for i in first] == [1, 2]
+
+    # Detection order changed and both people moved a little
+    second = identities.assign([(205, 3, 40, 40), (4, 2, 42, 40)], T0 + timedelta(seconds=3))
+    assert [i.id for i in second] == [2, 1]
+
+    # A newcomer gets a fresh id; a lost face is forgotten after the TTL
+    third = identities.assign([(400, 0, 40, 40)], T0 + timedelta(seconds=40))
+    assert [i.id for i in third] == [3]
+    assert len(identities) == 1
+
+def test_each_person_has_their_own_break_history():
+    identities = FaceIdentities(min_iou=0.3, ttl_seconds=600)
+    flags = {}
+    for n in range(12):
+        now = T0 + timedelta(seconds=3 * n)
+        for identity, score in zip(identities.assign([(0, 0, 40, 40), (200, 0, 40, 40)], now), (20.0, 80.0)):
+            flags[identity.id] = identity.recommender.update(now, score)
+    assert flags == {1: True, 2: False}
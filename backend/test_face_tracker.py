@@ -0,0 +1,55 @@
+import numpy as np
+
+from face_tracker import FaceTracker
+
+class FakeDetector:
+    """Finds a fixed face box if it lies fully inside the searched image and size range."""
+
+    def __init__(self, box):
+        self.box = box
+        self.calls = []
+
+    def __call__(self, gray, min_size, max_size):
+        self.calls.append((gray.shape, min_size, max_size))
+        x, y, w, h = self.box
+        base = getattr(gray, "base", None)
+        # Regions are numpy views, so recover their offset into the full frame
+        if base is not None and base.shape != gray.shape:
+            offset = (gray.__array_interface__["data"][0] - base.__array_interface__["data"][0]) // gray.itemsize
+            oy, ox = divmod(offset, base.shape[1])
+        else:
+            oy = ox = 0
+        x, y = x - ox, y - oy
+        if x < 0 or y < 0 or x + w > gray.shape[1] or y + h > gray.shape[0]:
+            return []
+        if min_size and w < min_size[0]:
+            return []
+        return [(x, y, w, h)]
+
+def test_tracks_around_last_box_then_rescans():
+    gray = np.zeros((480, 640), dtype=np.uint8)
+    detector = FakeDetector((300, 200, 100, 100))
+    tracker = FaceTracker(expand=0.5, size_tolerance=0.3, full_scan_every=3)
+
+    assert tracker.detect(gray, detector) == [(300, 200, 100, 100)]
+    assert detector.calls[-1] == ((480, 640), None, None)
+
+    assert tracker.detect(gray, detector) == [(300, 200, 100, 100)]
+    assert detector.calls[-1] == ((200, 200), (70, 70), (130, 130))
+
+    tracker.detect(gray, detector)
+    tracker.detect(gray, detector)
+    assert detector.calls[-1][0] == (200, 200)
+    tracker.detect(gray, detector)
+    assert detector.calls[-1] == ((480, 640), None, None)
+
+def test_falls_back_to_full_scan_when_face_moves():
+    gray = np.zeros((480, 640), dtype=np.uint8)
+    detector = FakeDetector((10, 10, 100, 100))
+    tracker = FaceTracker(expand=0.5, full_scan_every=10)
+    tracker.detect(gray, detector)
+
+    detector.box = (500, 350, 100, 100)
+    assert tracker.detect(gray, detector) == [(500, 350, 100, 100)]
+    assert detector.calls[-1] == ((480, 640), None, None)
+    assert tracker.last_box == (500, 350, 100, 100)
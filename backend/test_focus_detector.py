@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+import config
+import focus_detector
+from synthetic_faces import face_jpeg
+
+pytestmark = pytest.mark.skipif(not os.path.exists(config.EMOTION_MODEL_PATH), reason="needs the emotion model file")
+
+CENTERS = [(170, 240), (470, 240)]
+
+def test_analyze_faces_predicts_all_faces_in_one_batch_at_full_resolution(monkeypatch):
+    focus_detector.load_models()
+    calls = []
+    predict = focus_detector.emotion_model.predict
+
+    def spy(batch):
+        calls.append(len(batch))
+        return predict(batch)
+
+    monkeypatch.setattr(focus_detector.emotion_model, "predict", spy)
+    faces = focus_detector.analyze_faces(face_jpeg([(x, y, 1.0) for x, y in CENTERS]))
+
+    assert calls == [2]
+    # Boxes were found on the reduced frame but come back in full-frame pixels around the drawn faces
+    for face, (cx, cy) in zip(sorted(faces, key=lambda f: f["box"][0]), CENTERS):
+        x, y, w, h = face["box"]
+        assert x < cx < x + w and y < cy < y + h
+        assert 120 <= w <= 240 and 120 <= h <= 240
+        assert face["focused"] and face["emotions"] and face["study_state"]
+
+def test_analyze_faces_without_a_face(no_face_frame):
+    assert focus_detector.analyze_faces(no_face_frame) == []
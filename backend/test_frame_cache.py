@@ -0,0 +1,28 @@
+import time
+
+from frame_cache import FrameCache, hamming_distance
+
+def test_near_duplicate_hash_hits():
+    cache = FrameCache(max_entries=4, ttl_seconds=60, max_distance=2)
+    cache.store(0b1011, {"attention_score": 50.0})
+
+    assert cache.lookup(0b1001) == {"attention_score": 50.0}
+    assert cache.lookup(0b0100) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_lru_and_ttl_eviction():
+    cache = FrameCache(max_entries=2, ttl_seconds=0.05, max_distance=0)
+    cache.store(1, {"n": 1})
+    cache.store(2, {"n": 2})
+    cache.lookup(1)
+    cache.store(4, {"n": 4})
+    assert cache.lookup(2) is None
+    assert cache.lookup(1) == {"n": 1}
+
+    time.sleep(0.06)
+    assert cache.lookup(1) is None
+    assert len(cache) == 0
+
+def test_hamming_distance():
+    assert hamming_distance(0b1111, 0b0000) == 4
+    assert hamming_distance(2**63, 2**63) == 0
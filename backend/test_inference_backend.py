@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pytest
+
+from inference_backend import OnnxBackend, TensorFlowBackend
+
+H5_PATH = "models/emotion_model.h5"
+ONNX_PATH = "models/emotion_model.onnx"
+
+@pytest.mark.skipif(not (os.path.exists(H5_PATH) and os.path.exists(ONNX_PATH)),
+                    reason="needs both the .h5 model and its ONNX export (convert_to_onnx.py)")
+def test_onnx_matches_tensorflow():
+    pytest.importorskip("tensorflow")
+    pytest.importorskip("onnxruntime")
+    rng = np.random.default_rng(0)
+    batch = rng.random((16, 48, 48, 1), dtype=np.float32)
+
+    tf_probs = TensorFlowBackend(H5_PATH).predict(batch)
+    onnx_probs = OnnxBackend(ONNX_PATH).predict(batch)
+
+    assert onnx_probs.shape == tf_probs.shape == (16, 7)
+    np.testing.assert_allclose(onnx_probs, tf_probs, atol=1e-4)
+    assert np.array_equal(onnx_probs.argmax(axis=1), tf_probs.argmax(axis=1))
+
+def test_tflite_int8_backend_tracks_float_model(tmp_path):
+    pytest.importorskip("tensorflow")
+    from export_quantized import export_tflite_int8
+    from inference_backend import TFLiteBackend
+    from train_emotion_model import build_model
+
+    rng = np.random.default_rng(0)
+    model = build_model()
+    calibration = rng.random((64, 48, 48, 1), dtype=np.float32)
+    path = str(tmp_path / "model_int8.tflite")
+    export_tflite_int8(model, calibration, path)
+
+    backend = TFLiteBackend(path)
+    for size in (1, 8, 1):
+        batch = rng.random((size, 48, 48, 1), dtype=np.float32)
+        probs = backend.predict(batch)
+        assert probs.shape == (size, 7)
+        np.testing.assert_allclose(probs, model.predict_on_batch(batch), atol=0.05)
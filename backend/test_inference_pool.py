@@ -0,0 +1,48 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from inference_pool import InferencePool
+
+def slow_init():
+    # Spawned workers inherit the environment, so they find the marker directory there
+    time.sleep(0.2)
+    open(os.path.join(os.environ["TEST_POOL_MARKERS"], str(os.getpid())), "w").close()
+
+def square(x):
+    return x * x
+
+def test_thread_pool_runs_after_initializing_once():
+    calls = []
+    pool = InferencePool("thread", workers=2, initializer=lambda: calls.append(1))
+    assert not pool.ready
+    try:
+        assert asyncio.run(pool.run(square, 3)) == 9
+        assert pool.submit(square, 4).result() == 16
+        assert pool.ready and calls == [1]
+        assert pool.in_flight == 0
+    finally:
+        pool.shutdown()
+
+def test_process_pool_is_ready_only_once_every_worker_initialized(tmp_path, monkeypatch):
+    monkeypatch.setenv("TEST_POOL_MARKERS", str(tmp_path))
+    pool = InferencePool("process", workers=3, initializer=slow_init)
+    try:
+        pool.start()
+        assert pool.ready
+        assert len(os.listdir(tmp_path)) == 3
+
+        # Calls for one session always land in the same worker
+        pids = {pool.submit(os.getpid, key=7).result() for _ in range(6)}
+        assert len(pids) == 1
+        assert asyncio.run(pool.run(square, 5, key=7)) == 25
+        assert {pool.submit(os.getpid).result() for _ in range(6)} == {int(pid) for pid in os.listdir(tmp_path)}
+    finally:
+        pool.shutdown()
+    assert not pool.ready
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        InferencePool("gpu")
@@ -0,0 +1,87 @@
+import logging
+
+import pytest
+
+import config
+import instrumentation
+
+@pytest.fixture
+def metrics():
+    created = []
+
+    def make(cls, name, *args):
+        metric = cls(name, "test metric", *args)
+        created.append(name)
+        return metric
+
+    yield make
+    for name in created:
+        instrumentation.unregister(name)
+
+def test_histogram_renders_cumulative_buckets(metrics):
+    hist = metrics(instrumentation.Histogram, "test_seconds", (0.01, 0.1))
+    for value in (0.005, 0.05, 0.05, 3.0):
+        hist.observe(value, stage="decode")
+
+    lines = hist.render().splitlines()
+    assert lines[:2] == ["# HELP test_seconds test metric", "# TYPE test_seconds histogram"]
+    assert lines[2:] == [
+        'test_seconds_bucket{stage="decode",le="0.01"} 1',
+        'test_seconds_bucket{stage="decode",le="0.1"} 3',
+        'test_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'test_seconds_sum{stage="decode"} 3.105',
+        'test_seconds_count{stage="decode"} 4',
+    ]
+
+def test_counters_and_gauges_in_render(metrics):
+    counter = metrics(instrumentation.Counter, "test_flushes_total")
+    counter.inc(outcome="ok")
+    counter.inc(2, outcome="ok")
+    instrumentation.gauge("test_depth", "queue depth", lambda: 7)
+    try:
+        text = instrumentation.render()
+    finally:
+        instrumentation.unregister("test_depth")
+
+    assert 'test_flushes_total{outcome="ok"} 3' in text
+    assert "# TYPE test_depth gauge\ntest_depth 7" in text
+    assert "# TYPE studysync_stage_seconds histogram" in text
+
+def test_slow_frame_log_has_stage_breakdown(monkeypatch, caplog):
+    monkeypatch.setattr(config, "SLOW_FRAME_MS", 0.001)
+    monkeypatch.setattr(config, "SLOW_FRAME_SAMPLE_RATE", 1.0)
+    frames = instrumentation.FRAMES.value()
+    decodes = instrumentation.STAGE_SECONDS.count(stage="decode")
+
+    with caplog.at_level(logging.WARNING, logger="instrumentation"):
+        with instrumentation.frame(session_id=5):
+            with instrumentation.stage("decode"):
+                sum(range(10000))
+
+    assert instrumentation.FRAMES.value() == frames + 1
+    assert instrumentation.STAGE_SECONDS.count(stage="decode") == decodes + 1
+    assert "session 5" in caplog.text and "decode=" in caplog.text
+
+def test_disabled_records_nothing(monkeypatch):
+    monkeypatch.setattr(instrumentation, "enabled", False)
+    frames = instrumentation.FRAMES.value()
+    with instrumentation.frame():
+        with instrumentation.stage("decode"):
+            pass
+    instrumentation.NO_FACE.inc()
+    assert instrumentation.FRAMES.value() == frames
+
+def test_muted_records_nothing_on_this_thread():
+    frames = instrumentation.FRAMES.value()
+    decodes = instrumentation.STAGE_SECONDS.count(stage="decode")
+    with instrumentation.muted():
+        with instrumentation.frame():
+            with instrumentation.stage("decode"):
+                pass
+        instrumentation.NO_FACE.inc()
+    assert instrumentation.FRAMES.value() == frames
+    assert instrumentation.STAGE_SECONDS.count(stage="decode") == decodes
+
+    with instrumentation.frame():
+        pass
+    assert instrumentation.FRAMES.value() == frames + 1
@@ -0,0 +1,239 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+
+needs_model = pytest.mark.skipif(not os.path.exists(config.EMOTION_MODEL_PATH), reason="needs the emotion model file")
+
+def wait_until_ready(client, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while client.get("/readyz").status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return client.get("/readyz").status_code == 200
+
+def test_importing_main_loads_no_model():
+    code = ("import sys, main, focus_detector; "
+            "assert focus_detector.emotion_model is None and focus_detector.face_detector is None; "
+            "assert 'tensorflow' not in sys.modules and 'onnxruntime' not in sys.modules")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+def test_readyz_waits_for_warm_up_while_healthz_answers(monkeypatch):
+    import main
+    warm_up_done = threading.Event()
+    monkeypatch.setattr(main.inference_pool, "initializer", lambda: warm_up_done.wait(10))
+    # Earlier tests may have started the shared pool already
+    main.inference_pool.shutdown()
+
+    with TestClient(main.app) as client:
+        assert client.get("/healthz").status_code == 200
+        response = client.get("/readyz")
+        assert response.status_code == 503 and response.json()["status"] == "starting"
+
+        warm_up_done.set()
+        assert wait_until_ready(client)
+        assert client.get("/readyz").json()["status"] == "ready"
+
+@pytest.fixture(scope="module")
+def client():
+    import main
+    with TestClient(main.app) as client:
+        assert wait_until_ready(client)
+        yield client
+
+@pytest.fixture
+def session_id(client):
+    return client.post("/start_session/").json()["session_id"]
+
+def count_rows(model, session_id):
+    import main
+    db = main.SessionLocal()
+    try:
+        return db.query(model).filter(model.session_id == session_id).count()
+    finally:
+        db.close()
+
+def jpeg(data, name="frame.jpg"):
+    return (name, data, "image/jpeg")
+
+@needs_model
+def test_batch_rejects_bad_timestamps_and_too_many_frames(client, face_frame, monkeypatch):
+    files = [("files", jpeg(face_frame)), ("files", jpeg(face_frame))]
+    for timestamps in ("not json", '["2024-01-01T10:00:00", "yesterday"]', '["2024-01-01T10:00:00"]', "[1, 2]"):
+        assert client.post("/analyze_focus_batch/", files=files, data={"timestamps": timestamps}).status_code == 400
+
+    monkeypatch.setattr(config, "BATCH_ENDPOINT_MAX_FRAMES", 1)
+    assert client.post("/analyze_focus_batch/", files=files).status_code == 413
+
+@needs_model
+def test_batch_normalizes_timestamps_to_naive_utc(client, face_frame):
+    files = [("files", jpeg(face_frame)), ("files", jpeg(face_frame)), ("files", jpeg(face_frame))]
+    timestamps = json.dumps(["2024-01-01T10:00:00+02:00", "2024-01-01T08:00:01Z", "2024-01-01T08:00:02"])
+    response = client.post("/analyze_focus_batch/", files=files, data={"timestamps": timestamps})
+    assert response.status_code == 200
+    assert [r["timestamp"] for r in response.json()["results"]] == [
+        "2024-01-01T08:00:00", "2024-01-01T08:00:01", "2024-01-01T08:00:02"]
+
+@needs_model
+def test_batch_results_keep_frame_order_around_no_face_frames(client, face_frame, no_face_frame):
+    frames = [face_frame, no_face_frame, no_face_frame, face_frame, no_face_frame]
+    response = client.post("/analyze_focus_batch/", files=[("files", jpeg(f)) for f in frames])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["focused"] for r in results] == [True, False, False, True, False]
+    assert [bool(r["emotions"]) for r in results] == [True, False, False, True, False]
+    assert response.json()["persisted"] == 0
+
+@needs_model
+def test_batch_persist_writes_rows(client, session_id, face_frame, no_face_frame):
+    import models
+    files = [("files", jpeg(face_frame)), ("files", jpeg(no_face_frame)), ("files", jpeg(face_frame))]
+    assert client.post("/analyze_focus_batch/", files=files, data={"persist": "true"}).status_code == 400
+    assert client.post("/analyze_focus_batch/", files=files,
+                       data={"persist": "true", "session_id": "999999"}).status_code == 404
+
+    response = client.post("/analyze_focus_batch/", files=files, data={"persist": "true", "session_id": str(session_id)})
+    assert response.status_code == 200 and response.json()["persisted"] == 3
+    assert count_rows(models.AttentionMetric, session_id) == 3
+    assert count_rows(models.FocusLog, session_id) == 3
+
+def test_session_stream_rejects_unknown_session(client):
+    from starlette.websockets import WebSocketDisconnect
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/ws/session/999999") as socket:
+            socket.receive_json()
+    assert closed.value.code == 4404
+
+def test_session_stream_accepts_before_closing_unknown_session(client):
+    # TestClient passes any close code through; a real server only does so after the handshake completed
+    import asyncio
+    import main
+    scope = {"type": "websocket", "path": "/ws/session/999999", "raw_path": b"/ws/session/999999",
+             "query_string": b"", "headers": [], "scheme": "ws", "server": ("test", 80), "client": ("test", 1),
+             "subprotocols": [], "root_path": "", "app": main.app}
+    incoming = [{"type": "websocket.connect"}]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {"type": "websocket.disconnect", "code": 1000}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(main.app(scope, receive, send))
+    assert [m["type"] for m in sent] == ["websocket.accept", "websocket.close"]
+    assert sent[1]["code"] == 4404
+
+@needs_model
+def test_session_stream_answers_every_frame(client, session_id, face_frame, no_face_frame):
+    with client.websocket_connect(f"/ws/session/{session_id}") as socket:
+        socket.send_text("hello")
+        assert "error" in socket.receive_json()
+
+        results = []
+        for frame in (face_frame, no_face_frame, face_frame):
+            socket.send_bytes(frame)
+            results.append(socket.receive_json())
+
+    assert [r["focused"] for r in results] == [True, False, True]
+    assert results[0]["study_state"] and results[1]["study_state"] is None
+    assert all({"timestamp", "attention_score", "break_recommended"} <= set(r) for r in results)
+
+def test_frames_of_unknown_sessions_are_rejected(client, no_face_frame):
+    import main
+    sessions = len(main.session_states)
+    for path in ("/analyze_focus/", "/analyze_faces/"):
+        response = client.post(path, files={"file": jpeg(no_face_frame)}, data={"session_id": "999999"})
+        assert response.status_code == 404
+    assert len(main.session_states) == sessions and main.write_buffer.pending(999999) == 0
+
+def test_end_session_uses_the_running_aggregates(client, session_id):
+    import main
+    import models
+    # Aggregates without any logged frame: only they can produce this average
+    db = main.SessionLocal()
+    try:
+        session = db.get(models.StudySession, session_id)
+        session.frame_count, session.attention_sum = 4, 120.0
+        db.commit()
+    finally:
+        db.close()
+
+    assert client.post(f"/end_session/{session_id}").status_code == 200
+    details = client.get(f"/session_metrics/{session_id}", params={"summary": True}).json()
+    assert details["average_attention_score"] == 30.0
+    assert details["recommended_break_duration"] == 15
+    assert details["summary"]["frame_count"] == 4
+
+@needs_model
+def test_frame_metrics_count_only_analyzed_frames(client, session_id, face_frame, no_face_frame):
+    import focus_detector
+    import instrumentation
+    frames, no_face = instrumentation.FRAMES.value(), instrumentation.NO_FACE.value()
+
+    focus_detector._warmed_up.clear()
+    focus_detector.warm_up()
+    assert client.post("/predict_emotion/raw", content=face_frame,
+                       headers={"Content-Type": "image/jpeg"}).status_code == 200
+    assert (instrumentation.FRAMES.value(), instrumentation.NO_FACE.value()) == (frames, no_face)
+
+    # The second no-face frame is answered from the session's frame cache and still counts as one
+    from frame_cache import cache_counters
+    hits = cache_counters.hits
+    for _ in range(2):
+        client.post("/analyze_focus/", files={"file": jpeg(no_face_frame)}, data={"session_id": str(session_id)})
+    assert cache_counters.hits == hits + 1
+    assert (instrumentation.FRAMES.value(), instrumentation.NO_FACE.value()) == (frames + 2, no_face + 2)
+
+@needs_model
+def test_a_worker_new_to_a_session_starts_from_its_stored_break_window(client, session_id, no_face_frame):
+    # Frames another server worker analyzed and flushed: 12 low scores in the last minutes
+    from datetime import datetime, timedelta
+    import main
+    import models
+    now = datetime.utcnow()
+    db = main.SessionLocal()
+    try:
+        db.add_all([models.AttentionMetric(session_id=session_id, timestamp=now - timedelta(seconds=10 * i),
+                                           attention_score=10.0, break_recommended=False) for i in range(1, 13)])
+        db.get(models.StudySession, session_id).frame_count = 12
+        db.commit()
+    finally:
+        db.close()
+
+    assert session_id not in main.session_states
+    response = client.post("/analyze_focus/", files={"file": jpeg(no_face_frame)}, data={"session_id": str(session_id)})
+    assert response.json()["break_recommended"] is True
+    assert main.session_states.get(session_id).recommender.samples_seen == 13
+
+@needs_model
+def test_analyze_faces_keeps_face_ids_across_frames(client, session_id):
+    import main
+    from synthetic_faces import face_jpeg
+    ids_by_side = []
+    # The same two people, shifted a little from frame to frame
+    for dx, dy in ((0, 0), (6, 3), (-4, 5)):
+        frame = face_jpeg([(170 + dx, 240 + dy, 1.0), (470 - dx, 240 - dy, 1.0)])
+        response = client.post("/analyze_faces/", files={"file": jpeg(frame)}, data={"session_id": str(session_id)})
+        body = response.json()
+        assert response.status_code == 200 and body["face_count"] == 2
+        faces = sorted(body["faces"], key=lambda face: face["box"][0])
+        assert faces[0]["box"][0] < 170 + dx < faces[0]["box"][0] + faces[0]["box"][2]
+        assert faces[1]["box"][0] < 470 - dx < faces[1]["box"][0] + faces[1]["box"][2]
+        assert all(isinstance(face["break_recommended"], bool) for face in faces)
+        ids_by_side.append([face["face_id"] for face in faces])
+
+    assert ids_by_side == [ids_by_side[0]] * 3 and len(set(ids_by_side[0])) == 2
+    # Each person has a break window of their own
+    identities = main.session_states.get(session_id).identities._identities
+    assert sorted(identity.recommender.samples_seen for identity in identities.values()) == [3, 3]
+
+    untracked = client.post("/analyze_faces/", files={"file": jpeg(face_jpeg())},
+                            data={"session_id": str(session_id), "track": "false"}).json()
+    assert [face["face_id"] for face in untracked["faces"]] == [None]
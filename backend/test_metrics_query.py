@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import metrics_query
+import models
+
+START = datetime(2024, 1, 1, 9, 0)
+
+@pytest.fixture
+def db(db):
+    session = models.StudySession(user_id="u", start_time=START)
+    db.add(session)
+    db.commit()
+    # 120 one-second frames, two of them sharing each timestamp
+    db.bulk_insert_mappings(models.AttentionMetric, [
+        {"session_id": session.id, "timestamp": START + timedelta(seconds=i // 2),
+         "attention_score": float(i), "break_recommended": i == 7}
+        for i in range(120)
+    ])
+    db.commit()
+    return db
+
+def test_keyset_pages_cover_every_metric_once(db):
+    scores, cursor, pages = [], None, 0
+    while True:
+        metrics, cursor = metrics_query.metric_page(db, 1, cursor, limit=25)
+        scores.extend(m["attention_score"] for m in metrics)
+        pages += 1
+        if cursor is None:
+            break
+    assert scores == [float(i) for i in range(120)]
+    assert pages == 5
+
+def test_buckets_aggregate_in_sql(db):
+    buckets = metrics_query.metric_buckets(db, 1, bucket_seconds=30)
+    assert [b["count"] for b in buckets] == [60, 60]
+    assert buckets[0]["bucket_start"] == START
+    assert (buckets[0]["attention_min"], buckets[0]["attention_max"]) == (0.0, 59.0)
+    assert buckets[0]["attention_avg"] == pytest.approx(29.5)
+    assert [b["break_recommended"] for b in buckets] == [True, False]
+
+def test_iter_metrics_streams_in_order(db):
+    scores = [m["attention_score"] for m in metrics_query.iter_metrics(db, 1, chunk_size=7)]
+    assert scores == [float(i) for i in range(120)]
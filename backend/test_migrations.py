@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+import migrations
+import models
+from database import create_db_engine
+
+MIGRATED_COLUMNS = {
+    "study_sessions": ["frame_count", "attention_sum", "attention_sum_sq", "attention_min", "attention_max",
+                       "emotion_counts", "focused_seconds", "last_frame_at"],
+    "focus_logs": ["emotions_blob"],
+    "attention_records": ["emotions_blob"],
+}
+MIGRATED_INDEXES = ["ix_focus_logs_session_timestamp", "ix_attention_metrics_session_timestamp",
+                    "ix_attention_records_session_timestamp"]
+
+def old_schema_engine(path):
+    """An engine on a database laid out as before the migrations, holding one session."""
+    engine = create_db_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in MIGRATED_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+        for table, columns in MIGRATED_COLUMNS.items():
+            for column in columns:
+                conn.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {column}")
+        conn.execute(text("INSERT INTO study_sessions (user_id, start_time) VALUES ('u', :start)"),
+                     {"start": datetime(2024, 1, 1, 9, 0)})
+    return engine
+
+def test_migrations_upgrade_an_old_schema_once(tmp_path, monkeypatch):
+    engine = old_schema_engine(tmp_path / "old.db")
+    calls = []
+
+    def counted(migration):
+        def run(conn):
+            calls.append(migration.__name__)
+            migration(conn)
+        run.__name__ = migration.__name__
+        return run
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [counted(m) for m in migrations.MIGRATIONS])
+    try:
+        assert migrations.run_migrations(engine) == len(migrations.MIGRATIONS)
+        assert migrations.run_migrations(engine) == len(migrations.MIGRATIONS)
+        assert calls == [m.__name__ for m in migrations.MIGRATIONS]
+
+        inspector = inspect(engine)
+        for table, columns in MIGRATED_COLUMNS.items():
+            assert set(columns) <= {c["name"] for c in inspector.get_columns(table)}
+        indexes = {index["name"] for table in ("focus_logs", "attention_metrics", "attention_records")
+                   for index in inspector.get_indexes(table)}
+        assert set(MIGRATED_INDEXES) <= indexes
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT version FROM schema_version").fetchall() == [(len(calls),)]
+            # The existing session kept its row and got the columns' defaults
+            assert conn.exec_driver_sql("SELECT user_id, frame_count FROM study_sessions").fetchall() == [("u", 0)]
+    finally:
+        engine.dispose()
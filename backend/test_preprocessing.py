@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+import pytest
+
+import preprocessing
+
+@pytest.fixture(scope="module")
+def jpeg():
+    # Left half dark, right half bright, so a decode at any scale keeps the layout
+    img = np.zeros((480, 640, 3), np.uint8)
+    img[:, 320:] = 220
+    return cv2.imencode(".jpg", img)[1].tobytes()
+
+@pytest.mark.parametrize("reduction", [1, 2, 4, 8])
+def test_decode_grayscale_at_reduced_scale(jpeg, reduction):
+    gray = preprocessing.decode_grayscale(jpeg, reduction)
+    assert gray.shape == (480 // reduction, 640 // reduction) and gray.dtype == np.uint8
+    assert gray[:, :gray.shape[1] // 4].mean() < 20 and gray[:, -gray.shape[1] // 4:].mean() > 200
+
+def test_decode_grayscale_rejects_bad_input(jpeg):
+    assert preprocessing.decode_grayscale(b"") is None
+    assert preprocessing.decode_grayscale(b"not a jpeg") is None
+    assert preprocessing.decode_grayscale(jpeg[:20]) is None
+    with pytest.raises(ValueError):
+        preprocessing.decode_grayscale(jpeg, 3)
+
+def test_to_model_input_scales_into_the_given_buffer():
+    face = np.full((96, 80), 255, np.uint8)
+    out = preprocessing.to_model_input(face)
+    assert out.shape == (48, 48, 1) and out.dtype == np.float32
+    np.testing.assert_allclose(out, 1.0)
+
+    # Colour crops are converted; rows of a batch are filled in place
+    batch = preprocessing.new_batch(2)
+    assert batch.shape == (2, 48, 48, 1) and batch.dtype == np.float32
+    first = preprocessing.to_model_input(np.zeros((60, 60, 3), np.uint8), out=batch[0])
+    preprocessing.to_model_input(face, out=batch[1])
+    assert np.shares_memory(first, batch) and batch[0].max() == 0.0 and batch[1].min() == 1.0
+
+def test_face_buffer_is_reused_per_thread():
+    buffer = preprocessing.face_buffer()
+    assert preprocessing.face_buffer() is buffer
+    assert preprocessing.to_model_input(np.zeros((48, 48), np.uint8), out=buffer) is buffer
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import models
+import rollups
+
+START = datetime(2024, 1, 1, 23, 58)
+
+def add_ended_session(db, user_id: str, start: datetime, frames: int) -> models.StudySession:
+    session = models.StudySession(user_id=user_id, start_time=start, end_time=start + timedelta(seconds=frames))
+    db.add(session)
+    db.commit()
+    db.bulk_insert_mappings(models.FocusLog, [
+        {"session_id": session.id, "timestamp": start + timedelta(seconds=i), "focused": True,
+         "emotions_json": {"happy": 0.6, "sad": 0.4} if i % 2 else {"happy": 0.3, "sad": 0.7}, "attention_score": 50.0}
+        for i in range(frames)
+    ])
+    db.commit()
+    return session
+
+def test_session_split_across_hours_and_days(db):
+    # 240 frames starting 23:58 run into the next day
+    rollups.add_session(db, add_ended_session(db, "alice", START, 240))
+    db.commit()
+
+    hourly = db.query(models.HourlyRollup).order_by(models.HourlyRollup.period_start).all()
+    assert [(h.period_start.hour, h.frame_count, h.session_count) for h in hourly] == [(23, 120, 1), (0, 120, 0)]
+    daily = db.query(models.DailyRollup).order_by(models.DailyRollup.period_start).all()
+    assert [d.frame_count for d in daily] == [120, 120]
+    assert sum(d.focused_seconds for d in daily) == 239
+
+    week = rollups.period_totals(db, "alice", "week", START - timedelta(days=7), START + timedelta(days=7))
+    (totals,) = week.values()
+    view = rollups.view(totals)
+    assert (view["session_count"], view["frame_count"], view["attention_average"]) == (1, 240, 50.0)
+    assert view["emotion_distribution"] == {"happy": 0.5, "sad": 0.5}
+
+def test_rebuild_matches_incremental(db):
+    for i in range(3):
+        rollups.add_session(db, add_ended_session(db, "alice", START + timedelta(hours=i), 30))
+    add_ended_session(db, "bob", START, 10)
+    db.commit()
+    incremental = rollups.period_totals(db, "alice", "hour", START - timedelta(days=1), START + timedelta(days=1))
+
+    assert rollups.rebuild(db, ["alice"]) == 3
+    assert rollups.period_totals(db, "alice", "hour", START - timedelta(days=1), START + timedelta(days=1)) == incremental
+    assert not rollups.period_totals(db, "bob", "day", START - timedelta(days=1), START + timedelta(days=1))
+
+def test_flushed_frames_roll_up_incrementally_and_match_rebuild(db, session_factory):
+    from write_buffer import MetricWriteBuffer
+    buffer = MetricWriteBuffer(session_factory, max_rows=1000, flush_interval=60)
+    session = models.StudySession(user_id="alice", start_time=START)
+    db.add(session)
+    db.flush()
+    rollups.add_session_start(db, session)
+    db.commit()
+
+    frame = {"focused": True, "emotions": {"happy": 0.6, "sad": 0.4}, "attention_score": 50.0, "break_recommended": False}
+    # Frames across midnight, flushed in three batches
+    for first, last in ((0, 100), (100, 200), (200, 240)):
+        buffer.add_frames(session.id, [(START + timedelta(seconds=i), frame) for i in range(first, last)])
+        buffer.flush()
+
+    window = (START - timedelta(days=1), START + timedelta(days=2))
+    incremental = {g: rollups.period_totals(db, "alice", g, *window) for g in ("hour", "day")}
+    assert [t["frame_count"] for t in incremental["hour"].values()] == [120, 120]
+    assert sum(t["session_count"] for t in incremental["day"].values()) == 1
+    assert sum(t["focused_seconds"] for t in incremental["day"].values()) == 239
+
+    assert rollups.rebuild(db, ["alice"]) == 1
+    assert {g: rollups.period_totals(db, "alice", g, *window) for g in ("hour", "day")} == incremental
@@ -0,0 +1,60 @@
+import os
+import signal
+import socket
+import sys
+import time
+
+import pytest
+
+import serve
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork") or sys.platform != "linux", reason="needs fork and /proc")
+
+def ready_worker(sock, ready_fd, parent_pid, log_level):
+    os.write(ready_fd, b"1")
+    os.close(ready_fd)
+    time.sleep(60)
+
+def crashing_worker(sock, ready_fd, parent_pid, log_level):
+    os._exit(3)
+
+def poll_until(supervisor, condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        supervisor.poll(0.05)
+    return condition()
+
+def test_crashed_worker_is_replaced(monkeypatch):
+    monkeypatch.setattr(serve, "_run_worker", ready_worker)
+    supervisor = serve.Supervisor(socket.socket(), count=2, max_memory_mib=0)
+    try:
+        assert poll_until(supervisor, lambda: len(supervisor.workers) == 2 and
+                          all(w.ready for w in supervisor.workers.values()))
+        victim = next(iter(supervisor.workers))
+        os.kill(victim, signal.SIGKILL)
+
+        assert poll_until(supervisor, lambda: victim not in supervisor.workers and len(supervisor.workers) == 2 and
+                          all(w.ready for w in supervisor.workers.values()))
+    finally:
+        supervisor.shutdown()
+    assert not supervisor.workers
+
+def test_workers_over_the_memory_ceiling_are_replaced(monkeypatch):
+    monkeypatch.setattr(serve, "_run_worker", ready_worker)
+    supervisor = serve.Supervisor(socket.socket(), count=1, max_memory_mib=1, check_interval=0)
+    try:
+        assert poll_until(supervisor, lambda: any(w.ready for w in supervisor.workers.values()))
+        first = next(iter(supervisor.workers))
+        assert poll_until(supervisor, lambda: first not in supervisor.workers)
+        assert len(supervisor.workers) >= 1
+    finally:
+        supervisor.shutdown()
+
+def test_workers_failing_before_ready_back_off(monkeypatch):
+    monkeypatch.setattr(serve, "_run_worker", crashing_worker)
+    supervisor = serve.Supervisor(socket.socket(), count=1, max_memory_mib=0)
+    try:
+        assert poll_until(supervisor, lambda: supervisor._failures >= 2)
+        assert supervisor._spawn_after > time.monotonic()
+    finally:
+        supervisor.shutdown()
@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import models
+import session_export
+
+START = datetime(2024, 1, 1, 9, 0)
+
+def test_rows_deleted_after_the_count_are_not_exported_as_garbage(db):
+    session = models.StudySession(user_id="u", start_time=START)
+    db.add(session)
+    db.commit()
+    db.bulk_insert_mappings(models.FocusLog, [
+        {"session_id": session.id, "timestamp": START + timedelta(seconds=i), "focused": True,
+         "emotions_json": {"happy": 1.0}, "attention_score": float(i)}
+        for i in range(5)
+    ])
+    db.commit()
+
+    query = db.query
+    calls = []
+
+    def query_then_delete(*entities):
+        # Between the count and the row query, someone deletes the session's last two frames
+        calls.append(entities)
+        if len(calls) == 2:
+            ids = [row.id for row in query(models.FocusLog).order_by(models.FocusLog.id.desc()).limit(2)]
+            query(models.FocusLog).filter(models.FocusLog.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+        return query(*entities)
+
+    db.query = query_then_delete
+    arrays = session_export.session_arrays(db, session.id)
+
+    assert arrays["attention_score"].tolist() == [0.0, 1.0, 2.0]
+    assert arrays["timestamps"].tolist() == [START + timedelta(seconds=i) for i in range(3)]
+    assert len(arrays["focused"]) == len(arrays["emotions"]) == 3
+    assert not np.isnan(arrays["emotions"][:, 3]).any()
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import training_data
+
+def synthetic_faces(count: int):
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        yield rng.integers(0, 256, (48, 48), dtype=np.uint8), i % 7
+
+def test_shards_round_trip(tmp_path):
+    manifest = training_data.write_shards(synthetic_faces(250), str(tmp_path), shard_size=100)
+    assert [shard["count"] for shard in manifest["shards"]] == [100, 100, 50]
+
+    shards = training_data.open_shards(str(tmp_path))
+    assert isinstance(shards[0][0], np.memmap)
+    images = np.concatenate([images for images, _ in shards])
+    expected = np.stack([image for image, _ in synthetic_faces(250)])
+    np.testing.assert_array_equal(images, expected)
+
+    train = training_data.split_chunks(str(tmp_path), "train", val_fraction=0.2, chunk_size=64)
+    val = training_data.split_chunks(str(tmp_path), "val", val_fraction=0.2, chunk_size=64)
+    assert sum(stop - start for _, start, stop in train) == 200
+    assert val == [(2, 0, 50)]
+
+def test_dataset_batches(tmp_path):
+    pytest.importorskip("tensorflow")
+    training_data.write_shards(synthetic_faces(250), str(tmp_path), shard_size=100)
+
+    val = training_data.make_dataset(str(tmp_path), "val", batch_size=16, cache="")
+    images, labels = next(iter(val))
+    assert images.shape == (16, 48, 48, 1) and images.dtype.name == "float32"
+    assert 0.0 <= float(images.numpy().min()) and float(images.numpy().max()) <= 1.0
+    assert labels.numpy().tolist() == [i % 7 for i in range(200, 216)]
+
+    train = training_data.make_dataset(str(tmp_path), "train", batch_size=32, chunk_size=64, seed=0)
+    assert sum(int(batch[1].shape[0]) for batch in train) == 200
+
+def test_image_folder_validation_split_holds_every_label(tmp_path):
+    import cv2
+    from emotion_codec import EMOTION_LABELS
+    source = tmp_path / "images"
+    for name in EMOTION_LABELS:
+        (source / name).mkdir(parents=True)
+        for i in range(20):
+            cv2.imwrite(str(source / name / f"{i:03d}.png"), np.full((64, 64), i, np.uint8))
+
+    shard_dir = str(tmp_path / "shards")
+    manifest = training_data.write_shards(training_data.iter_image_folder(str(source), seed=1), shard_dir, shard_size=50)
+    assert manifest["total"] == 20 * len(EMOTION_LABELS)
+
+    shards = training_data.open_shards(shard_dir)
+    val = training_data.split_chunks(shard_dir, "val", val_fraction=0.2)
+    labels = np.concatenate([shards[index][1][start:stop] for index, start, stop in val])
+    assert set(labels.tolist()) == set(range(len(EMOTION_LABELS)))
+
+def test_split_faces_samples_rows_of_the_split(tmp_path):
+    pytest.importorskip("tensorflow")
+    from export_quantized import split_faces
+    training_data.write_shards(synthetic_faces(250), str(tmp_path), shard_size=100)
+    expected = np.stack([image for image, _ in synthetic_faces(250)])
+
+    images, labels = split_faces(str(tmp_path), "val", 30, seed=3)
+    assert images.shape == (30, 48, 48, 1) and images.dtype == np.float32 and labels.dtype == np.int64
+    # Every sampled face is a distinct validation row (200..249), with its own label
+    matches = [int(np.flatnonzero((expected == np.rint(image[..., 0] * 255)).all(axis=(1, 2)))[0]) for image in images]
+    assert len(set(matches)) == 30 and all(200 <= i < 250 for i in matches)
+    assert labels.tolist() == [i % 7 for i in matches]
+
+    images, _ = split_faces(str(tmp_path), "train", 1000)
+    assert len(images) == 200
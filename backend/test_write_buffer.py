@@ -0,0 +1,149 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.exc import OperationalError
+
+import aggregates
+import models
+from write_buffer import MetricWriteBuffer
+
+START = datetime(2024, 1, 1, 9, 0)
+
+def new_session(session_factory) -> int:
+    db = session_factory()
+    try:
+        session = models.StudySession(user_id="u", start_time=START)
+        db.add(session)
+        db.commit()
+        return session.id
+    finally:
+        db.close()
+
+def result(score: float = 50.0):
+    return {"focused": True, "emotions": {"neutral": 0.9, "sad": 0.1}, "attention_score": score,
+            "break_recommended": False}
+
+def frames_of(session_factory, session_id) -> int:
+    db = session_factory()
+    try:
+        return db.query(models.FocusLog).filter(models.FocusLog.session_id == session_id).count()
+    finally:
+        db.close()
+
+def test_bad_rows_of_one_session_do_not_block_others(session_factory, tmp_path):
+    dead_letter = tmp_path / "dead.jsonl"
+    buffer = MetricWriteBuffer(session_factory, max_rows=1000, flush_interval=60, max_attempts=3,
+                               dead_letter_path=str(dead_letter))
+    good, bad = new_session(session_factory), new_session(session_factory)
+    # A naive and an aware timestamp can't be ordered, so folding them into the aggregates fails
+    buffer.add_frame(bad, START, result())
+    buffer.add_frame(bad, datetime(2024, 1, 1, 9, 0, 3, tzinfo=timezone.utc), result())
+    buffer.add_frame(good, START, result())
+
+    assert buffer.flush() == 1
+    assert frames_of(session_factory, good) == 1
+    assert buffer.pending() == buffer.pending(bad) == 2
+
+    # Later flushes keep writing new frames while the bad ones are retried
+    buffer.add_frame(good, START + timedelta(seconds=3), result())
+    assert buffer.flush() == 1
+    assert buffer.pending(bad) == 2
+
+    # After the last attempt the frames are written one by one and the failing one is dropped
+    assert buffer.flush() == 1
+    assert buffer.pending() == 0
+    assert frames_of(session_factory, bad) == 1
+    (record,) = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+    assert record["session_id"] == bad
+    assert record["focus_logs"]["timestamp"].endswith("+00:00")
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_flushes_once_max_rows_are_pending(session_factory):
+    buffer = MetricWriteBuffer(session_factory, max_rows=3, flush_interval=60)
+    session_id = new_session(session_factory)
+    buffer.start()
+    try:
+        buffer.add_frames(session_id, [(START + timedelta(seconds=i), result()) for i in range(2)])
+        time.sleep(0.2)
+        assert frames_of(session_factory, session_id) == 0
+        buffer.add_frame(session_id, START + timedelta(seconds=2), result())
+        assert wait_for(lambda: frames_of(session_factory, session_id) == 3)
+    finally:
+        buffer.stop()
+
+def test_flushes_every_interval(session_factory):
+    buffer = MetricWriteBuffer(session_factory, max_rows=1000, flush_interval=0.1)
+    session_id = new_session(session_factory)
+    buffer.start()
+    try:
+        buffer.add_frame(session_id, START, result())
+        assert wait_for(lambda: frames_of(session_factory, session_id) == 1)
+        assert buffer.pending() == 0
+    finally:
+        buffer.stop()
+
+def test_stop_writes_what_is_pending(session_factory):
+    buffer = MetricWriteBuffer(session_factory, max_rows=1000, flush_interval=60)
+    session_id = new_session(session_factory)
+    buffer.start()
+    buffer.add_frames(session_id, [(START + timedelta(seconds=i), result()) for i in range(4)])
+    buffer.stop()
+    assert frames_of(session_factory, session_id) == 4
+    assert buffer.pending() == 0
+
+def test_failed_frames_are_requeued_in_order(session_factory, monkeypatch):
+    buffer = MetricWriteBuffer(session_factory, max_rows=1000, flush_interval=60, max_attempts=2, dead_letter_path="")
+    session_id = new_session(session_factory)
+    buffer.add_frames(session_id, [(START + timedelta(seconds=i), result(float(i))) for i in range(3)])
+    write = buffer._write
+
+    def database_down(batch):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    # An unavailable database never counts against the frames, however often it happens
+    monkeypatch.setattr(buffer, "_write", database_down)
+    for _ in range(5):
+        assert buffer.flush() == 0
+    assert buffer.pending() == 3
+
+    buffer.add_frame(session_id, START + timedelta(seconds=3), result(3.0))
+    monkeypatch.setattr(buffer, "_write", write)
+    assert buffer.flush() == 4
+    db = session_factory()
+    try:
+        scores = [row.attention_score for row in db.query(models.FocusLog).order_by(models.FocusLog.id)]
+        assert scores == [0.0, 1.0, 2.0, 3.0]
+    finally:
+        db.close()
+
+def test_frames_flushed_after_the_session_ended_update_its_summary(session_factory):
+    # Another server worker's buffer may flush the session's last frames after it ended
+    first, second = (MetricWriteBuffer(session_factory, max_rows=1000, flush_interval=60) for _ in range(2))
+    session_id = new_session(session_factory)
+    first.add_frames(session_id, [(START + timedelta(seconds=i), result(80.0)) for i in range(2)])
+    second.add_frames(session_id, [(START + timedelta(seconds=2 + i), result(20.0)) for i in range(6)])
+    first.flush()
+
+    db = session_factory()
+    try:
+        session = db.get(models.StudySession, session_id)
+        session.end_time = START + timedelta(seconds=10)
+        aggregates.finish(session)
+        db.commit()
+        assert (session.average_attention_score, session.recommended_break_duration) == (80.0, 5)
+    finally:
+        db.close()
+
+    second.flush()
+    db = session_factory()
+    try:
+        session = db.get(models.StudySession, session_id)
+        assert (session.average_attention_score, session.recommended_break_duration) == (35.0, 15)
+    finally:
+        db.close()
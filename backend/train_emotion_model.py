@@ -2,24 +2,19 @@ import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 os.environ['CUDA_VISIBLE_DEVICES'] = '0'
 import tensorflow as tf
-import numpy as np
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Conv2D, MaxPooling2D, Flatten, Dense, Dropout
+from tensorflow.keras.layers import (Conv2D, MaxPooling2D, Flatten, Dense, Dropout, SeparableConv2D,
+                                     BatchNormalization, Activation, GlobalAveragePooling2D)
 from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
 import matplotlib.pyplot as plt
-import pickle
+import training_data
 
 # Configure GPU memory growth for TensorFlow
 physical_devices = tf.config.list_physical_devices('GPU')
 if physical_devices:
     tf.config.experimental.set_memory_growth(physical_devices[0], True)
 
-def load_data(data_path):
-    with open(data_path, 'rb') as f:
-        data = pickle.load(f)
-    return data['images'], data['labels']
-
 def build_model():
     model = Sequential([
         Conv2D(32, (3, 3), activation='relu', input_shape=(48, 48, 1)),
@@ -33,15 +28,41 @@ def build_model():
     ])
     return model
 
+def build_student(width=32):
+    """Lightweight CPU model with the same input and output as build_model.
+
+    Depthwise-separable convolutions and global average pooling replace the
+    Flatten -> Dense(128) block that holds most of build_model's parameters.
+    Trained by distill_emotion_model.py.
+    """
+    def separable_block(filters):
+        return [SeparableConv2D(filters, (3, 3), padding='same', use_bias=False),
+                BatchNormalization(), Activation('relu')]
+
+    model = Sequential([
+        Conv2D(width, (3, 3), strides=2, padding='same', use_bias=False, input_shape=(48, 48, 1)),
+        BatchNormalization(),
+        Activation('relu'),
+        *separable_block(width * 2),
+        MaxPooling2D((2, 2)),
+        *separable_block(width * 4),
+        MaxPooling2D((2, 2)),
+        *separable_block(width * 8),
+        GlobalAveragePooling2D(),
+        Dropout(0.3),
+        Dense(7, activation='softmax')
+    ])
+    return model
+
 def main():
-    images, labels = load_data('data/emotion_data.pkl')
-    images = images.astype(np.float32) / 255.0
-    images = np.expand_dims(images, -1)
-    split_idx = int(0.8 * len(images))
-    x_train, x_val = images[:split_idx], images[split_idx:]
-    y_train, y_val = labels[:split_idx], labels[split_idx:]
-    train_ds = tf.data.Dataset.from_tensor_slices((x_train, y_train)).batch(32)
-    val_ds = tf.data.Dataset.from_tensor_slices((x_val, y_val)).batch(32)
+    # Faces are read lazily from memory-mapped shards; convert the pickle once if there are none yet
+    shard_dir = 'data/shards'
+    if not os.path.exists(os.path.join(shard_dir, training_data.MANIFEST)):
+        training_data.write_shards(training_data.iter_pickle('data/emotion_data.pkl'), shard_dir)
+    train_ds = training_data.make_dataset(shard_dir, 'train', batch_size=32)
+    val_ds = training_data.make_dataset(shard_dir, 'val', batch_size=32, cache='')
+    if not os.path.exists('models'):
+        os.makedirs('models')
     model = build_model()
     model.compile(optimizer=Adam(1e-3), loss='sparse_categorical_crossentropy', metrics=['accuracy'])
     callbacks = [
@@ -49,8 +70,6 @@ def main():
         ModelCheckpoint('models/emotion_model.h5', save_best_only=True)
     ]
     history = model.fit(train_ds, validation_data=val_ds, epochs=20, callbacks=callbacks)
-    if not os.path.exists('models'):
-        os.makedirs('models')
     model.save('models/emotion_model.h5')
     plt.plot(history.history['accuracy'], label='accuracy')
     plt.plot(history.history['val_accuracy'], label='val_accuracy')
@@ -0,0 +1,203 @@
+"""Sharded, memory-mapped training data for the emotion model.
+
+The converter writes a dataset as ``.npy`` shards of uint8 48x48 faces and
+their labels, plus a ``manifest.json``. Each shard is written through a
+memory map, so a corpus read from an image folder never has to fit in RAM:
+
+    python training_data.py data/emotion_data.pkl data/shards
+    python training_data.py path/to/images data/shards   # one subfolder per emotion label
+
+``make_dataset`` reads the shards lazily through ``tf.data``. Chunks of
+rows are sliced from the memory maps in parallel, then normalized,
+shuffled and augmented on the fly, with cache/prefetch tuned by AUTOTUNE.
+"""
+import argparse
+import json
+import os
+import pickle
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from emotion_codec import EMOTION_LABELS
+from preprocessing import FACE_SIZE
+
+MANIFEST = "manifest.json"
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp")
+
+def iter_pickle(data_path: str) -> Iterator[Tuple[np.ndarray, int]]:
+    """Faces and labels of the legacy ``{'images', 'labels'}`` pickle."""
+    with open(data_path, 'rb') as f:
+        data = pickle.load(f)
+    yield from zip(data['images'], data['labels'])
+
+def iter_image_folder(root: str, seed: int = 0) -> Iterator[Tuple[np.ndarray, int]]:
+    """Faces under ``root/<label>/``, decoded one at a time and resized to the model input.
+
+    Files are yielded in a random order (fixed by ``seed``) rather than label
+    by label, so that the tail ``split_chunks`` keeps for validation holds
+    every label in about its share of the dataset.
+    """
+    import cv2
+    files = []
+    for label, name in enumerate(EMOTION_LABELS):
+        folder = os.path.join(root, name)
+        if not os.path.isdir(folder):
+            continue
+        files += [(os.path.join(folder, filename), label) for filename in sorted(os.listdir(folder))
+                  if filename.lower().endswith(IMAGE_SUFFIXES)]
+    for i in np.random.default_rng(seed).permutation(len(files)):
+        path, label = files[i]
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            continue
+        if image.shape != (FACE_SIZE, FACE_SIZE):
+            image = cv2.resize(image, (FACE_SIZE, FACE_SIZE), interpolation=cv2.INTER_AREA)
+        yield image, label
+
+def write_shards(samples: Iterable[Tuple[np.ndarray, int]], out_dir: str, shard_size: int = 16384) -> Dict:
+    """Write samples into ``.npy`` shards of at most ``shard_size`` rows; returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    shards: List[Dict] = []
+    images = labels = None
+    count = 0
+
+    def close_shard():
+        nonlocal images, labels
+        if images is None:
+            return
+        shard = shards[-1]
+        shard["count"] = count
+        if count < shard_size:
+            # The last shard is usually short: rewrite it with only its filled rows
+            filled_images, filled_labels = np.array(images[:count]), np.array(labels[:count])
+            images = labels = None  # closes the memory maps before their files are replaced
+            np.save(os.path.join(out_dir, shard["images"]), filled_images)
+            np.save(os.path.join(out_dir, shard["labels"]), filled_labels)
+        else:
+            images.flush()
+            labels.flush()
+        images = labels = None
+
+    for image, label in samples:
+        if images is None or count == shard_size:
+            close_shard()
+            index = len(shards)
+            shards.append({"images": f"images_{index:05d}.npy", "labels": f"labels_{index:05d}.npy", "count": 0})
+            images = np.lib.format.open_memmap(os.path.join(out_dir, shards[-1]["images"]), mode="w+",
+                                               dtype=np.uint8, shape=(shard_size, FACE_SIZE, FACE_SIZE))
+            labels = np.lib.format.open_memmap(os.path.join(out_dir, shards[-1]["labels"]), mode="w+",
+                                               dtype=np.uint8, shape=(shard_size,))
+            count = 0
+        images[count] = np.asarray(image, dtype=np.uint8).reshape(FACE_SIZE, FACE_SIZE)
+        labels[count] = label
+        count += 1
+    close_shard()
+
+    manifest = {"labels": list(EMOTION_LABELS), "face_size": FACE_SIZE, "shards": shards,
+                "total": sum(shard["count"] for shard in shards)}
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def load_manifest(shard_dir: str) -> Dict:
+    with open(os.path.join(shard_dir, MANIFEST)) as f:
+        return json.load(f)
+
+def open_shards(shard_dir: str) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Read-only memory maps of every shard's images and labels."""
+    return [
+        (np.load(os.path.join(shard_dir, shard["images"]), mmap_mode="r"),
+         np.load(os.path.join(shard_dir, shard["labels"]), mmap_mode="r"))
+        for shard in load_manifest(shard_dir)["shards"]
+    ]
+
+def split_chunks(shard_dir: str, split: str, val_fraction: float = 0.2,
+                 chunk_size: int = 512) -> List[Tuple[int, int, int]]:
+    """``(shard, start, stop)`` row ranges of the train or val split.
+
+    As in the original in-memory split, the last ``val_fraction`` of the
+    dataset (in shard order) is validation data; image folders are shuffled
+    when converted so that tail is not just the last labels.
+    """
+    shards = load_manifest(shard_dir)["shards"]
+    total = sum(shard["count"] for shard in shards)
+    split_idx = int((1 - val_fraction) * total)
+    lo, hi = (0, split_idx) if split == "train" else (split_idx, total)
+    chunks = []
+    offset = 0
+    for index, shard in enumerate(shards):
+        start, stop = max(lo, offset) - offset, min(hi, offset + shard["count"]) - offset
+        for chunk_start in range(start, stop, chunk_size):
+            chunks.append((index, chunk_start, min(chunk_start + chunk_size, stop)))
+        offset += shard["count"]
+    return chunks
+
+def augment(image):
+    """Random horizontal flip, shift of up to 4 pixels and brightness/contrast jitter on one [0, 1] face."""
+    import tensorflow as tf
+    image = tf.image.random_flip_left_right(image)
+    padded = tf.image.pad_to_bounding_box(image, 4, 4, FACE_SIZE + 8, FACE_SIZE + 8)
+    image = tf.image.random_crop(padded, (FACE_SIZE, FACE_SIZE, 1))
+    image = tf.image.random_brightness(image, 0.1)
+    image = tf.image.random_contrast(image, 0.8, 1.2)
+    return tf.clip_by_value(image, 0.0, 1.0)
+
+def make_dataset(shard_dir: str, split: str = "train", batch_size: int = 32, val_fraction: float = 0.2,
+                 shuffle_buffer: int = 8192, augment_images: Optional[bool] = None,
+                 cache: Optional[str] = None, chunk_size: int = 512, seed: Optional[int] = None):
+    """A batched ``tf.data.Dataset`` of ``(faces, labels)`` read lazily from the shards.
+
+    Training data is shuffled at two levels (chunk order, then a
+    ``shuffle_buffer`` of faces) and augmented unless ``augment_images`` is
+    False. ``cache`` is ``None`` (no cache), ``""`` (in memory; sensible for
+    the validation split) or a file prefix for an on-disk cache. Faces are
+    cached as uint8, before normalization and augmentation.
+    """
+    import tensorflow as tf
+    AUTOTUNE = tf.data.AUTOTUNE
+    training = split == "train"
+    augment_images = training if augment_images is None else augment_images
+    memmaps = open_shards(shard_dir)
+    chunks = np.array(split_chunks(shard_dir, split, val_fraction, chunk_size), dtype=np.int64).reshape(-1, 3)
+
+    def read_chunk(chunk):
+        index, start, stop = (int(v) for v in chunk)
+        images, labels = memmaps[index]
+        # Slicing a memory map copies just these rows off disk
+        return np.ascontiguousarray(images[start:stop]), labels[start:stop].astype(np.int64)
+
+    def load(chunk):
+        images, labels = tf.numpy_function(read_chunk, [chunk], (tf.uint8, tf.int64))
+        images = tf.ensure_shape(images, (None, FACE_SIZE, FACE_SIZE))
+        return tf.data.Dataset.from_tensor_slices((images, tf.ensure_shape(labels, (None,))))
+
+    ds = tf.data.Dataset.from_tensor_slices(chunks)
+    if training:
+        ds = ds.shuffle(len(chunks), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.interleave(load, cycle_length=AUTOTUNE, num_parallel_calls=AUTOTUNE, deterministic=not training)
+    if cache is not None:
+        ds = ds.cache(cache)
+    if training:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+
+    def prepare(image, label):
+        image = tf.cast(image[..., tf.newaxis], tf.float32) / 255.0
+        if augment_images:
+            image = augment(image)
+        return image, label
+
+    ds = ds.map(prepare, num_parallel_calls=AUTOTUNE, deterministic=not training)
+    return ds.batch(batch_size, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="legacy .pkl dataset, or a folder with one subfolder per emotion label")
+    parser.add_argument("out_dir")
+    parser.add_argument("--shard-size", type=int, default=16384, help="faces per shard")
+    parser.add_argument("--seed", type=int, default=0, help="order in which an image folder's files are written")
+    args = parser.parse_args()
+
+    samples = iter_image_folder(args.source, args.seed) if os.path.isdir(args.source) else iter_pickle(args.source)
+    manifest = write_shards(samples, args.out_dir, args.shard_size)
+    print(f"Wrote {manifest['total']} faces in {len(manifest['shards'])} shards to {args.out_dir}")
@@ -0,0 +1,245 @@
+import base64
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import aggregates
+import config
+import emotion_codec
+import instrumentation
+import models
+import rollups
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+def frame_rows(session_id: int, timestamp: datetime, result: Dict) -> Dict[type, Dict]:
+    """Column values of the AttentionMetric and FocusLog rows for one analyzed frame."""
+    emotions = result["emotions"]
+    dominant_emotion, confidence = max(emotions.items(), key=lambda x: x[1]) if emotions else (None, None)
+    return {
+        models.AttentionMetric: {
+            "session_id": session_id,
+            "timestamp": timestamp,
+            "attention_score": result["attention_score"],
+            "dominant_emotion": dominant_emotion,
+            "emotion_confidence": confidence,
+            "break_recommended": result["break_recommended"],
+        },
+        models.FocusLog: {
+            "session_id": session_id,
+            "timestamp": timestamp,
+            "focused": result["focused"],
+            **emotion_codec.storage_values(emotions),
+            "attention_score": result["attention_score"],
+        },
+    }
+
+def _json_default(value):
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    return str(value)
+
+class MetricWriteBuffer:
+    """Write-behind buffer for per-frame rows.
+
+    Frames are queued in memory and bulk-inserted in a single transaction
+    once ``max_rows`` frames are pending or every ``flush_interval`` seconds,
+    whichever comes first. Callers that need the rows on disk (ending a
+    session, shutdown) call ``flush()`` directly.
+
+    If that transaction fails, every session's frames are retried in a
+    transaction of their own, so one session's bad rows never hold back the
+    others. A session whose frames fail ``max_attempts`` flushes in a row is
+    written frame by frame and the frames that still fail are dropped to the
+    dead-letter log. Operational errors (database locked or unreachable)
+    don't count as attempts; those frames are retried until the database is back.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 max_rows: int = config.WRITE_BUFFER_MAX_ROWS,
+                 flush_interval: float = config.WRITE_BUFFER_FLUSH_SECONDS,
+                 max_attempts: int = config.WRITE_BUFFER_MAX_ATTEMPTS,
+                 dead_letter_path: str = config.WRITE_BUFFER_DEAD_LETTER_PATH):
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path
+        self._pending: List[Tuple[int, Dict[type, Dict]]] = []
+        # Failed flushes in a row of the frames each session has pending
+        self._attempts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        # Held for a whole flush so a caller's flush() returns only once earlier rows are committed
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_frame(self, session_id: int, timestamp: datetime, result: Dict):
+        self.add_frames(session_id, [(timestamp, result)])
+
+    def add_frames(self, session_id: int, frames: Iterable[Tuple[datetime, Dict]]):
+        rows = [(session_id, frame_rows(session_id, timestamp, result)) for timestamp, result in frames]
+        with self._lock:
+            self._pending.extend(rows)
+            full = len(self._pending) >= self.max_rows
+        if full:
+            self._wake.set()
+
+    def pending(self, session_id: Optional[int] = None) -> int:
+        """Frames not yet written, of every session or of ``session_id``."""
+        if session_id is None:
+            return len(self._pending)
+        with self._lock:
+            return sum(1 for pending_id, _ in self._pending if pending_id == session_id)
+
+    def flush(self) -> int:
+        """Write every pending frame; returns the number of frames written.
+
+        Frames that can't be written are kept for the next flush (or dropped,
+        see the class docstring) instead of raising.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                self._write(batch)
+            except Exception:
+                logger.warning("Failed to flush %d buffered frames; retrying each session on its own",
+                               len(batch), exc_info=True)
+            else:
+                for session_id, _ in batch:
+                    self._attempts.pop(session_id, None)
+                return len(batch)
+
+            by_session: Dict[int, List[Tuple[int, Dict[type, Dict]]]] = {}
+            for item in batch:
+                by_session.setdefault(item[0], []).append(item)
+            written = 0
+            retry: List[Tuple[int, Dict[type, Dict]]] = []
+            for session_id, items in by_session.items():
+                try:
+                    self._write(items)
+                    written += len(items)
+                    self._attempts.pop(session_id, None)
+                except OperationalError:
+                    logger.exception("Database unavailable; keeping %d frames of session %s", len(items), session_id)
+                    retry.extend(items)
+                except Exception:
+                    attempts = self._attempts[session_id] = self._attempts.get(session_id, 0) + 1
+                    logger.exception("Failed to write %d frames of session %s (attempt %d of %d)",
+                                     len(items), session_id, attempts, self.max_attempts)
+                    if attempts < self.max_attempts:
+                        retry.extend(items)
+                    else:
+                        del self._attempts[session_id]
+                        written += self._write_or_drop(items)
+            if retry:
+                # Back in front so the next flush retries them in order
+                with self._lock:
+                    self._pending[:0] = retry
+            return written
+
+    def _write(self, batch: List[Tuple[int, Dict[type, Dict]]]):
+        """Insert ``batch`` and fold it into the session aggregates in one transaction."""
+        db = self.session_factory()
+        try:
+            with instrumentation.stage("db_flush"):
+                for model in (models.AttentionMetric, models.FocusLog):
+                    db.bulk_insert_mappings(model, [rows[model] for _, rows in batch])
+                self._update_aggregates(db, batch)
+                db.commit()
+        except Exception:
+            instrumentation.DB_FLUSHES.inc(outcome="error")
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        instrumentation.DB_FLUSHES.inc(outcome="ok")
+        instrumentation.DB_ROWS.inc(len(batch))
+
+    def _write_or_drop(self, items: List[Tuple[int, Dict[type, Dict]]]) -> int:
+        """Write frames one at a time, dropping those that fail to the dead-letter log; returns the number written."""
+        written = 0
+        for item in items:
+            try:
+                self._write([item])
+                written += 1
+            except Exception as exc:
+                self._dead_letter(item, exc)
+        return written
+
+    def _dead_letter(self, item: Tuple[int, Dict[type, Dict]], exc: Exception):
+        session_id, rows = item
+        instrumentation.DB_DROPPED.inc()
+        logger.error("Dropping a frame of session %s at %s after %d failed flushes: %s",
+                     session_id, rows[models.FocusLog]["timestamp"], self.max_attempts, exc)
+        if not self.dead_letter_path:
+            return
+        record = {"session_id": session_id, "error": repr(exc),
+                  **{model.__tablename__: values for model, values in rows.items()}}
+        try:
+            with open(self.dead_letter_path, "a") as f:
+                f.write(json.dumps(record, default=_json_default) + "\n")
+        except OSError:
+            logger.exception("Could not write to the dead-letter log %s", self.dead_letter_path)
+
+    @staticmethod
+    def _update_aggregates(db: Session, batch: List[Tuple[int, Dict[type, Dict]]]):
+        """Fold the flushed frames into their sessions' running aggregates and their users' rollups, in the same transaction."""
+        by_session: Dict[int, List[Dict]] = {}
+        for session_id, rows in batch:
+            by_session.setdefault(session_id, []).append(rows[models.FocusLog])
+        by_user: Dict[str, Dict[datetime, Dict]] = {}
+        sessions = db.query(models.StudySession).filter(models.StudySession.id.in_(list(by_session)))
+        for session in sessions:
+            logs = sorted(by_session[session.id], key=lambda row: row["timestamp"])
+            frames = [
+                (row["timestamp"], row["focused"], emotion_codec.row_emotions(row["emotions_json"], row["emotions_blob"]),
+                 row["attention_score"])
+                for row in logs
+            ]
+            # Rollups need the session's latest frame before this batch, so they go first
+            rollups.merge_periods(by_user.setdefault(session.user_id, {}),
+                                  rollups.frame_contributions(frames, session.last_frame_at))
+            aggregates.apply_frames(session, frames)
+            if session.end_time is not None:
+                # Frames that reach the database after end_session, e.g. from another server worker
+                aggregates.finish(session)
+        for user_id, hours in by_user.items():
+            rollups.add_periods(db, user_id, hours)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="metric-write-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background flusher and write whatever is still pending."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Unexpected error flushing %d buffered frames; will retry", self.pending())
+
+write_buffer = MetricWriteBuffer()
@@ -2,7 +2,7 @@ import React, { useState, useRef, useEffect } from "react";
 import Webcam from "react-webcam";
 import { Box, Paper, Typography, Button, Chip, Alert, Grid } from "@mui/material";
 import { mapEmotionToStudyState } from "../App";
-import { startSession, analyzeFocus } from "../services/api";
+import { startSession, openSessionSocket } from "../services/api";
 
 export default function FocusPage() {
   const [sessionId, setSessionId] = useState(null);
@@ -10,6 +10,7 @@ export default function FocusPage() {
   const [studyState, setStudyState] = useState(null);
   const [emotionConfidence, setEmotionConfidence] = useState(0);
   const [emotionHistory, setEmotionHistory] = useState([]);
+  const [connectionError, setConnectionError] = useState(null);
   const webcamRef = useRef(null);
 
   const handleStartSession = async () => {
@@ -22,34 +23,73 @@ export default function FocusPage() {
     setIsSessionActive(false);
     setSessionId(null);
     setStudyState(null);
+    setConnectionError(null);
   };
 
   useEffect(() => {
-    let interval;
-    if (isSessionActive && sessionId) {
-      interval = setInterval(async () => {
-        if (webcamRef.current) {
-          const imageSrc = webcamRef.current.getScreenshot();
-          if (imageSrc) {
-            try {
-              const blob = await (await fetch(imageSrc)).blob();
-              const file = new File([blob], "screenshot.jpg", { type: "image/jpeg" });
-              const data = await analyzeFocus(file);
-              setStudyState(data.study_state);
-              // Assuming confidence is part of the response now
-              // setEmotionConfidence(data.confidence); 
-              setEmotionHistory(prev => [...prev.slice(-9), {
-                state: data.study_state,
-                timestamp: new Date().toLocaleTimeString()
-              }]);
-            } catch (error) {
-              console.error("Error analyzing focus:", error);
-            }
+    if (!isSessionActive || !sessionId) {
+      return undefined;
+    }
+    let socket = null;
+    let reconnectTimer = null;
+    let retryDelay = 1000;
+    let stopped = false;
+
+    // Frames go over one WebSocket for the whole session instead of one POST each
+    const connect = () => {
+      socket = openSessionSocket(sessionId, (data) => {
+        if (data.error) {
+          console.error("Error analyzing focus:", data.error);
+          return;
+        }
+        setStudyState(data.study_state);
+        setEmotionHistory(prev => [...prev.slice(-9), {
+          state: data.study_state,
+          timestamp: new Date().toLocaleTimeString()
+        }]);
+      }, {
+        onOpen: () => {
+          retryDelay = 1000;
+          setConnectionError(null);
+        },
+        onClose: (event) => {
+          if (stopped) {
+            return;
+          }
+          if (event.code === 4404) {
+            setConnectionError("The server doesn't know this session anymore. Start a new session.");
+            return;
+          }
+          setConnectionError(`Lost the connection to the server. Reconnecting in ${retryDelay / 1000} s...`);
+          reconnectTimer = setTimeout(connect, retryDelay);
+          retryDelay = Math.min(retryDelay * 2, 30000);
+        },
+      });
+    };
+    connect();
+
+    const interval = setInterval(async () => {
+      if (webcamRef.current && socket && socket.readyState === WebSocket.OPEN) {
+        const imageSrc = webcamRef.current.getScreenshot();
+        if (imageSrc) {
+          try {
+            const blob = await (await fetch(imageSrc)).blob();
+            socket.send(blob);
+          } catch (error) {
+            console.error("Error sending frame:", error);
           }
         }
-      }, 3000);
-    }
-    return () => clearInterval(interval);
+      }
+    }, 3000);
+
+    return () => {
+      stopped = true;
+      clearInterval(interval);
+      clearTimeout(reconnectTimer);
+      if (socket) {
+        socket.close();
+      }
+    };
   }, [isSessionActive, sessionId]);
 
   return (
@@ -74,6 +114,11 @@ export default function FocusPage() {
         </Grid>
         <Grid item xs={12} md={4}>
           <Typography variant="h6">Current State</Typography>
+          {isSessionActive && connectionError && (
+            <Alert severity="error" sx={{ mt: 1 }}>
+              {connectionError}
+            </Alert>
+          )}
           {isSessionActive && studyState && (
             <Alert severity="info" sx={{ mt: 1 }}>
               {studyState}
@@ -1,6 +1,7 @@
 import axios from 'axios';
 
 const API_BASE_URL = 'http://127.0.0.1:8000';
+const WS_BASE_URL = API_BASE_URL.replace(/^http/, 'ws');
 
 export const startSession = async () => {
   const response = await axios.post(`${API_BASE_URL}/start_session`);
@@ -20,9 +21,12 @@ export const endSession = async (sessionId) => {
   return response.data;
 };
 
-export const analyzeFocus = async (file) => {
+export const analyzeFocus = async (file, sessionId) => {
   const formData = new FormData();
   formData.append("file", file, "screenshot.jpg");
+  if (sessionId != null) {
+    formData.append("session_id", sessionId);
+  }
   const response = await axios.post(`${API_BASE_URL}/analyze_focus/`, formData, {
     headers: {
       "Content-Type": "multipart/form-data",
@@ -30,3 +34,34 @@ export const analyzeFocus = async (file) => {
   });
   return response.data;
 };
+
+export const analyzeFaces = async (file, sessionId) => {
+  const formData = new FormData();
+  formData.append("file", file, "screenshot.jpg");
+  if (sessionId != null) {
+    formData.append("session_id", sessionId);
+  }
+  const response = await axios.post(`${API_BASE_URL}/analyze_faces/`, formData, {
+    headers: {
+      "Content-Type": "multipart/form-data",
+    },
+  });
+  return response.data;
+};
+
+export const openSessionSocket = (sessionId, onResult, { onOpen, onClose } = {}) => {
+  const socket = new WebSocket(`${WS_BASE_URL}/ws/session/${sessionId}`);
+  socket.binaryType = "arraybuffer";
+  socket.onmessage = (event) => onResult(JSON.parse(event.data));
+  // A failed connection fires onerror and then onclose, so onclose alone sees every drop
+  if (onOpen) socket.onopen = onOpen;
+  if (onClose) socket.onclose = onClose;
+  return socket;
+};
+
+export const getAnalytics = async (userId, granularity = "day") => {
+  const response = await axios.get(`${API_BASE_URL}/analytics/${encodeURIComponent(userId)}`, {
+    params: { granularity },
+  });
+  return response.data;
+};
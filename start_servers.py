@@ -1,39 +1,47 @@
 import subprocess
-import time
 import sys
 import os
 
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.insert(0, BACKEND_DIR)
+from serve import wait_until_ready
+
+READY_TIMEOUT_SECONDS = 300
+
 def start_servers():
-    """Start both the focus detection and emotion detection servers"""
+    """Start the StudySync API, which serves both the focus and the emotion routes"""
     
     print("🚀 Starting StudySync servers...")
     print("=" * 50)
     
-    # Start emotion detection server
-    print("1. Starting Emotion Detection Server (port 5001)...")
-    emotion_process = subprocess.Popen([
-        sys.executable, "backend/emotion_api.py"
-    ], cwd=os.getcwd())
+    # Preforked workers share one preloaded copy of the model and detector
+    print("1. Starting StudySync API (port 8000)...")
+    api_process = subprocess.Popen([
+        sys.executable, "serve.py", "--port", "8000"
+    ], cwd=BACKEND_DIR)
     
-    # Wait a moment for the server to start
-    time.sleep(3)
+    # Wait until a worker has warmed up its model and answers /readyz
+    if not wait_until_ready("http://127.0.0.1:8000/readyz", READY_TIMEOUT_SECONDS, api_process):
+        print("❌ StudySync API did not become ready; see its log above")
+        api_process.terminate()
+        sys.exit(1)
     
-    print("2. Emotion Detection Server should be running on http://localhost:5001")
-    print("3. Make sure your focus detection server is running on http://127.0.0.1:8000")
+    print("2. StudySync API is ready on http://127.0.0.1:8000")
     print("\n" + "=" * 50)
     print("✅ StudySync is ready!")
     print("\n📱 Frontend: http://localhost:5173 (or your Vite dev server)")
     print("🎯 Focus API: http://127.0.0.1:8000")
-    print("😊 Emotion API: http://localhost:5001")
+    print("😊 Emotion API: http://127.0.0.1:8000/predict_emotion")
     print("\nPress Ctrl+C to stop all servers")
     
     try:
         # Keep the script running
-        emotion_process.wait()
+        api_process.wait()
     except KeyboardInterrupt:
         print("\n🛑 Stopping servers...")
-        emotion_process.terminate()
+        api_process.terminate()
+        api_process.wait()
         print("✅ Servers stopped")
 
 if __name__ == "__main__":
-    start_servers() 
\ No newline at end of file
+    start_servers()